@@ -21,6 +21,7 @@ from ....schemas.import_export import (
     ValidationResultResponse
 )
 from ....services.import_service import ImportService
+from ....services.categorization_service import CategorizationService
 from ....services.export_service import ExportService
 from ....core.open_finance_standards import validate_import_data, get_supported_formats
 
@@ -32,12 +33,18 @@ import_service = ImportService()
 export_service = ExportService()
 
 
+def get_categorization_service(db: Session = Depends(get_db)) -> CategorizationService:
+    """Get a request-scoped categorization service that loads its rules once."""
+    return CategorizationService(db)
+
+
 @router.post("/import/csv", response_model=ImportPreviewResponse)
 async def import_csv_file(
     file: UploadFile = File(..., description="CSV file to import"),
     auto_categorize: bool = Form(True, description="Automatically categorize transactions"),
     skip_duplicates: bool = Form(True, description="Skip duplicate transactions"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    categorization_service: CategorizationService = Depends(get_categorization_service)
 ):
     """
     Import transactions from a CSV file with preview.
@@ -47,6 +54,7 @@ async def import_csv_file(
         auto_categorize: Whether to auto-categorize transactions
         skip_duplicates: Whether to skip duplicate detection
         db: Database session
+        categorization_service: Categorization service for this request
         
     Returns:
         Import preview with validation results and transaction count
@@ -59,17 +67,18 @@ async def import_csv_file(
         if not file.filename.lower().endswith('.csv'):
             raise HTTPException(status_code=400, detail="File must be a CSV file")
         
-        # Read file content
-        content = await file.read()
-        if not content:
+        # Stream the spooled upload instead of reading it into memory
+        if not await file.read(1):
             raise HTTPException(status_code=400, detail="File is empty")
+        await file.seek(0)
         
         # Process CSV import
         preview = import_service.process_csv_file(
-            content, 
+            file.file,
             auto_categorize=auto_categorize,
             skip_duplicates=skip_duplicates,
-            db=db
+            db=db,
+            categorization_service=categorization_service
         )
         
         return preview
@@ -84,7 +93,8 @@ async def import_ofx_file(
     file: UploadFile = File(..., description="OFX file to import"),
     auto_categorize: bool = Form(True, description="Automatically categorize transactions"),
     skip_duplicates: bool = Form(True, description="Skip duplicate transactions"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    categorization_service: CategorizationService = Depends(get_categorization_service)
 ):
     """
     Import transactions from an OFX file with preview.
@@ -94,6 +104,7 @@ async def import_ofx_file(
         auto_categorize: Whether to auto-categorize transactions
         skip_duplicates: Whether to skip duplicate detection
         db: Database session
+        categorization_service: Categorization service for this request
         
     Returns:
         Import preview with validation results and transaction count
@@ -116,7 +127,8 @@ async def import_ofx_file(
             content,
             auto_categorize=auto_categorize,
             skip_duplicates=skip_duplicates,
-            db=db
+            db=db,
+            categorization_service=categorization_service
         )
         
         return preview
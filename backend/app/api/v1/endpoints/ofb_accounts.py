@@ -118,13 +118,14 @@ class OFBSyncResponse(BaseModel):
 async def discover_accounts(
     consent_id: str = Query(..., description="Consent ID for access"),
     access_token: str = Query(..., description="Access token for API calls"),
+    refresh: bool = Query(False, description="Bypass the cached account list"),
     db: Session = Depends(get_db)
 ):
     """Discover bank accounts for a user"""
     
     try:
         account_service = OFBAccountService(db)
-        accounts = await account_service.discover_accounts(consent_id, access_token)
+        accounts = await account_service.discover_accounts(consent_id, access_token, refresh=refresh)
         
         # Transform to response format
         account_list = []
@@ -160,13 +161,16 @@ async def get_account_balance(
     account_id: str,
     consent_id: str = Query(..., description="Consent ID for access"),
     access_token: str = Query(..., description="Access token for API calls"),
+    refresh: bool = Query(False, description="Bypass the cached balance"),
     db: Session = Depends(get_db)
 ):
     """Get account balance information"""
     
     try:
         account_service = OFBAccountService(db)
-        balance = await account_service.get_account_balances(account_id, consent_id, access_token)
+        balance = await account_service.get_account_balances(
+            account_id, consent_id, access_token, refresh=refresh
+        )
         
         return OFBAccountBalance(
             available_amount=balance["availableAmount"],
@@ -8,7 +8,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 
-from ....services.ofb_advanced_analytics_service import OFBAdvancedAnalyticsService
+from ....services.ofb_advanced_analytics_service import AnalyticsContext, OFBAdvancedAnalyticsService
 from ....core.open_finance_brasil import OpenFinanceBrasilIntegration
 from ....database import get_db
 
@@ -148,11 +148,12 @@ async def get_analytics_insights_summary(
         ofb_integration = OpenFinanceBrasilIntegration()
         analytics_service = OFBAdvancedAnalyticsService(db, ofb_integration)
         
-        # Get all analytics data
-        cash_flow = await analytics_service.get_cash_flow_analysis(user_id, "monthly")
-        spending_patterns = await analytics_service.get_spending_patterns(user_id)
-        bank_performance = await analytics_service.get_bank_performance_analysis(user_id)
-        financial_health = await analytics_service.get_financial_health_score(user_id)
+        # Get all analytics data, sharing downstream fetches between them
+        context = AnalyticsContext()
+        cash_flow = await analytics_service.get_cash_flow_analysis(user_id, "monthly", context=context)
+        spending_patterns = await analytics_service.get_spending_patterns(user_id, context=context)
+        bank_performance = await analytics_service.get_bank_performance_analysis(user_id, context=context)
+        financial_health = await analytics_service.get_financial_health_score(user_id, context=context)
         
         # Extract key insights
         key_insights = []
@@ -245,9 +246,10 @@ async def get_analytics_metrics_overview(
         ofb_integration = OpenFinanceBrasilIntegration()
         analytics_service = OFBAdvancedAnalyticsService(db, ofb_integration)
         
-        # Get key metrics
-        cash_flow = await analytics_service.get_cash_flow_analysis(user_id, "monthly")
-        financial_health = await analytics_service.get_financial_health_score(user_id)
+        # Get key metrics, sharing downstream fetches between them
+        context = AnalyticsContext()
+        cash_flow = await analytics_service.get_cash_flow_analysis(user_id, "monthly", context=context)
+        financial_health = await analytics_service.get_financial_health_score(user_id, context=context)
         
         overview = {
             "user_id": user_id,
@@ -293,11 +295,12 @@ async def export_analytics_report(
         ofb_integration = OpenFinanceBrasilIntegration()
         analytics_service = OFBAdvancedAnalyticsService(db, ofb_integration)
         
-        # Get all analytics data
-        cash_flow = await analytics_service.get_cash_flow_analysis(user_id, "monthly")
-        spending_patterns = await analytics_service.get_spending_patterns(user_id)
-        bank_performance = await analytics_service.get_bank_performance_analysis(user_id)
-        financial_health = await analytics_service.get_financial_health_score(user_id)
+        # Get all analytics data, sharing downstream fetches between them
+        context = AnalyticsContext()
+        cash_flow = await analytics_service.get_cash_flow_analysis(user_id, "monthly", context=context)
+        spending_patterns = await analytics_service.get_spending_patterns(user_id, context=context)
+        bank_performance = await analytics_service.get_bank_performance_analysis(user_id, context=context)
+        financial_health = await analytics_service.get_financial_health_score(user_id, context=context)
         
         # Prepare export data
         export_data = {
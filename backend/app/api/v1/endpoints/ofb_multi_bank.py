@@ -104,6 +104,7 @@ async def get_connected_banks(
 @router.get("/balance/aggregated", response_model=dict)
 async def get_aggregated_balance(
     user_id: str = Query(..., description="User ID"),
+    refresh: bool = Query(False, description="Bypass the cached aggregated balance"),
     db=Depends(get_db)
 ):
     """Get aggregated balance across all connected banks."""
@@ -111,7 +112,7 @@ async def get_aggregated_balance(
         ofb_integration = OpenFinanceBrasilIntegration()
         multi_bank_service = OFBMultiBankService(db, ofb_integration)
         
-        result = await multi_bank_service.get_aggregated_balance(user_id=user_id)
+        result = await multi_bank_service.get_aggregated_balance(user_id=user_id, refresh=refresh)
         
         return result
         
@@ -204,7 +205,7 @@ async def get_multi_bank_summary(
                 "healthy_banks": health["healthy_banks"],
                 "banks_needing_attention": health["banks_needing_attention"]
             },
-            "summary_date": datetime.utcnow().isoformat()
+            "summary_date": datetime.utcnow()
         }
         
         return summary
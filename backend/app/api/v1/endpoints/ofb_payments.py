@@ -7,10 +7,11 @@ from typing import Optional, List
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from ....services.ofb_payment_service import OFBPaymentService
-from ....core.open_finance_brasil import OpenFinanceBrasilIntegration
+from ....core.open_finance_brasil import OpenFinanceBrasilIntegration, get_shared_integration
 from ....database import get_db
 
 router = APIRouter()
@@ -246,6 +247,43 @@ async def get_payment_history(
         )
 
 
+@router.get("/history/stream")
+async def stream_payment_history(
+    consent_id: str = Query(..., description="Consent ID"),
+    access_token: str = Query(..., description="Access token"),
+    from_date: Optional[datetime] = Query(None, description="Start date"),
+    to_date: Optional[datetime] = Query(None, description="End date"),
+    payment_type: Optional[str] = Query(None, description="Payment type filter"),
+    status: Optional[str] = Query(None, description="Status filter"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(25, ge=1, le=100, description="Page size"),
+    db=Depends(get_db)
+):
+    """Stream payment history, sending each payment as it is read."""
+    ofb_integration = await get_shared_integration()
+    try:
+        payment_service = OFBPaymentService(db, ofb_integration)
+        
+        chunks = await payment_service.stream_payment_history(
+            consent_id=consent_id,
+            access_token=access_token,
+            from_date=from_date,
+            to_date=to_date,
+            payment_type=payment_type,
+            status=status,
+            page=page,
+            page_size=page_size
+        )
+        
+        return StreamingResponse(chunks, media_type="application/json")
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Payment history retrieval failed: {str(e)}"
+        )
+
+
 @router.get("/types", response_model=dict)
 async def get_payment_types():
     """Get available payment types and their characteristics."""
@@ -12,12 +12,13 @@ from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, s
 from pydantic import BaseModel, Field
 
 from ....core.open_finance_brasil import (
-    OFBConfig,
     OpenFinanceBrasilIntegration,
+    get_shared_integration,
 )
 from ....config_ofb import ofb_settings
 from ....database import get_db
 from ....schemas.common import PaginationParams
+from ....services.ofb_account_service import invalidate_consent_cache
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
@@ -86,41 +87,9 @@ class OFBHealthResponse(BaseModel):
     configuration: dict = Field(..., description="Configuration status")
 
 
-# OFB Integration instance
-ofb_integration: Optional[OpenFinanceBrasilIntegration] = None
-
-
 async def get_ofb_integration() -> OpenFinanceBrasilIntegration:
     """Get OFB integration instance"""
-    global ofb_integration
-    
-    if ofb_integration is None:
-        if not ofb_settings.is_configured():
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Open Finance Brasil integration not configured"
-            )
-        
-        # Create OFB configuration
-        cert_paths = ofb_settings.get_certificate_paths()
-        endpoints = ofb_settings.get_endpoints()
-        
-        config = OFBConfig(
-            client_id=ofb_settings.ofb_client_id,
-            client_secret=ofb_settings.ofb_client_secret,
-            redirect_uri=ofb_settings.ofb_redirect_uri,
-            **endpoints,
-            **cert_paths,
-            request_timeout=ofb_settings.ofb_request_timeout,
-            max_retries=ofb_settings.ofb_max_retries,
-            rate_limit_requests=ofb_settings.ofb_rate_limit_requests,
-            rate_limit_window=ofb_settings.ofb_rate_limit_window
-        )
-        
-        ofb_integration = OpenFinanceBrasilIntegration(config)
-        await ofb_integration.initialize()
-    
-    return ofb_integration
+    return await get_shared_integration()
 
 
 @router.get("/health", response_model=OFBHealthResponse)
@@ -272,6 +241,8 @@ async def revoke_consent(
     
     try:
         success = await ofb.consent_manager.revoke_consent(consent_id)
+        ofb.invalidate_access(consent_id)
+        invalidate_consent_cache(consent_id)
         
         if not success:
             raise HTTPException(
@@ -38,6 +38,22 @@ async def create_transaction(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router.post("/batch", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def create_transactions(
+    batch: List[TransactionCreate],
+    db: Session = Depends(get_db)
+):
+    """Create many transactions in one batch."""
+    try:
+        transaction_service = TransactionService(db)
+        transaction_ids = transaction_service.create_transactions(batch)
+        return {"created_count": len(transaction_ids), "transaction_ids": transaction_ids}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
 @router.get("/", response_model=TransactionListResponse)
 async def get_transactions(
     page: int = Query(1, ge=1, description="Page number"),
@@ -52,6 +68,8 @@ async def get_transactions(
     tags: Optional[List[str]] = Query(None, description="Tags to filter by"),
     is_recurring: Optional[bool] = Query(None, description="Filter by recurring status"),
     search: Optional[str] = Query(None, description="Search in description and notes"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    include_total: bool = Query(True, description="Count all matching transactions"),
     db: Session = Depends(get_db)
 ):
     """Get transactions with filtering and pagination."""
@@ -84,16 +102,24 @@ async def get_transactions(
         
         # Get transactions
         transaction_service = TransactionService(db)
-        result = transaction_service.get_transactions(filters=filters, pagination=pagination)
+        result = transaction_service.get_transactions(
+            filters=filters,
+            pagination=pagination,
+            cursor=cursor,
+            include_total=include_total
+        )
         
         return TransactionListResponse(
             transactions=result.items,
             total=result.total,
             page=result.page,
             size=result.size,
-            pages=result.pages
+            pages=result.pages,
+            next_cursor=result.next_cursor
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
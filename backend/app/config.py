@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     # Database settings
     database_url: str = "sqlite:///./cashflow.db"
     database_echo: bool = False
+    database_pool_size: int = 20  # Ignored for SQLite
+    database_max_overflow: int = 10
+    database_pool_recycle: int = 300  # Seconds before a pooled connection is replaced
     
     # API settings
     api_v1_prefix: str = "/api/v1"
@@ -38,6 +41,7 @@ class Settings(BaseSettings):
     # Data processing settings
     batch_size: int = 1000
     max_transactions_per_import: int = 50000
+    import_session_ttl: int = 3600  # Seconds an import preview is kept
     
     # Backup settings
     backup_directory: Path = Path("./backups")
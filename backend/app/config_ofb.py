@@ -3,6 +3,7 @@ Open Finance Brasil Configuration Settings
 """
 
 import os
+from functools import cached_property
 from pathlib import Path
 from typing import Optional
 
@@ -57,10 +58,26 @@ class OFBSettings(BaseSettings):
     # Security Settings
     ofb_request_timeout: int = Field(default=30, description="Request timeout in seconds")
     ofb_max_retries: int = Field(default=3, description="Maximum retry attempts")
+    ofb_max_connections: int = Field(default=50, description="Maximum pooled OFB API connections per process")
+    ofb_keepalive_expiry: float = Field(default=60.0, description="Idle OFB API connection lifetime in seconds")
     
     # Rate Limiting
     ofb_rate_limit_requests: int = Field(default=100, description="Rate limit requests per window")
     ofb_rate_limit_window: int = Field(default=60, description="Rate limit window in seconds")
+    ofb_max_concurrency: int = Field(default=8, description="Maximum concurrent outbound OFB calls per process")
+    ofb_max_concurrent_syncs: int = Field(default=10, description="Maximum concurrent account syncs per sync run")
+    ofb_sync_poll_interval: int = Field(default=60, description="Longest wait in seconds before the sync scheduler checks for new jobs")
+    
+    # Caching
+    ofb_accounts_cache_ttl: int = Field(default=3600, description="Discovered accounts cache TTL in seconds")
+    ofb_balance_cache_ttl: int = Field(default=60, description="Account balance cache TTL in seconds")
+    ofb_analytics_cache_ttl: int = Field(default=30, description="Analytics balance and bank health cache TTL in seconds")
+    ofb_access_cache_ttl: int = Field(default=60, description="Granted consent access check cache TTL in seconds")
+    ofb_aggregated_balance_ttl: int = Field(default=300, description="Age in seconds after which an aggregated balance is refreshed")
+    ofb_aggregated_balance_stale_ttl: int = Field(
+        default=900,
+        description="Maximum age in seconds of an aggregated balance served while it refreshes in the background"
+    )
     
     # Feature Flags
     ofb_enabled: bool = Field(default=False, description="Enable Open Finance Brasil integration")
@@ -77,6 +94,15 @@ class OFBSettings(BaseSettings):
     
     def get_certificate_paths(self) -> dict:
         """Get absolute certificate paths"""
+        return dict(self._certificate_paths)
+    
+    def get_endpoints(self) -> dict:
+        """Get OFB endpoints based on environment"""
+        return dict(self._endpoints)
+    
+    @cached_property
+    def _certificate_paths(self) -> dict:
+        """Absolute certificate paths, resolved once per settings instance"""
         base_path = Path(__file__).parent.parent.parent / "certs"
         
         return {
@@ -87,8 +113,9 @@ class OFBSettings(BaseSettings):
             "ca_bundle_path": str(base_path / self.ofb_ca_bundle_path)
         }
     
-    def get_endpoints(self) -> dict:
-        """Get OFB endpoints based on environment"""
+    @cached_property
+    def _endpoints(self) -> dict:
+        """OFB endpoints for the configured environment, resolved once per settings instance"""
         if self.ofb_sandbox_mode:
             return {
                 "auth_base_url": "https://auth.sandbox.openfinancebrasil.org.br",
@@ -111,8 +138,7 @@ class OFBSettings(BaseSettings):
             return False
         
         # Check if certificates exist
-        cert_paths = self.get_certificate_paths()
-        for path in cert_paths.values():
+        for path in self._certificate_paths.values():
             if not os.path.exists(path):
                 return False
         
@@ -0,0 +1,64 @@
+"""
+In-process caching helpers.
+"""
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """In-process cache whose entries expire ``ttl_seconds`` after being set.
+
+    All entries share one TTL, so insertion order is also expiry order and
+    expired entries can be dropped from the front. Once ``maxsize`` entries
+    are held, setting a new key evicts the oldest one.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a live value, or default if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, resetting its expiry."""
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._evict(now)
+        self._entries[key] = (now + self.ttl_seconds, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key, returning its value if it was live."""
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Remove every key matching predicate; scans all entries."""
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        self._evict(time.monotonic())
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the oldest ones while over maxsize."""
+        while self._entries:
+            key = next(iter(self._entries))
+            if self._entries[key][0] > now and len(self._entries) < self.maxsize:
+                break
+            del self._entries[key]
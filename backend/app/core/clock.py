@@ -0,0 +1,27 @@
+"""
+Coarse, cached UTC timestamps for hot response paths.
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+# ISO timestamp refreshed by run_clock; None until the clock task starts
+_now_iso: Optional[str] = None
+
+
+def utcnow_iso() -> str:
+    """Get the current UTC time as an ISO string, to one-second granularity
+    when the clock task is running.
+    """
+    return _now_iso or datetime.utcnow().isoformat()
+
+
+async def run_clock(interval: float = 1.0) -> None:
+    """Refresh the cached timestamp every interval seconds until cancelled."""
+    global _now_iso
+    try:
+        while True:
+            _now_iso = datetime.utcnow().isoformat(timespec="seconds")
+            await asyncio.sleep(interval)
+    finally:
+        _now_iso = None
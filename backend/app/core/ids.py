@@ -0,0 +1,39 @@
+"""
+Random prefixed IDs for OFB records.
+"""
+import os
+import threading
+
+_ID_BYTES = 8
+_BATCH_IDS = 512
+
+_lock = threading.Lock()
+# urandom bytes shared by the next IDs, refilled once per batch
+_buffer = b""
+_offset = 0
+
+
+def _reset_buffer() -> None:
+    """Drop buffered bytes so a forked worker never repeats its parent's IDs."""
+    global _buffer, _offset
+    _buffer = b""
+    _offset = 0
+
+
+os.register_at_fork(after_in_child=_reset_buffer)
+
+
+def short_id(prefix: str) -> str:
+    """Get a random ``<prefix>_<16 hex chars>`` ID.
+
+    Randomness is read from os.urandom once per batch of IDs rather than
+    once per ID.
+    """
+    global _buffer, _offset
+    with _lock:
+        if _offset >= len(_buffer):
+            _buffer = os.urandom(_ID_BYTES * _BATCH_IDS)
+            _offset = 0
+        chunk = _buffer[_offset:_offset + _ID_BYTES]
+        _offset += _ID_BYTES
+    return f"{prefix}_{chunk.hex()}"
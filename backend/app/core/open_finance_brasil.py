@@ -10,18 +10,24 @@ import json
 import logging
 import secrets
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from urllib.parse import urlencode, urljoin
 
 import httpx
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from fastapi import HTTPException
+from fastapi import HTTPException, status
 from pydantic import BaseModel, Field
 
+from ..config_ofb import ofb_settings
+from .cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
+# Caps concurrent outbound OFB requests across the whole process
+_outbound_limiter = asyncio.Semaphore(ofb_settings.ofb_max_concurrency)
+
 
 class OFBConfig(BaseModel):
     """Open Finance Brasil configuration"""
@@ -47,6 +53,10 @@ class OFBConfig(BaseModel):
     request_timeout: int = Field(default=30, description="Request timeout in seconds")
     max_retries: int = Field(default=3, description="Maximum retry attempts")
     
+    # Connection Pooling
+    max_connections: int = Field(default=50, description="Maximum pooled API connections")
+    keepalive_expiry: float = Field(default=60.0, description="Idle API connection lifetime in seconds")
+    
     # Rate Limiting
     rate_limit_requests: int = Field(default=100, description="Rate limit requests per window")
     rate_limit_window: int = Field(default=60, description="Rate limit window in seconds")
@@ -399,24 +409,54 @@ class OFBConsentManager:
 
 
 class OFBAPIClient:
-    """Base HTTP client for Open Finance Brasil APIs with MTLS"""
+    """Base HTTP client for Open Finance Brasil APIs with MTLS
+    
+    One pooled MTLS client is shared by every request, so keep-alive
+    connections skip the TCP and TLS handshakes; the bearer token is sent
+    per request.
+    """
     
     def __init__(self, config: OFBConfig):
         self.config = config
         self.base_url = config.api_base_url
-        
-    async def _get_authenticated_client(self, access_token: str) -> httpx.AsyncClient:
-        """Get authenticated HTTP client with MTLS and bearer token"""
-        return httpx.AsyncClient(
-            cert=(self.config.transport_cert_path, self.config.transport_key_path),
-            verify=self.config.ca_bundle_path,
-            timeout=self.config.request_timeout,
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json",
-                "Content-Type": "application/json"
-            }
-        )
+        self._client: Optional[httpx.AsyncClient] = None
+        
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled MTLS client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                cert=(self.config.transport_cert_path, self.config.transport_key_path),
+                verify=self.config.ca_bundle_path,
+                timeout=self.config.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_connections,
+                    keepalive_expiry=self.config.keepalive_expiry
+                ),
+                headers={
+                    "Accept": "application/json",
+                    "Content-Type": "application/json"
+                }
+            )
+        return self._client
+    
+    @staticmethod
+    def _auth_headers(access_token: str) -> Dict[str, str]:
+        """Get the bearer token header for one request"""
+        return {"Authorization": f"Bearer {access_token}"}
+    
+    async def get(self, path: str, access_token: str, params: Optional[Dict] = None) -> Dict:
+        """Send an authenticated GET request to an OFB API path, waiting for an outbound slot"""
+        async with _outbound_limiter:
+            response = await self._get_client().get(path, params=params, headers=self._auth_headers(access_token))
+        return await self._handle_response(response)
+    
+    async def aclose(self) -> None:
+        """Close the pooled client and its connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def _handle_response(self, response: httpx.Response) -> Dict:
         """Handle API response with error handling"""
@@ -452,11 +492,19 @@ class OpenFinanceBrasilIntegration:
         self.consent_manager = OFBConsentManager(config, self.oauth_client)
         self.api_client = OFBAPIClient(config)
         
+        # Granted access checks, keyed by (consent_id, permissions); denials are not cached
+        self._access_cache = TTLCache(ofb_settings.ofb_access_cache_ttl, maxsize=10_000)
+        self._access_checks: Dict[Tuple[str, FrozenSet[str]], asyncio.Task] = {}
+        
     async def initialize(self) -> None:
         """Initialize the integration module"""
         await self.cert_manager.load_certificates()
         logger.info("Open Finance Brasil integration initialized successfully")
     
+    async def aclose(self) -> None:
+        """Release the integration's pooled API connections"""
+        await self.api_client.aclose()
+    
     async def get_health_status(self) -> Dict:
         """Get integration health status"""
         return {
@@ -517,5 +565,87 @@ class OpenFinanceBrasilIntegration:
     async def validate_access(self,
                             consent_id: str,
                             required_permissions: List[str]) -> bool:
-        """Validate access for required permissions"""
-        return await self.consent_manager.validate_consent(consent_id, required_permissions)
+        """Validate access for required permissions
+        
+        Granted checks are cached briefly, and concurrent checks for the same
+        consent and permissions share one validation.
+        """
+        key = (consent_id, frozenset(required_permissions))
+        if self._access_cache.get(key):
+            return True
+        
+        check = self._access_checks.get(key)
+        if check is None:
+            check = asyncio.create_task(
+                self.consent_manager.validate_consent(consent_id, required_permissions)
+            )
+            self._access_checks[key] = check
+            check.add_done_callback(lambda _: self._access_checks.pop(key, None))
+        
+        has_access = await asyncio.shield(check)
+        if has_access:
+            self._access_cache.set(key, True)
+        return has_access
+    
+    def invalidate_access(self, consent_id: str) -> None:
+        """Forget cached access checks for a consent, e.g. after it is revoked"""
+        self._access_cache.discard_where(lambda key: key[0] == consent_id)
+    
+    async def get_account_transactions(self,
+                                       account_id: str,
+                                       access_token: str,
+                                       params: Optional[Dict] = None) -> Dict:
+        """Get a page of account transactions from the OFB Accounts API"""
+        return await self.api_client.get(
+            f"/open-banking/accounts/v2/accounts/{account_id}/transactions",
+            access_token,
+            params=params
+        )
+
+
+# Process-wide integration, so certificates are loaded once rather than per request
+_shared_integration: Optional[OpenFinanceBrasilIntegration] = None
+_shared_integration_lock = asyncio.Lock()
+
+
+async def get_shared_integration() -> OpenFinanceBrasilIntegration:
+    """Get the shared OFB integration, creating and initializing it on first use"""
+    global _shared_integration
+    
+    if _shared_integration is None:
+        async with _shared_integration_lock:
+            if _shared_integration is None:
+                if not ofb_settings.is_configured():
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Open Finance Brasil integration not configured"
+                    )
+                
+                config = OFBConfig(
+                    client_id=ofb_settings.ofb_client_id,
+                    client_secret=ofb_settings.ofb_client_secret,
+                    redirect_uri=ofb_settings.ofb_redirect_uri,
+                    **ofb_settings.get_endpoints(),
+                    **ofb_settings.get_certificate_paths(),
+                    request_timeout=ofb_settings.ofb_request_timeout,
+                    max_retries=ofb_settings.ofb_max_retries,
+                    max_connections=ofb_settings.ofb_max_connections,
+                    keepalive_expiry=ofb_settings.ofb_keepalive_expiry,
+                    rate_limit_requests=ofb_settings.ofb_rate_limit_requests,
+                    rate_limit_window=ofb_settings.ofb_rate_limit_window
+                )
+                
+                integration = OpenFinanceBrasilIntegration(config)
+                await integration.initialize()
+                _shared_integration = integration
+    
+    return _shared_integration
+
+
+async def close_shared_integration() -> None:
+    """Close the shared OFB integration's connections, if it was created"""
+    global _shared_integration
+    
+    if _shared_integration is not None:
+        await _shared_integration.aclose()
+        _shared_integration = None
@@ -1,7 +1,9 @@
 """
 Database configuration and session management.
 """
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
@@ -10,6 +12,8 @@ from typing import Generator
 
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 # Create database engine
 engine = create_engine(
     settings.database_url,
@@ -20,6 +24,11 @@ engine = create_engine(
     } if "sqlite" in settings.database_url else {},
     poolclass=StaticPool if "sqlite" in settings.database_url else None,
     pool_pre_ping=True,
+    **({} if "sqlite" in settings.database_url else {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_recycle": settings.database_pool_recycle,
+    }),
 )
 
 # Create session factory
@@ -56,9 +65,48 @@ def get_db_context() -> Generator[Session, None, None]:
         db.close()
 
 
+def external_id_is_unique(bind) -> bool:
+    """Check whether transactions.external_id has a unique index or constraint."""
+    inspector = inspect(bind)
+    return any(
+        index["unique"] and index["column_names"] == ["external_id"]
+        for index in inspector.get_indexes("transactions")
+    ) or any(
+        constraint["column_names"] == ["external_id"]
+        for constraint in inspector.get_unique_constraints("transactions")
+    )
+
+
+def _ensure_unique_external_id(conn) -> None:
+    """Make external_id unique on transactions tables created before it was.
+    
+    create_all never alters existing tables, so older databases keep a plain
+    index. It is replaced by a unique one unless duplicate external_ids are
+    already stored; OFB imports then fall back to a plain insert.
+    """
+    if external_id_is_unique(conn):
+        return
+    
+    duplicates = conn.execute(text(
+        "SELECT COUNT(*) FROM (SELECT external_id FROM transactions WHERE external_id IS NOT NULL "
+        "GROUP BY external_id HAVING COUNT(*) > 1) AS duplicated"
+    )).scalar()
+    if duplicates:
+        logger.warning(
+            f"transactions.external_id is not unique: {duplicates} IDs are stored more than once. "
+            "Remove the duplicate rows and restart to add the unique index."
+        )
+        return
+    
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_external_id"))
+    conn.execute(text("CREATE UNIQUE INDEX ix_transactions_external_id ON transactions (external_id)"))
+
+
 def init_db() -> None:
     """Initialize database with tables."""
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _ensure_unique_external_id(conn)
 
 
 def close_db() -> None:
@@ -3,12 +3,17 @@ Main FastAPI application for the CashFlow Monitor.
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, ORJSONResponse
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import uvicorn
 
 from .config import settings
-from .database import init_db, close_db
+from .database import SessionLocal, init_db, close_db
+from .config_ofb import ofb_settings
+from .core.clock import run_clock
+from .core.open_finance_brasil import close_shared_integration, get_shared_integration
+from .services.ofb_sync_service import run_sync_scheduler
 from .api.v1.router import api_router
 
 
@@ -27,10 +32,33 @@ async def lifespan(app: FastAPI):
         print(f"❌ Database initialization failed: {e}")
         raise
     
+    # Initialize the shared Open Finance Brasil integration once
+    scheduler_task = None
+    if ofb_settings.is_configured():
+        try:
+            app.state.ofb = await get_shared_integration()
+            print("✅ Open Finance Brasil integration initialized")
+        except Exception as e:
+            print(f"⚠️ Open Finance Brasil integration unavailable: {e}")
+        
+        # Run scheduled account syncs as they come due
+        scheduler_task = asyncio.create_task(
+            run_sync_scheduler(SessionLocal, ofb_settings.ofb_sync_poll_interval)
+        )
+    
+    # Keep a cached timestamp for response fields that only need seconds
+    clock_task = asyncio.create_task(run_clock())
+    
     yield
     
     # Shutdown
     print("🛑 Shutting down CashFlow Monitor Application...")
+    for task in (clock_task, scheduler_task):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await close_shared_integration()
     close_db()
     print("✅ Database connections closed")
 
@@ -42,6 +70,7 @@ app = FastAPI(
     version=settings.app_version,
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
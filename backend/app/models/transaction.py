@@ -4,9 +4,9 @@ Transaction model for financial transactions.
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional, List
-from sqlalchemy import Column, String, Date, Numeric, Boolean, Text, JSON, DateTime, ForeignKey, Index
+from sqlalchemy import Column, String, Date, Numeric, Boolean, Text, JSON, DateTime, ForeignKey, Index, DDL, event, text
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 import uuid
 
 from ..database import Base
@@ -39,12 +39,12 @@ class Transaction(Base):
     country_code = Column(String(2), default="BR", nullable=False)
     reference_number = Column(String(100), nullable=True)
     institution_code = Column(String(50), nullable=True)
-    external_id = Column(String(100), nullable=True, index=True)  # For OFB transaction IDs
+    external_id = Column(String(100), nullable=True, unique=True, index=True)  # For OFB transaction IDs
     
     # Additional metadata
     is_recurring = Column(Boolean, default=False)
     recurring_pattern = Column(String(50), nullable=True)
-    tags = Column(JSON, nullable=True)  # List of tags
+    tags = Column(JSON().with_variant(JSONB, 'postgresql'), nullable=True)  # List of tags
     notes = Column(Text, nullable=True)
     
     # Timestamps
@@ -62,6 +62,24 @@ class Transaction(Base):
         Index('idx_transactions_category', 'category_id'),
         Index('idx_transactions_account', 'account'),
         Index('idx_transactions_created', 'created_at'),
+        # Covers the (date, created_at, id) newest-first order used for keyset pagination
+        Index('idx_transactions_date_created_id', 'date', 'created_at', 'id'),
+        # Narrows duplicate detection to same-amount rows within a few days
+        Index('idx_transactions_date_amount', 'date', 'amount'),
+        # Trigram index for fuzzy description matching (PostgreSQL only)
+        Index(
+            'idx_transactions_description_trgm', 'description',
+            postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        # Tag containment filters (PostgreSQL only)
+        Index(
+            'idx_transactions_tags', 'tags',
+            postgresql_using='gin', postgresql_ops={'tags': 'jsonb_path_ops'}
+        ).ddl_if(dialect='postgresql'),
+        # Backs monthly statistics (PostgreSQL only); date is cast so the expression is immutable
+        Index(
+            'idx_transactions_date_month', text("date_trunc('month', CAST(date AS TIMESTAMP WITHOUT TIME ZONE))")
+        ).ddl_if(dialect='postgresql'),
     )
     
     def __repr__(self) -> str:
@@ -117,3 +135,10 @@ class Transaction(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+event.listen(
+    Transaction.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
@@ -44,15 +44,16 @@ class PaginationParams(BaseModel):
 class PaginatedResponse(BaseModel):
     """Paginated response wrapper."""
     items: List[Any] = Field(..., description="List of items for current page")
-    total: int = Field(..., description="Total number of items")
+    total: Optional[int] = Field(None, description="Total number of items, if counted")
     page: int = Field(..., description="Current page number")
     size: int = Field(..., description="Page size")
-    pages: int = Field(..., description="Total number of pages")
+    pages: Optional[int] = Field(None, description="Total number of pages, if counted")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the page after this one, if any")
     
     @validator('pages', pre=True, always=True)
     def calculate_pages(cls, v, values):
         """Calculate total pages based on total items and page size."""
-        if 'total' in values and 'size' in values:
+        if values.get('total') is not None and values.get('size'):
             return (values['total'] + values['size'] - 1) // values['size']
         return v
 
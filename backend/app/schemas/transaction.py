@@ -53,10 +53,11 @@ class TransactionResponse(TransactionBase):
 class TransactionListResponse(BaseModel):
     """Schema for transaction list response."""
     transactions: List[TransactionResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class TransactionFilters(BaseModel):
@@ -1,7 +1,8 @@
 """
 Categorization service for automatic transaction categorization.
 """
-from typing import List, Optional, Dict, Any
+import functools
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc
@@ -11,22 +12,51 @@ from ..models.categorization_rule import CategorizationRule
 from ..models.category import Category
 from ..models.transaction import Transaction
 
+# Distinct (description, amount, merchant) suggestions remembered per service
+_SUGGESTION_CACHE_SIZE = 4096
+
 
 class CategorizationService:
     """Service for automatic transaction categorization."""
     
     def __init__(self, db: Session):
         self.db = db
+        self._active_rules: Optional[List[CategorizationRule]] = None
+        self._categories: Dict[UUID, Optional[Category]] = {}
+        # Repeated inputs, such as recurring transactions, are only matched once
+        self._cached_category_id = functools.lru_cache(maxsize=_SUGGESTION_CACHE_SIZE)(self._match_category_id)
     
-    def suggest_category(self, description: str, amount: float, merchant: Optional[str] = None) -> Optional[Category]:
-        """Suggest a category for a transaction based on description and amount."""
+    def invalidate_rule_cache(self) -> None:
+        """Drop cached rules, categories and suggestions so the next suggestion reloads them."""
+        self._active_rules = None
+        self._categories.clear()
+        self._cached_category_id.cache_clear()
+    
+    def _get_active_rules(self) -> List[CategorizationRule]:
+        """Get active categorization rules, loading them once per service instance."""
+        if self._active_rules is None:
+            self._active_rules = self.db.query(CategorizationRule).filter(
+                CategorizationRule.is_active == True
+            ).order_by(desc(CategorizationRule.priority), desc(CategorizationRule.confidence_score)).all()
+        return self._active_rules
+    
+    def _get_category(self, category_id: UUID) -> Optional[Category]:
+        """Get a category by ID, caching lookups per service instance."""
+        if category_id not in self._categories:
+            self._categories[category_id] = self.db.query(Category).filter(Category.id == category_id).first()
+        return self._categories[category_id]
+    
+    def suggest_category_id(self, description: str, amount: float, merchant: Optional[str] = None) -> Optional[UUID]:
+        """Suggest a category ID for a transaction without loading the category."""
+        return self._cached_category_id(description, amount, merchant)
+    
+    def _match_category_id(self, description: str, amount: float, merchant: Optional[str]) -> Optional[UUID]:
+        """Match a transaction against the active rules."""
         if not description:
             return None
         
         # Get all active categorization rules
-        rules = self.db.query(CategorizationRule).filter(
-            CategorizationRule.is_active == True
-        ).order_by(desc(CategorizationRule.priority), desc(CategorizationRule.confidence_score)).all()
+        rules = self._get_active_rules()
         
         best_match = None
         best_score = 0.0
@@ -39,10 +69,26 @@ class CategorizationService:
                     best_match = rule
         
         if best_match and best_match.category_id:
-            return self.db.query(Category).filter(Category.id == best_match.category_id).first()
+            return best_match.category_id
         
         return None
     
+    def suggest_category(self, description: str, amount: float, merchant: Optional[str] = None) -> Optional[Category]:
+        """Suggest a category for a transaction based on description and amount."""
+        category_id = self.suggest_category_id(description, amount, merchant)
+        if category_id is None:
+            return None
+        return self._get_category(category_id)
+    
+    def suggest_category_ids_bulk(self,
+                                  transactions: List[Tuple[str, float, Optional[str]]]) -> List[Optional[UUID]]:
+        """Suggest category IDs for many (description, amount, merchant) inputs at once.
+        
+        Rules are loaded once for the whole batch and repeated inputs are
+        answered from the suggestion cache.
+        """
+        return [self.suggest_category_id(*transaction) for transaction in transactions]
+    
     def auto_categorize_transaction(self, transaction: Transaction) -> Optional[Category]:
         """Automatically categorize a transaction."""
         if not transaction.description:
@@ -124,6 +170,7 @@ class CategorizationService:
         self.db.add(rule)
         self.db.commit()
         self.db.refresh(rule)
+        self.invalidate_rule_cache()
         
         return rule
     
@@ -152,6 +199,7 @@ class CategorizationService:
         
         self.db.commit()
         self.db.refresh(rule)
+        self.invalidate_rule_cache()
         
         return rule
     
@@ -167,6 +215,7 @@ class CategorizationService:
         
         self.db.delete(rule)
         self.db.commit()
+        self.invalidate_rule_cache()
         return True
     
     def get_categorization_accuracy(self, date_range: Optional[tuple] = None) -> Dict[str, Any]:
@@ -1,15 +1,21 @@
 """
 Import service for processing various file formats.
 """
-from typing import List, Optional, Dict, Any
+from typing import BinaryIO, List, Optional, Dict, Any, Tuple, Union
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from decimal import Decimal
 from uuid import UUID, uuid4
 import csv
+import heapq
 import io
 import json
+import re
+import time
+from dataclasses import dataclass
 
+from ..config import settings
 from ..models.transaction import Transaction
 from ..models.category import Category
 from ..schemas.import_export import (
@@ -22,58 +28,135 @@ from ..schemas.import_export import (
 from ..services.categorization_service import CategorizationService
 
 
+@dataclass(slots=True)
+class ParsedTransaction:
+    """Transaction parsed from an import file, with its amount in integer cents."""
+    date: date
+    amount_cents: int
+    description: str
+    transaction_type: str
+    category_id: Optional[UUID] = None  # Set by categorization service
+    currency: str = "BRL"
+    reference_number: Optional[str] = None
+    institution_code: Optional[str] = None
+
+
+class ImportSessionStore:
+    """In-memory import session storage with time-based expiry.
+    
+    Sessions are dropped once they are older than ``ttl_seconds``, so memory
+    scales with active previews rather than every preview ever created.
+    """
+    
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._expires_at: Dict[str, float] = {}  # Insertion order == expiry order
+    
+    def get(self, import_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session by import ID."""
+        self._evict_expired()
+        return self._sessions.get(str(import_id))
+    
+    def set(self, import_id: str, session: Dict[str, Any]) -> None:
+        """Store a session, resetting its expiry."""
+        import_id = str(import_id)
+        self._evict_expired()
+        self._expires_at.pop(import_id, None)
+        self._sessions[import_id] = session
+        self._expires_at[import_id] = time.monotonic() + self.ttl_seconds
+    
+    def delete(self, import_id: str) -> bool:
+        """Delete a session, returning whether it existed."""
+        import_id = str(import_id)
+        self._expires_at.pop(import_id, None)
+        return self._sessions.pop(import_id, None) is not None
+    
+    def values(self) -> List[Dict[str, Any]]:
+        """Get all live sessions."""
+        self._evict_expired()
+        return list(self._sessions.values())
+    
+    def __len__(self) -> int:
+        self._evict_expired()
+        return len(self._sessions)
+    
+    def _evict_expired(self) -> None:
+        """Drop sessions whose TTL has elapsed."""
+        now = time.monotonic()
+        while self._expires_at:
+            import_id = next(iter(self._expires_at))
+            if self._expires_at[import_id] > now:
+                break
+            del self._expires_at[import_id]
+            self._sessions.pop(import_id, None)
+
+
 class ImportService:
     """Service for importing transactions from various file formats."""
     
+    # OFX is SGML, so closing tags are optional: a transaction block ends at
+    # its closing tag, the next block, or end of file.
+    _STMTTRN_RE = re.compile(
+        r"<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|\Z)", re.DOTALL
+    )
+    _FIELD_RE = re.compile(r"<(TRNAMT|DTPOSTED|MEMO)>([^<\r\n]*)")
+    
+    # Validation only looks at the headers and first rows, held within this many bytes
+    _VALIDATION_SAMPLE_SIZE = 64 * 1024
+    
+    # Accepted CSV date formats, in order of precedence
+    _DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%m-%d-%Y")
+    
+    # Currency symbols and thousands separators removed from CSV amounts in one pass
+    _AMOUNT_STRIP = str.maketrans("", "", "R$,")
+    
+    # Transaction columns every imported row must fill
+    _REQUIRED_TRANSACTION_FIELDS = ("date", "amount", "description", "transaction_type")
+    
     def __init__(self):
-        self.import_sessions = {}  # In-memory storage for import sessions
+        self.import_sessions = ImportSessionStore(settings.import_session_ttl)
     
-    def process_csv_file(self, content: bytes, auto_categorize: bool = True, 
-                        skip_duplicates: bool = True, db: Session = None) -> ImportPreviewResponse:
-        """Process CSV file and return import preview."""
+    def process_csv_file(self, content: Union[bytes, BinaryIO], auto_categorize: bool = True, 
+                        skip_duplicates: bool = True, db: Session = None,
+                        categorization_service: Optional[CategorizationService] = None) -> ImportPreviewResponse:
+        """Process CSV file and return import preview.
+        
+        content may be the raw bytes or a binary file object, which is parsed
+        as a stream without reading the whole file into memory.
+        """
         try:
-            # Decode content
-            text_content = content.decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(text_content))
-            
-            # Process rows
-            transactions = []
-            errors = []
-            
-            for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 (1 is header)
+            # Process rows, starting at 2 (1 is header)
+            if not isinstance(content, (bytes, bytearray)):
+                text_stream = io.TextIOWrapper(content, encoding='utf-8', newline='')
                 try:
-                    transaction = self._parse_csv_row(row, row_num)
-                    if transaction:
-                        transactions.append(transaction)
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
+                    transactions, errors = self._parse_csv_rows(csv.DictReader(text_stream), 2)
+                finally:
+                    text_stream.detach()  # Leave the caller's file open
+            else:
+                transactions, errors = self._parse_csv_rows(self._open_csv(content), 2)
             
             # Auto-categorize if requested
             if auto_categorize and db:
-                categorization_service = CategorizationService(db)
-                for transaction in transactions:
-                    category = categorization_service.suggest_category(
-                        transaction["description"], float(transaction["amount"])
-                    )
-                    if category:
-                        transaction["category_id"] = category.id
+                self._categorize(transactions, categorization_service or CategorizationService(db))
             
             # Create import session
             import_id = str(uuid4())
-            self.import_sessions[import_id] = {
+            self.import_sessions.set(import_id, {
+                "import_id": import_id,
                 "transactions": transactions,
                 "errors": errors,
                 "status": "preview",
                 "created_at": datetime.utcnow(),
                 "file_type": "csv"
-            }
+            })
             
             return ImportPreviewResponse(
                 import_id=import_id,
                 total_transactions=len(transactions),
                 valid_transactions=len(transactions),
                 errors=errors,
-                preview_data=transactions[:10],  # First 10 transactions
+                preview_data=[self._to_transaction_data(t) for t in transactions[:10]],  # First 10 transactions
                 status="preview"
             )
             
@@ -88,7 +171,8 @@ class ImportService:
             )
     
     def process_ofx_file(self, content: bytes, auto_categorize: bool = True,
-                         skip_duplicates: bool = True, db: Session = None) -> ImportPreviewResponse:
+                         skip_duplicates: bool = True, db: Session = None,
+                         categorization_service: Optional[CategorizationService] = None) -> ImportPreviewResponse:
         """Process OFX file and return import preview."""
         try:
             # Basic OFX parsing (simplified)
@@ -99,30 +183,25 @@ class ImportService:
             
             # Auto-categorize if requested
             if auto_categorize and db:
-                categorization_service = CategorizationService(db)
-                for transaction in transactions:
-                    category = categorization_service.suggest_category(
-                        transaction["description"], float(transaction["amount"])
-                    )
-                    if category:
-                        transaction["category_id"] = category.id
+                self._categorize(transactions, categorization_service or CategorizationService(db))
             
             # Create import session
             import_id = str(uuid4())
-            self.import_sessions[import_id] = {
+            self.import_sessions.set(import_id, {
+                "import_id": import_id,
                 "transactions": transactions,
                 "errors": [],
                 "status": "preview",
                 "created_at": datetime.utcnow(),
                 "file_type": "ofx"
-            }
+            })
             
             return ImportPreviewResponse(
                 import_id=import_id,
                 total_transactions=len(transactions),
                 valid_transactions=len(transactions),
                 errors=[],
-                preview_data=transactions[:10],
+                preview_data=[self._to_transaction_data(t) for t in transactions[:10]],
                 status="preview"
             )
             
@@ -146,13 +225,14 @@ class ImportService:
             transactions = []
             
             import_id = str(uuid4())
-            self.import_sessions[import_id] = {
+            self.import_sessions.set(import_id, {
+                "import_id": import_id,
                 "transactions": transactions,
                 "errors": ["Excel processing not yet implemented"],
                 "status": "preview",
                 "created_at": datetime.utcnow(),
                 "file_type": "excel"
-            }
+            })
             
             return ImportPreviewResponse(
                 import_id=import_id,
@@ -175,28 +255,30 @@ class ImportService:
     
     def confirm_import(self, import_id: str, db: Session) -> Optional[ImportResultResponse]:
         """Confirm and execute a previewed import operation."""
-        if import_id not in self.import_sessions:
+        session = self.import_sessions.get(import_id)
+        if session is None:
             return None
-        
-        session = self.import_sessions[import_id]
         if session["status"] != "preview":
             return None
         
         try:
-            # Import transactions to database
-            imported_count = 0
+            # Validate all rows up front so the insert itself needs no per-row handling
+            rows = []
             errors = []
             
-            for transaction_data in session["transactions"]:
-                try:
-                    # Create transaction
-                    transaction = Transaction(**transaction_data)
-                    db.add(transaction)
-                    imported_count += 1
-                except Exception as e:
-                    errors.append(f"Transaction import failed: {str(e)}")
+            for transaction in session["transactions"]:
+                row = self._to_transaction_data(transaction)
+                missing_fields = [field for field in self._REQUIRED_TRANSACTION_FIELDS if row.get(field) is None]
+                if missing_fields:
+                    errors.append(f"Transaction import failed: missing {', '.join(missing_fields)}")
+                else:
+                    rows.append(row)
             
+            # Import transactions to database in a single executemany
+            if rows:
+                db.execute(insert(Transaction), rows)
             db.commit()
+            imported_count = len(rows)
             
             # Update session status
             session["status"] = "completed"
@@ -226,28 +308,28 @@ class ImportService:
     
     def get_import_preview(self, import_id: str, db: Session) -> Optional[ImportPreviewResponse]:
         """Get import preview for a specific import operation."""
-        if import_id not in self.import_sessions:
+        session = self.import_sessions.get(import_id)
+        if session is None:
             return None
         
-        session = self.import_sessions[import_id]
-        
         return ImportPreviewResponse(
             import_id=import_id,
             total_transactions=len(session["transactions"]),
             valid_transactions=len(session["transactions"]),
             errors=session.get("errors", []),
-            preview_data=session["transactions"][:10],
+            preview_data=[self._to_transaction_data(t) for t in session["transactions"][:10]],
             status=session["status"]
         )
     
     def get_import_history(self, limit: int = 50, offset: int = 0, db: Session = None) -> List[ImportHistoryResponse]:
         """Get import operation history."""
-        # Return recent import sessions
-        sessions = list(self.import_sessions.values())
-        sessions.sort(key=lambda x: x["created_at"], reverse=True)
+        # Return recent import sessions, selecting only the requested page
+        sessions = heapq.nlargest(
+            offset + limit, self.import_sessions.values(), key=lambda x: x["created_at"]
+        )
         
         history = []
-        for session in sessions[offset:offset + limit]:
+        for session in sessions[offset:]:
             history.append(ImportHistoryResponse(
                 import_id=session.get("import_id", ""),
                 file_type=session["file_type"],
@@ -267,25 +349,23 @@ class ImportService:
         
         try:
             if filename.lower().endswith('.csv'):
-                # Validate CSV format
-                text_content = content.decode('utf-8')
-                csv_reader = csv.DictReader(io.StringIO(text_content))
+                # Validate CSV format from the header line and first 5 rows only
+                lines = self._validation_sample(content).split(b"\n", 6)
+                fieldnames = next(csv.reader([lines[0].decode('utf-8')]), [])
                 
-                if not csv_reader.fieldnames:
+                if not fieldnames:
                     errors.append("No headers found in CSV file")
                 else:
                     required_fields = ["date", "amount", "description"]
-                    missing_fields = [field for field in required_fields if field not in csv_reader.fieldnames]
+                    missing_fields = [field for field in required_fields if field not in fieldnames]
                     if missing_fields:
                         errors.append(f"Missing required fields: {', '.join(missing_fields)}")
                     
-                    # Check first few rows for data quality
+                    # Check first 5 rows for data quality
                     row_count = 0
-                    for row in csv_reader:
-                        row_count += 1
-                        if row_count > 5:  # Check first 5 rows
-                            break
-                        
+                    sample_rows = csv.reader(line.decode('utf-8') for line in lines[1:6])
+                    for row_count, values in enumerate(filter(None, sample_rows), start=1):
+                        row = dict(zip(fieldnames, values))
                         # Validate date
                         try:
                             datetime.strptime(row.get("date", ""), "%Y-%m-%d")
@@ -303,10 +383,9 @@ class ImportService:
             
             elif filename.lower().endswith(('.ofx', '.qfx')):
                 # Basic OFX validation
-                text_content = content.decode('utf-8', errors='ignore')
-                if "<OFX>" not in text_content:
+                if content.find(b"<OFX>") == -1:
                     errors.append("Invalid OFX file format")
-                if "<STMTTRN>" not in text_content:
+                if content.find(b"<STMTTRN>") == -1:
                     warnings.append("No transaction data found in OFX file")
             
             elif filename.lower().endswith(('.xlsx', '.xls')):
@@ -325,7 +404,8 @@ class ImportService:
             errors=errors,
             warnings=warnings,
             filename=filename,
-            file_size=len(content)
+            file_size=len(content),
+            supported_format=filename.lower().endswith(('.csv', '.ofx', '.qfx', '.xlsx', '.xls'))
         )
     
     def detect_duplicates(self, content: bytes, filename: str, threshold: float, db: Session) -> DuplicateDetectionResponse:
@@ -334,8 +414,7 @@ class ImportService:
         
         try:
             if filename.lower().endswith('.csv'):
-                text_content = content.decode('utf-8')
-                csv_reader = csv.DictReader(io.StringIO(text_content))
+                csv_reader = self._open_csv(content)
                 
                 transactions = []
                 for row in csv_reader:
@@ -346,11 +425,11 @@ class ImportService:
                 # Simple duplicate detection based on amount and description
                 for i, t1 in enumerate(transactions):
                     for j, t2 in enumerate(transactions[i+1:], i+1):
-                        if (abs(t1["amount"] - t2["amount"]) < 0.01 and
-                            t1["description"].lower() == t2["description"].lower()):
+                        if (t1.amount_cents == t2.amount_cents and
+                            t1.description.lower() == t2.description.lower()):
                             duplicates.append({
-                                "transaction1": {"row": i+2, "data": t1},
-                                "transaction2": {"row": j+2, "data": t2},
+                                "transaction1": {"row": i+2, "data": self._to_transaction_data(t1)},
+                                "transaction2": {"row": j+2, "data": self._to_transaction_data(t2)},
                                 "similarity_score": 1.0
                             })
             
@@ -365,17 +444,13 @@ class ImportService:
     
     def cancel_import(self, import_id: str, db: Session) -> bool:
         """Cancel a pending import operation."""
-        if import_id in self.import_sessions:
-            del self.import_sessions[import_id]
-            return True
-        return False
+        return self.import_sessions.delete(import_id)
     
     def get_import_status(self, import_id: str, db: Session) -> Optional[Dict[str, Any]]:
         """Get status of an import operation."""
-        if import_id not in self.import_sessions:
+        session = self.import_sessions.get(import_id)
+        if session is None:
             return None
-        
-        session = self.import_sessions[import_id]
         return {
             "import_id": import_id,
             "status": session["status"],
@@ -387,7 +462,43 @@ class ImportService:
             "errors": session.get("errors", [])
         }
     
-    def _parse_csv_row(self, row: Dict[str, str], row_num: int) -> Optional[Dict[str, Any]]:
+    def _categorize(self, transactions: List[ParsedTransaction],
+                    categorization_service: CategorizationService) -> None:
+        """Set suggested category IDs on parsed transactions in place."""
+        for transaction in transactions:
+            transaction.category_id = categorization_service.suggest_category_id(
+                transaction.description, transaction.amount_cents / 100
+            )
+    
+    def _parse_csv_rows(self, csv_reader: csv.DictReader,
+                        first_row_num: int) -> Tuple[List[ParsedTransaction], List[str]]:
+        """Parse CSV rows, collecting valid transactions and per-row errors."""
+        transactions = []
+        errors = []
+        
+        for row_num, row in enumerate(csv_reader, start=first_row_num):
+            try:
+                transaction = self._parse_csv_row(row, row_num)
+                if transaction:
+                    transactions.append(transaction)
+            except Exception as e:
+                errors.append(f"Row {row_num}: {str(e)}")
+        
+        return transactions, errors
+    
+    def _validation_sample(self, content: bytes) -> bytes:
+        """Get the leading complete lines of content used for validation."""
+        if len(content) <= self._VALIDATION_SAMPLE_SIZE:
+            return content
+        sample = content[:self._VALIDATION_SAMPLE_SIZE]
+        line_end = sample.rfind(b"\n")
+        return sample[:line_end + 1] if line_end != -1 else sample
+    
+    def _open_csv(self, content: bytes) -> csv.DictReader:
+        """Open CSV content for reading, decoding lazily as rows are consumed."""
+        return csv.DictReader(io.TextIOWrapper(io.BytesIO(content), encoding='utf-8', newline=''))
+    
+    def _parse_csv_row(self, row: Dict[str, str], row_num: int) -> Optional[ParsedTransaction]:
         """Parse a CSV row into transaction data."""
         try:
             # Parse date
@@ -395,15 +506,7 @@ class ImportService:
             if not date_str:
                 raise ValueError("Date is required")
             
-            # Try different date formats
-            transaction_date = None
-            for date_format in ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%m-%d-%Y"]:
-                try:
-                    transaction_date = datetime.strptime(date_str, date_format).date()
-                    break
-                except ValueError:
-                    continue
-            
+            transaction_date = self._parse_date(date_str)
             if not transaction_date:
                 raise ValueError(f"Invalid date format: {date_str}")
             
@@ -413,10 +516,10 @@ class ImportService:
                 raise ValueError("Amount is required")
             
             # Remove currency symbols and commas
-            amount_str = amount_str.replace("R$", "").replace("$", "").replace(",", "").strip()
+            amount_str = amount_str.translate(self._AMOUNT_STRIP).strip()
             try:
-                amount = Decimal(amount_str)
-            except:
+                amount_cents = self._parse_amount_cents(amount_str)
+            except ValueError:
                 raise ValueError(f"Invalid amount: {amount_str}")
             
             # Get description
@@ -424,81 +527,108 @@ class ImportService:
             if not description:
                 raise ValueError("Description is required")
             
-            # Build transaction data
-            transaction_data = {
-                "date": transaction_date,
-                "amount": amount,
-                "description": description,
-                "category_id": None,  # Will be set by categorization service
-                "transaction_type": "EXPENSE" if amount < 0 else "INCOME",
-                "currency": "BRL",
-                "reference_number": row.get("reference", "").strip() or None,
-                "institution_code": row.get("institution", "").strip() or None
-            }
-            
-            return transaction_data
+            return ParsedTransaction(
+                date=transaction_date,
+                amount_cents=amount_cents,
+                description=description,
+                transaction_type="EXPENSE" if amount_cents < 0 else "INCOME",
+                reference_number=row.get("reference", "").strip() or None,
+                institution_code=row.get("institution", "").strip() or None
+            )
             
         except Exception as e:
             raise ValueError(f"Row {row_num}: {str(e)}")
     
-    def _parse_ofx_content(self, content: str) -> List[Dict[str, Any]]:
+    def _parse_date(self, date_str: str) -> Optional[date]:
+        """Parse a CSV date with the first format that accepts it.
+        
+        Formats are always tried in _DATE_FORMATS order, so an ambiguous
+        day/month date parses the same way whatever rows came before it.
+        """
+        for date_format in self._DATE_FORMATS:
+            try:
+                return self._parse_date_with_format(date_str, date_format)
+            except ValueError:
+                continue
+        
+        return None
+    
+    @staticmethod
+    def _parse_date_with_format(date_str: str, date_format: str) -> date:
+        """Parse a date with a strptime format, using the C ISO parser when possible."""
+        if date_format == "%Y-%m-%d" and len(date_str) == 10:
+            return date.fromisoformat(date_str)
+        return datetime.strptime(date_str, date_format).date()
+    
+    @staticmethod
+    def _parse_amount_cents(amount_str: str) -> int:
+        """Parse a decimal amount string into integer cents, rounding half up."""
+        sign = 1
+        if amount_str[:1] in ("-", "+"):
+            sign = -1 if amount_str[0] == "-" else 1
+            amount_str = amount_str[1:]
+        
+        int_part, _, frac_part = amount_str.partition(".")
+        if not (int_part or frac_part):
+            raise ValueError(f"Invalid amount: {amount_str}")
+        if (int_part and not int_part.isdigit()) or (frac_part and not frac_part.isdigit()):
+            raise ValueError(f"Invalid amount: {amount_str}")
+        
+        cents = int(int_part or "0") * 100 + int(frac_part[:2].ljust(2, "0"))
+        if len(frac_part) > 2 and frac_part[2] >= "5":
+            cents += 1
+        return sign * cents
+    
+    @staticmethod
+    def _to_transaction_data(transaction: ParsedTransaction) -> Dict[str, Any]:
+        """Convert a parsed transaction into model fields with a Decimal amount."""
+        return {
+            "date": transaction.date,
+            "amount": Decimal(transaction.amount_cents).scaleb(-2),
+            "description": transaction.description,
+            "category_id": transaction.category_id,
+            "transaction_type": transaction.transaction_type,
+            "currency": transaction.currency,
+            "reference_number": transaction.reference_number,
+            "institution_code": transaction.institution_code
+        }
+    
+    def _parse_ofx_content(self, content: str) -> List[ParsedTransaction]:
         """Parse OFX content and extract transactions."""
         transactions = []
         
         # Simple OFX parsing (this is a basic implementation)
         # In production, use a proper OFX parser library
         
-        # Look for transaction blocks
-        transaction_blocks = content.split("<STMTTRN>")
-        
-        for block in transaction_blocks[1:]:  # Skip first split (before first transaction)
+        # Single regex sweep over transaction blocks; fields are matched within
+        # each block's bounds on the original string, without slicing it out
+        for block_match in self._STMTTRN_RE.finditer(content):
             try:
-                # Extract transaction data
-                amount_match = self._extract_ofx_field(block, "TRNAMT")
-                date_match = self._extract_ofx_field(block, "DTPOSTED")
-                memo_match = self._extract_ofx_field(block, "MEMO")
+                fields = {}
+                for field_match in self._FIELD_RE.finditer(content, block_match.start(1), block_match.end(1)):
+                    fields.setdefault(field_match.group(1), field_match.group(2).strip())
+                
+                amount_match = fields.get("TRNAMT")
+                date_match = fields.get("DTPOSTED")
+                memo_match = fields.get("MEMO")
                 
                 if amount_match and date_match:
                     # Parse amount
-                    amount = Decimal(amount_match)
+                    amount_cents = self._parse_amount_cents(amount_match)
                     
                     # Parse date (OFX format: YYYYMMDDHHMMSS)
                     date_str = date_match[:8]  # Take YYYYMMDD part
                     transaction_date = datetime.strptime(date_str, "%Y%m%d").date()
                     
-                    # Build transaction
-                    transaction = {
-                        "date": transaction_date,
-                        "amount": amount,
-                        "description": memo_match or "OFX Transaction",
-                        "category_id": None,
-                        "transaction_type": "EXPENSE" if amount < 0 else "INCOME",
-                        "currency": "BRL",
-                        "reference_number": None,
-                        "institution_code": None
-                    }
-                    
-                    transactions.append(transaction)
+                    transactions.append(ParsedTransaction(
+                        date=transaction_date,
+                        amount_cents=amount_cents,
+                        description=memo_match or "OFX Transaction",
+                        transaction_type="EXPENSE" if amount_cents < 0 else "INCOME"
+                    ))
                     
             except Exception as e:
                 # Skip invalid transactions
                 continue
         
         return transactions
-    
-    def _extract_ofx_field(self, block: str, field_name: str) -> Optional[str]:
-        """Extract field value from OFX block."""
-        start_tag = f"<{field_name}>"
-        end_tag = f"</{field_name}>"
-        
-        start_pos = block.find(start_tag)
-        if start_pos == -1:
-            return None
-        
-        start_pos += len(start_tag)
-        end_pos = block.find(end_tag, start_pos)
-        
-        if end_pos == -1:
-            return None
-        
-        return block[start_pos:end_pos].strip()
@@ -3,157 +3,243 @@ Open Finance Brasil Account Information Service
 Phase 3: Account Discovery, Balance Retrieval, and Transaction Import
 """
 
+import asyncio
+import functools
+import itertools
 import logging
-from datetime import datetime, date, timedelta
+import threading
+import weakref
+from datetime import date, timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 from uuid import UUID
 
 from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from ..core.open_finance_brasil import OpenFinanceBrasilIntegration, OFBConfig
+from ..core.cache import TTLCache
+from ..core.clock import utcnow_iso
+from ..core.open_finance_brasil import OpenFinanceBrasilIntegration, get_shared_integration
+from ..database import external_id_is_unique
 from ..models.transaction import Transaction
 from ..models.category import Category
 from ..services.categorization_service import CategorizationService
-from ..schemas.transaction import TransactionCreate
 from ..config_ofb import ofb_settings
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# OFB transaction types mapped to local transaction types
+_TXN_TYPE_MAP: Dict[str, str] = {
+    "PURCHASE": "DESPESA",
+    "CREDIT": "RECEITA",
+    "TRANSFER": "TRANSFERENCIA",
+    "INVESTMENT": "INVESTIMENTO"
+}
+
+# Accounts rarely change within a consent; balances are kept only briefly
+_accounts_cache = TTLCache(ofb_settings.ofb_accounts_cache_ttl)
+_balance_cache = TTLCache(ofb_settings.ofb_balance_cache_ttl)
+
+
+def invalidate_consent_cache(consent_id: str) -> None:
+    """Drop cached accounts and balances of a consent, e.g. after it is revoked"""
+    _accounts_cache.pop(consent_id)
+    _balance_cache.discard_where(lambda key: key[1] == consent_id)
+
+
+# engine -> whether its transactions.external_id is unique, inspected once per engine
+_unique_external_id: "weakref.WeakKeyDictionary[Any, bool]" = weakref.WeakKeyDictionary()
+
+
+# SQLite sessions share one connection (StaticPool), so their work must never
+# interleave: one session's rollback or commit would end another's transaction
+_sqlite_lock = threading.Lock()
+
+
+def _run_exclusive(fn: Callable[..., T], *args: Any) -> T:
+    """Run a blocking database call while no other SQLite session is in one"""
+    with _sqlite_lock:
+        return fn(*args)
+
+
+def _has_unique_external_id(engine) -> bool:
+    """Check, once per engine, whether ON CONFLICT (external_id) can be used"""
+    unique = _unique_external_id.get(engine)
+    if unique is None:
+        unique = _unique_external_id[engine] = external_id_is_unique(engine)
+    return unique
+
+
+def ofb_endpoint(label: str, rollback: bool = False):
+    """Map unexpected errors in an async service method to an HTTP 500
+    
+    HTTPExceptions raised by the method pass through unchanged. With rollback
+    set, the service session is rolled back before any error propagates.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await fn(self, *args, **kwargs)
+            except Exception as e:
+                if rollback:
+                    await self._run_db(self.db.rollback)
+                if isinstance(e, HTTPException):
+                    raise
+                logger.error(f"{label} failed: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"{label} failed: {str(e)}"
+                )
+        return wrapper
+    return decorator
+
 
 class OFBAccountService:
     """Service for Open Finance Brasil Account Information APIs"""
     
+    # Seconds to wait before the first retry of a rate-limited (HTTP 429) request
+    _RATE_LIMIT_BACKOFF = 0.5
+    
+    # Imported rows inserted and committed per database transaction
+    _IMPORT_CHUNK_SIZE = 200
+    
     def __init__(self, db: Session):
         self.db = db
         self.categorization_service = CategorizationService(db)
         self.ofb_integration: Optional[OpenFinanceBrasilIntegration] = None
+        # Serializes session use across concurrent syncs sharing this service
+        self._db_lock = asyncio.Lock()
         
     async def _get_ofb_integration(self) -> OpenFinanceBrasilIntegration:
         """Get OFB integration instance"""
         if self.ofb_integration is None:
-            if not ofb_settings.is_configured():
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="Open Finance Brasil integration not configured"
-                )
-            
-            # Create OFB configuration
-            cert_paths = ofb_settings.get_certificate_paths()
-            endpoints = ofb_settings.get_endpoints()
-            
-            config = OFBConfig(
-                client_id=ofb_settings.ofb_client_id,
-                client_secret=ofb_settings.ofb_client_secret,
-                redirect_uri=ofb_settings.ofb_redirect_uri,
-                **endpoints,
-                **cert_paths,
-                request_timeout=ofb_settings.ofb_request_timeout,
-                max_retries=ofb_settings.ofb_max_retries,
-                rate_limit_requests=ofb_settings.ofb_rate_limit_requests,
-                rate_limit_window=ofb_settings.ofb_rate_limit_window
-            )
-            
-            self.ofb_integration = OpenFinanceBrasilIntegration(config)
-            await self.ofb_integration.initialize()
+            self.ofb_integration = await get_shared_integration()
         
         return self.ofb_integration
     
-    async def discover_accounts(self, consent_id: str, access_token: str) -> List[Dict[str, Any]]:
-        """Discover bank accounts for a user"""
+    async def _run_db(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a blocking call on the sync session in a worker thread
         
-        try:
-            ofb = await self._get_ofb_integration()
-            
-            # Validate consent has account permissions
-            has_access = await ofb.validate_access(consent_id, ["accounts"])
-            if not has_access:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Insufficient permissions for account discovery"
-                )
-            
-            # In production, this would call the actual OFB accounts API
-            # For now, return mock data for development
-            mock_accounts = [
-                {
-                    "accountId": "account_001",
-                    "type": "CACC",
-                    "subtype": "CURRENT_ACCOUNT",
-                    "currency": "BRL",
-                    "brandName": "Banco do Brasil",
-                    "companyCnpj": "00000000000191",
-                    "number": "12345-6",
-                    "checkDigit": "7",
-                    "agencyNumber": "1234",
-                    "agencyCheckDigit": "5",
-                    "status": "ACTIVE"
-                },
-                {
-                    "accountId": "account_002",
-                    "type": "SVGS",
-                    "subtype": "SAVINGS_ACCOUNT",
-                    "currency": "BRL",
-                    "brandName": "Banco do Brasil",
-                    "companyCnpj": "00000000000191",
-                    "number": "98765-4",
-                    "checkDigit": "3",
-                    "agencyNumber": "1234",
-                    "agencyCheckDigit": "5",
-                    "status": "ACTIVE"
-                }
-            ]
-            
-            logger.info(f"Discovered {len(mock_accounts)} accounts for consent {consent_id}")
-            return mock_accounts
-            
-        except Exception as e:
-            logger.error(f"Account discovery failed: {e}")
+        Concurrent callers, such as gathered account syncs, take turns on the
+        lock, so the session is only ever used by one thread at a time. On
+        SQLite, calls from every session in the process take turns as well;
+        each call that writes commits or rolls back before it returns.
+        """
+        async with self._db_lock:
+            if self.db.get_bind().dialect.name == "sqlite":
+                return await asyncio.to_thread(_run_exclusive, fn, *args)
+            return await asyncio.to_thread(fn, *args)
+    
+    @ofb_endpoint("Account discovery")
+    async def discover_accounts(self,
+                              consent_id: str,
+                              access_token: str,
+                              refresh: bool = False) -> List[Dict[str, Any]]:
+        """Discover bank accounts for a user, served from cache unless refresh is set
+        
+        Access is validated on every call, cache hits included.
+        """
+        
+        ofb = await self._get_ofb_integration()
+        
+        # Validate consent has account permissions
+        has_access = await ofb.validate_access(consent_id, ["accounts"])
+        if not has_access:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Account discovery failed: {str(e)}"
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions for account discovery"
             )
+        
+        if not refresh:
+            cached = _accounts_cache.get(consent_id)
+            if cached is not None:
+                return [dict(account) for account in cached]
+        
+        # In production, this would call the actual OFB accounts API
+        # For now, return mock data for development
+        mock_accounts = [
+            {
+                "accountId": "account_001",
+                "type": "CACC",
+                "subtype": "CURRENT_ACCOUNT",
+                "currency": "BRL",
+                "brandName": "Banco do Brasil",
+                "companyCnpj": "00000000000191",
+                "number": "12345-6",
+                "checkDigit": "7",
+                "agencyNumber": "1234",
+                "agencyCheckDigit": "5",
+                "status": "ACTIVE"
+            },
+            {
+                "accountId": "account_002",
+                "type": "SVGS",
+                "subtype": "SAVINGS_ACCOUNT",
+                "currency": "BRL",
+                "brandName": "Banco do Brasil",
+                "companyCnpj": "00000000000191",
+                "number": "98765-4",
+                "checkDigit": "3",
+                "agencyNumber": "1234",
+                "agencyCheckDigit": "5",
+                "status": "ACTIVE"
+            }
+        ]
+        
+        logger.info(f"Discovered {len(mock_accounts)} accounts for consent {consent_id}")
+        _accounts_cache.set(consent_id, mock_accounts)
+        return [dict(account) for account in mock_accounts]
     
+    @ofb_endpoint("Balance retrieval")
     async def get_account_balances(self, 
                                  account_id: str, 
                                  consent_id: str, 
-                                 access_token: str) -> Dict[str, Any]:
-        """Get account balance information"""
+                                 access_token: str,
+                                 refresh: bool = False) -> Dict[str, Any]:
+        """Get account balance information, served from cache unless refresh is set
         
-        try:
-            ofb = await self._get_ofb_integration()
-            
-            # Validate consent has account permissions
-            has_access = await ofb.validate_access(consent_id, ["accounts"])
-            if not has_access:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Insufficient permissions for balance retrieval"
-                )
-            
-            # In production, this would call the actual OFB balances API
-            # For now, return mock data for development
-            mock_balance = {
-                "availableAmount": "1250.75",
-                "availableAmountCurrency": "BRL",
-                "blockedAmount": "0.00",
-                "blockedAmountCurrency": "BRL",
-                "automaticallyInvestedAmount": "500.00",
-                "automaticallyInvestedAmountCurrency": "BRL",
-                "lastUpdated": datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"Retrieved balance for account {account_id}")
-            return mock_balance
-            
-        except Exception as e:
-            logger.error(f"Balance retrieval failed: {e}")
+        Access is validated on every call, cache hits included.
+        """
+        
+        ofb = await self._get_ofb_integration()
+        
+        # Validate consent has account permissions
+        has_access = await ofb.validate_access(consent_id, ["accounts"])
+        if not has_access:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Balance retrieval failed: {str(e)}"
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions for balance retrieval"
             )
+        
+        cache_key = (account_id, consent_id)
+        if not refresh:
+            cached = _balance_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+        
+        # In production, this would call the actual OFB balances API
+        # For now, return mock data for development
+        mock_balance = {
+            "availableAmount": "1250.75",
+            "availableAmountCurrency": "BRL",
+            "blockedAmount": "0.00",
+            "blockedAmountCurrency": "BRL",
+            "automaticallyInvestedAmount": "500.00",
+            "automaticallyInvestedAmountCurrency": "BRL",
+            "lastUpdated": utcnow_iso()
+        }
+        
+        logger.info(f"Retrieved balance for account {account_id}")
+        _balance_cache.set(cache_key, mock_balance)
+        return dict(mock_balance)
     
+    @ofb_endpoint("Transaction retrieval")
     async def get_account_transactions(self,
                                      account_id: str,
                                      consent_id: str,
@@ -164,25 +250,40 @@ class OFBAccountService:
                                      page: int = 1) -> Dict[str, Any]:
         """Get account transactions"""
         
-        try:
-            ofb = await self._get_ofb_integration()
-            
-            # Validate consent has transaction permissions
-            has_access = await ofb.validate_access(consent_id, ["transactions"])
-            if not has_access:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Insufficient permissions for transaction retrieval"
-                )
-            
-            # Set default date range if not provided
-            if not from_date:
-                from_date = date.today() - timedelta(days=30)
-            if not to_date:
-                to_date = date.today()
-            
-            # In production, this would call the actual OFB transactions API
-            # For now, return mock data for development
+        ofb = await self._get_ofb_integration()
+        
+        # Validate consent has transaction permissions
+        has_access = await ofb.validate_access(consent_id, ["transactions"])
+        if not has_access:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions for transaction retrieval"
+            )
+        
+        # Set default date range if not provided
+        if not from_date:
+            from_date = date.today() - timedelta(days=30)
+        if not to_date:
+            to_date = date.today()
+        
+        if not ofb_settings.ofb_mock_mode:
+            # Let the OFB server filter and paginate rather than fetching every row
+            response = await ofb.get_account_transactions(
+                account_id,
+                access_token,
+                params={
+                    "fromBookingDate": from_date.isoformat(),
+                    "toBookingDate": to_date.isoformat(),
+                    "page": page,
+                    "page-size": page_size
+                }
+            )
+            paginated_transactions = response.get("data", [])
+            meta = response.get("meta", {})
+            total = meta.get("totalRecords", len(paginated_transactions))
+            pages = meta.get("totalPages", 1)
+        else:
+            # Mock data for development, filtered and paginated locally
             mock_transactions = [
                 {
                     "transactionId": "txn_001",
@@ -219,199 +320,280 @@ class OFBAccountService:
                 }
             ]
             
-            # Filter transactions by date range
-            filtered_transactions = []
-            for txn in mock_transactions:
-                txn_date = datetime.strptime(txn["bookingDate"], "%Y-%m-%d").date()
-                if from_date <= txn_date <= to_date:
-                    filtered_transactions.append(txn)
-            
-            # Apply pagination
-            total = len(filtered_transactions)
-            start = (page - 1) * page_size
-            end = start + page_size
-            paginated_transactions = filtered_transactions[start:end]
+            # Filter transactions by date range; ISO dates order the same as strings
+            from_iso = from_date.isoformat()
+            to_iso = to_date.isoformat()
             
-            logger.info(f"Retrieved {len(paginated_transactions)} transactions for account {account_id}")
+            def in_range(txn: Dict[str, Any]) -> bool:
+                return from_iso <= txn["bookingDate"] <= to_iso
             
-            return {
-                "transactions": paginated_transactions,
-                "pagination": {
-                    "total": total,
-                    "page": page,
-                    "size": page_size,
-                    "pages": (total + page_size - 1) // page_size
-                },
-                "dateRange": {
-                    "from": from_date.isoformat(),
-                    "to": to_date.isoformat()
-                }
+            # Count matches, then take only the requested page without building the filtered list
+            total = sum(1 for txn in mock_transactions if in_range(txn))
+            pages = (total + page_size - 1) // page_size
+            start = (page - 1) * page_size
+            paginated_transactions = list(itertools.islice(
+                filter(in_range, mock_transactions), start, start + page_size
+            ))
+        
+        logger.info(f"Retrieved {len(paginated_transactions)} transactions for account {account_id}")
+        
+        return {
+            "transactions": paginated_transactions,
+            "pagination": {
+                "total": total,
+                "page": page,
+                "size": page_size,
+                "pages": pages
+            },
+            "dateRange": {
+                "from": from_date.isoformat(),
+                "to": to_date.isoformat()
             }
-            
-        except Exception as e:
-            logger.error(f"Transaction retrieval failed: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Transaction retrieval failed: {str(e)}"
-            )
+        }
     
+    @ofb_endpoint("Transaction import", rollback=True)
     async def import_transactions(self,
                                 account_id: str,
                                 consent_id: str,
                                 access_token: str,
                                 from_date: Optional[date] = None,
                                 to_date: Optional[date] = None,
-                                auto_categorize: bool = True) -> Dict[str, Any]:
-        """Import transactions from OFB to local database"""
+                                auto_categorize: bool = True,
+                                transactions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Import transactions from OFB to local database
+        
+        Pass already fetched OFB transactions to skip fetching them again.
+        """
         
-        try:
-            # Get transactions from OFB
-            transactions_data = await self.get_account_transactions(
+        # Get all transaction pages from OFB unless the caller already has them
+        if transactions is None:
+            transactions = await self._fetch_all_pages(
                 account_id=account_id,
                 consent_id=consent_id,
                 access_token=access_token,
                 from_date=from_date,
                 to_date=to_date,
-                page_size=1000,  # Get all transactions for import
-                page=1
+                page_size=1000
             )
-            
-            transactions = transactions_data["transactions"]
-            imported_count = 0
-            skipped_count = 0
-            errors = []
-            
-            for txn in transactions:
-                try:
-                    # Check if transaction already exists
-                    existing_txn = self.db.query(Transaction).filter(
-                        Transaction.external_id == txn["transactionId"]
-                    ).first()
-                    
-                    if existing_txn:
-                        skipped_count += 1
-                        continue
-                    
-                    # Transform OFB transaction to local format
-                    amount = Decimal(txn["amount"])
-                    if txn["creditDebitType"] == "DEBITO":
-                        amount = -amount  # Negative for expenses
-                    
-                    # Auto-categorize if requested
-                    category_id = None
-                    if auto_categorize:
-                        category = await self.categorization_service.suggest_category(
-                            txn.get("transactionName", ""),
-                            float(abs(amount)),
-                            txn.get("transactionCategory", "")
-                        )
-                        if category:
-                            category_id = category.id
-                    
-                    # Create transaction
-                    transaction_data = TransactionCreate(
-                        date=datetime.strptime(txn["bookingDate"], "%Y-%m-%d").date(),
-                        amount=amount,
-                        description=txn.get("transactionName", txn.get("referenceNumber", "")),
-                        transaction_type=self._map_transaction_type(txn.get("type", "")),
-                        category_id=category_id,
-                        external_id=txn["transactionId"],
-                        currency=txn.get("currency", "BRL"),
-                        country_code="BR",
-                        reference_number=txn.get("referenceNumber"),
-                        tags=self._extract_tags(txn),
-                        notes=self._extract_notes(txn)
-                    )
-                    
-                    # Save to database
-                    transaction = Transaction(**transaction_data.dict())
-                    self.db.add(transaction)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Transaction {txn.get('transactionId', 'unknown')}: {str(e)}")
-                    logger.error(f"Failed to import transaction {txn.get('transactionId', 'unknown')}: {e}")
-            
-            # Commit all transactions
-            self.db.commit()
-            
-            logger.info(f"Imported {imported_count} transactions, skipped {skipped_count}")
-            
-            return {
-                "status": "completed",
-                "imported_count": imported_count,
-                "skipped_count": skipped_count,
-                "total_processed": len(transactions),
-                "errors": errors,
-                "account_id": account_id,
-                "date_range": {
-                    "from": from_date.isoformat() if from_date else None,
-                    "to": to_date.isoformat() if to_date else None
+        rows = []
+        skipped_count = 0
+        errors = []
+        
+        # Load already imported transaction IDs in one query, off the event loop
+        incoming_ids = [txn["transactionId"] for txn in transactions if "transactionId" in txn]
+        existing_ids = await self._run_db(self._load_existing_ids, incoming_ids)
+        
+        # Drop duplicates and parse amounts before categorizing the rest in one batch
+        new_transactions = []
+        for txn in transactions:
+            try:
+                # Skip transactions that already exist or repeat within this batch
+                if txn["transactionId"] in existing_ids:
+                    skipped_count += 1
+                    continue
+                existing_ids.add(txn["transactionId"])
+                
+                # Transform OFB transaction to local format, parsing the amount once
+                amount = Decimal(txn["amount"])
+                abs_amount = abs(float(amount))  # Float magnitude for categorization
+                if txn["creditDebitType"] == "DEBITO":
+                    amount = -amount  # Negative for expenses
+                new_transactions.append((txn, amount, abs_amount))
+                
+            except Exception as e:
+                errors.append(f"Transaction {txn.get('transactionId', 'unknown')}: {str(e)}")
+                logger.error(f"Failed to import transaction {txn.get('transactionId', 'unknown')}: {e}")
+        
+        # Auto-categorize if requested
+        if auto_categorize and new_transactions:
+            category_ids = await self._run_db(
+                self.categorization_service.suggest_category_ids_bulk,
+                [
+                    (txn.get("transactionName", ""), abs_amount, txn.get("transactionCategory", ""))
+                    for txn, _, abs_amount in new_transactions
+                ]
+            )
+        else:
+            category_ids = [None] * len(new_transactions)
+        
+        for (txn, amount, _), category_id in zip(new_transactions, category_ids):
+            try:
+                # Build the insert row directly; OFB payloads are already typed above
+                row = {
+                    "date": date.fromisoformat(txn["bookingDate"]),
+                    "amount": amount,
+                    "description": txn.get("transactionName", txn.get("referenceNumber", "")),
+                    "transaction_type": self._map_transaction_type(txn.get("type", "")),
+                    "category_id": category_id,
+                    "currency": txn.get("currency", "BRL"),
+                    "country_code": "BR",
+                    "is_recurring": False,
+                    "external_id": txn["transactionId"],
+                    "reference_number": txn.get("referenceNumber"),
+                    "tags": self._extract_tags(txn),
+                    "notes": self._extract_notes(txn)
                 }
-            }
-            
-        except Exception as e:
-            logger.error(f"Transaction import failed: {e}")
-            self.db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Transaction import failed: {str(e)}"
+                rows.append(row)
+                
+            except Exception as e:
+                errors.append(f"Transaction {txn.get('transactionId', 'unknown')}: {str(e)}")
+                logger.error(f"Failed to import transaction {txn.get('transactionId', 'unknown')}: {e}")
+        
+        # Insert and commit in chunks, off the event loop; nothing new means no round trip
+        imported_count = 0
+        if rows:
+            imported_count, conflict_count, insert_errors = await self._run_db(
+                self._insert_transactions, rows
             )
+            skipped_count += conflict_count
+            errors.extend(insert_errors)
+        
+        logger.info(f"Imported {imported_count} transactions, skipped {skipped_count}")
+        
+        return {
+            "status": "completed",
+            "imported_count": imported_count,
+            "skipped_count": skipped_count,
+            "total_processed": len(transactions),
+            "errors": errors,
+            "account_id": account_id,
+            "date_range": {
+                "from": from_date.isoformat() if from_date else None,
+                "to": to_date.isoformat() if to_date else None
+            }
+        }
     
+    async def _fetch_all_pages(self,
+                               account_id: str,
+                               consent_id: str,
+                               access_token: str,
+                               from_date: Optional[date] = None,
+                               to_date: Optional[date] = None,
+                               page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Fetch every transaction page, requesting pages after the first concurrently"""
+        
+        async def fetch_page(page: int) -> Dict[str, Any]:
+            for attempt in range(ofb_settings.ofb_max_retries + 1):
+                try:
+                    return await self.get_account_transactions(
+                        account_id=account_id,
+                        consent_id=consent_id,
+                        access_token=access_token,
+                        from_date=from_date,
+                        to_date=to_date,
+                        page_size=page_size,
+                        page=page
+                    )
+                except HTTPException as e:
+                    if e.status_code != status.HTTP_429_TOO_MANY_REQUESTS or attempt == ofb_settings.ofb_max_retries:
+                        raise
+                    await asyncio.sleep(self._RATE_LIMIT_BACKOFF * 2 ** attempt)
+        
+        first_page = await fetch_page(1)
+        total_pages = first_page["pagination"]["pages"]
+        if total_pages <= 1:
+            return first_page["transactions"]
+        
+        # The API client's process-wide limiter bounds how many of these are in flight
+        other_pages = await asyncio.gather(*(fetch_page(page) for page in range(2, total_pages + 1)))
+        return list(itertools.chain.from_iterable(
+            page_data["transactions"] for page_data in (first_page, *other_pages)
+        ))
+    
+    @ofb_endpoint("Account sync")
     async def sync_account_data(self,
                                account_id: str,
                                consent_id: str,
                                access_token: str) -> Dict[str, Any]:
         """Synchronize all account data (balance + recent transactions)"""
         
-        try:
-            # Get account balance
-            balance = await self.get_account_balances(account_id, consent_id, access_token)
-            
-            # Get recent transactions (last 7 days)
-            from_date = date.today() - timedelta(days=7)
-            transactions_data = await self.get_account_transactions(
-                account_id=account_id,
-                consent_id=consent_id,
-                access_token=access_token,
-                from_date=from_date,
-                page_size=100
-            )
-            
-            # Import new transactions
-            import_result = await self.import_transactions(
-                account_id=account_id,
-                consent_id=consent_id,
-                access_token=access_token,
-                from_date=from_date,
-                auto_categorize=True
-            )
-            
-            return {
-                "status": "synced",
-                "account_id": account_id,
-                "balance": balance,
-                "recent_transactions": len(transactions_data["transactions"]),
-                "import_result": import_result,
-                "sync_timestamp": datetime.utcnow().isoformat()
-            }
-            
-        except Exception as e:
-            logger.error(f"Account sync failed: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Account sync failed: {str(e)}"
+        # Get account balance
+        balance = await self.get_account_balances(account_id, consent_id, access_token, refresh=True)
+        
+        # Get recent transactions (last 7 days)
+        from_date = date.today() - timedelta(days=7)
+        transactions = await self._fetch_all_pages(
+            account_id=account_id,
+            consent_id=consent_id,
+            access_token=access_token,
+            from_date=from_date
+        )
+        
+        # Import new transactions from the same fetch
+        import_result = await self.import_transactions(
+            account_id=account_id,
+            consent_id=consent_id,
+            access_token=access_token,
+            from_date=from_date,
+            auto_categorize=True,
+            transactions=transactions
+        )
+        
+        return {
+            "status": "synced",
+            "account_id": account_id,
+            "balance": balance,
+            "recent_transactions": len(transactions),
+            "import_result": import_result,
+            "sync_timestamp": utcnow_iso()
+        }
+    
+    def _load_existing_ids(self, external_ids: List[str]) -> set:
+        """Get the external IDs that are already stored (blocking)"""
+        if not external_ids:
+            return set()
+        return {
+            external_id for (external_id,) in self.db.query(Transaction.external_id).filter(
+                Transaction.external_id.in_(external_ids)
+            ).all()
+        }
+    
+    def _insert_transactions(self, rows: List[Dict[str, Any]]) -> Tuple[int, int, List[str]]:
+        """Insert transaction rows and commit per chunk (blocking)
+        
+        Rows whose external_id is already stored, e.g. by a concurrent import,
+        are skipped by the database and counted as skipped. A failed chunk is
+        rolled back and reported without undoing earlier chunks.
+        """
+        imported_count = 0
+        skipped_count = 0
+        errors = []
+        
+        remaining = iter(rows)
+        while chunk := list(itertools.islice(remaining, self._IMPORT_CHUNK_SIZE)):
+            try:
+                result = self.db.execute(self._insert_ignore_duplicates(chunk))
+                self.db.commit()
+                imported_count += result.rowcount
+                skipped_count += len(chunk) - result.rowcount
+            except Exception as e:
+                self.db.rollback()
+                errors.append(f"Failed to import {len(chunk)} transactions: {str(e)}")
+                logger.error(f"Failed to import chunk of {len(chunk)} transactions: {e}")
+        
+        return imported_count, skipped_count, errors
+    
+    def _insert_ignore_duplicates(self, rows: List[Dict[str, Any]]):
+        """Build a multi-row INSERT that skips rows with an existing external_id
+        
+        ON CONFLICT needs the unique external_id index; databases without it
+        get a plain insert of the rows already checked by _load_existing_ids.
+        """
+        bind = self.db.get_bind()
+        dialect = bind.dialect.name
+        if dialect not in ("postgresql", "sqlite") or not _has_unique_external_id(bind.engine):
+            return insert(Transaction).values(rows)
+        if dialect == "postgresql":
+            return postgresql_insert(Transaction).values(rows).on_conflict_do_nothing(
+                index_elements=["external_id"]
             )
+        return sqlite_insert(Transaction).values(rows).on_conflict_do_nothing(
+            index_elements=["external_id"]
+        )
     
     def _map_transaction_type(self, ofb_type: str) -> str:
         """Map OFB transaction type to local transaction type"""
-        mapping = {
-            "PURCHASE": "DESPESA",
-            "CREDIT": "RECEITA",
-            "TRANSFER": "TRANSFERENCIA",
-            "INVESTMENT": "INVESTIMENTO"
-        }
-        return mapping.get(ofb_type, "OUTROS")
+        return _TXN_TYPE_MAP.get(ofb_type, "OUTROS")
     
     def _extract_tags(self, transaction: Dict[str, Any]) -> List[str]:
         """Extract relevant tags from transaction data"""
@@ -3,96 +3,310 @@ Open Finance Brasil Advanced Analytics Service
 Provides advanced analytics and insights based on aggregated OFB data.
 """
 import asyncio
+import heapq
+import itertools
+from bisect import bisect_left, bisect_right
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
-from decimal import Decimal
-from collections import defaultdict, Counter
-import statistics
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import defaultdict
+from operator import attrgetter, itemgetter
 
+from ..config_ofb import ofb_settings
+from ..core.cache import TTLCache
 from ..core.open_finance_brasil import OpenFinanceBrasilIntegration
 from ..services.ofb_multi_bank_service import OFBMultiBankService
-from ..services.ofb_account_service import OFBAccountService
 
 logger = logging.getLogger(__name__)
 
+# Downstream results shared by analytics requests for the same user
+_balance_cache = TTLCache(ofb_settings.ofb_analytics_cache_ttl)
+_health_cache = TTLCache(ofb_settings.ofb_analytics_cache_ttl)
+
+# Score tiers: a value at or above THRESHOLDS[i] scores SCORES[i + 1]
+_BALANCE_THRESHOLDS = (500, 2000, 5000, 10000)
+_BALANCE_SCORES = (20, 40, 60, 80, 100)
+_SAVINGS_RATE_THRESHOLDS = (5, 10, 15, 20)
+_SAVINGS_RATE_SCORES = (20, 40, 60, 80, 100)
+_SCORE_TIERS = {
+    "balance": (_BALANCE_THRESHOLDS, _BALANCE_SCORES),
+    "savings_rate": (_SAVINGS_RATE_THRESHOLDS, _SAVINGS_RATE_SCORES),
+}
+
+# Bank performance points, already weighted (sync 40%, accounts 30%, balance 30%)
+_SYNC_STATUS_POINTS = {
+    "EXCELLENT": 40.0,
+    "GOOD": 32.0,
+    "WARNING": 24.0,
+    "CRITICAL": 8.0,
+    "NEVER_SYNCED": 0.0
+}
+_HEALTHY_ACCOUNT_POINTS = 30.0
+_BALANCE_POINTS_PER_UNIT = 0.003  # 30 points at the 10k cap
+_MAX_BALANCE_POINTS = 30.0
+
+# Insight rules: (predicate, message) pairs, evaluated in order
+_CASH_FLOW_RULES = (
+    (lambda metrics, trends: metrics["savings_rate"] < 20,
+     "Your savings rate is below the recommended 20%. Consider reducing expenses or increasing income."),
+    (lambda metrics, trends: metrics["expense_ratio"] > 90,
+     "Your expenses are consuming most of your income. Look for ways to reduce spending."),
+    (lambda metrics, trends: trends["income_trend"] == "DECREASING",
+     "Your income appears to be decreasing. Review your income sources and consider additional revenue streams."),
+    (lambda metrics, trends: trends["expense_trend"] == "INCREASING",
+     "Your expenses are increasing. Monitor your spending patterns and identify areas for cost reduction."),
+)
+_HEALTHY_CASH_FLOW_INSIGHT = "Your cash flow appears healthy. Keep up the good financial management!"
+
+# Spending messages are format strings over top_category and bank_count
+_SPENDING_RULES = (
+    (lambda top_category, bank_spending, total_expenses: (
+        top_category is not None and top_category[1] > total_expenses * 0.4
+    ),
+     "Your top spending category ({top_category[0]}) represents over 40% of expenses. Consider diversifying your spending."),
+    (lambda top_category, bank_spending, total_expenses: len(bank_spending) > 1,
+     "You're using {bank_count} different banks. This provides good diversification but may increase complexity."),
+)
+
+_BANK_RULES = (
+    (lambda health_status, balance: health_status["sync_status"] in ("WARNING", "CRITICAL"),
+     "Schedule a manual sync to update your account data."),
+    (lambda health_status, balance: health_status["account_status"] == "NO_ACCOUNTS",
+     "No accounts found. Verify your bank connection and permissions."),
+    (lambda health_status, balance: balance == 0,
+     "Consider maintaining a minimum balance for emergency funds."),
+)
+
+_FINANCIAL_HEALTH_RULES = (
+    (lambda balance_score, bank_health_score, cash_flow_score: balance_score < 60,
+     "Focus on building your emergency fund and savings."),
+    (lambda balance_score, bank_health_score, cash_flow_score: bank_health_score < 80,
+     "Review and optimize your bank connections for better data synchronization."),
+    (lambda balance_score, bank_health_score, cash_flow_score: cash_flow_score < 60,
+     "Work on improving your cash flow by increasing income or reducing expenses."),
+)
+_HEALTHY_FINANCES_RECOMMENDATION = "Your financial health is excellent! Continue maintaining good financial habits."
+
+
+@dataclass(slots=True, frozen=True)
+class AnalyticsTransaction:
+    """Transaction record used by the analytics calculations."""
+    id: str
+    date: date
+    amount: float
+    type: str
+    category: str
+    bank: str
+    account: str
+    
+    @classmethod
+    def create(cls, id: str, date: date, amount: float, type: str,
+               category: str, bank: str, account: str) -> "AnalyticsTransaction":
+        """Create a record with interned labels, so equal labels share one string."""
+        return cls(id, date, amount, sys.intern(type), sys.intern(category), sys.intern(bank), account)
+
+
+@dataclass
+class AnalyticsContext:
+    """Downstream data fetched once and shared by the analytics of one request."""
+    balance_data: Optional[Dict[str, Any]] = None
+    health_status: Optional[Dict[str, Any]] = None
+    transactions: Optional[List[AnalyticsTransaction]] = None  # Default period only
+    now: datetime = field(default_factory=datetime.utcnow)  # One timestamp per request
+
+
+@lru_cache(maxsize=1)
+def _mock_transactions(today: date) -> Tuple[AnalyticsTransaction, ...]:
+    """Mock transaction data dated relative to today, built once per day."""
+    return (
+        AnalyticsTransaction.create(
+            id="txn_001",
+            date=today - timedelta(days=1),
+            amount=150.00,
+            type="EXPENSE",
+            category="ALIMENTACAO",
+            bank="Banco do Brasil",
+            account="Conta Corrente"
+        ),
+        AnalyticsTransaction.create(
+            id="txn_002",
+            date=today - timedelta(days=2),
+            amount=80.00,
+            type="EXPENSE",
+            category="TRANSPORTE",
+            bank="Itaú Unibanco",
+            account="Conta Corrente"
+        ),
+        AnalyticsTransaction.create(
+            id="txn_003",
+            date=today - timedelta(days=3),
+            amount=5000.00,
+            type="INCOME",
+            category="SALARIO",
+            bank="Banco do Brasil",
+            account="Conta Corrente"
+        ),
+        AnalyticsTransaction.create(
+            id="txn_004",
+            date=today - timedelta(days=4),
+            amount=200.00,
+            type="EXPENSE",
+            category="MORADIA",
+            bank="Bradesco",
+            account="Conta Corrente"
+        ),
+        AnalyticsTransaction.create(
+            id="txn_005",
+            date=today - timedelta(days=5),
+            amount=120.00,
+            type="EXPENSE",
+            category="LAZER",
+            bank="Banco do Brasil",
+            account="Conta Corrente"
+        )
+    )
+
+
+def _week_bucket(day: date) -> int:
+    """Year and week number matching strftime("%Y-W%W"), as one integer."""
+    return day.year * 100 + (day.timetuple().tm_yday + 6 - day.weekday()) // 7
+
+
+# Integer period buckets and their display keys; buckets sort in the same order as keys
+_PERIOD_BUCKETS: Dict[str, Tuple[Callable[[date], int], Callable[[int], str]]] = {
+    "daily": (date.toordinal, lambda key: date.fromordinal(key).isoformat()),
+    "weekly": (_week_bucket, lambda key: f"{key // 100}-W{key % 100:02d}"),
+    "monthly": (lambda day: day.year * 12 + day.month - 1, lambda key: f"{key // 12}-{key % 12 + 1:02d}"),
+}
+
+
+@lru_cache(maxsize=8)
+def _score_fn(kind: str) -> Callable[[float], int]:
+    """Get a tier scorer with the thresholds for kind bound in."""
+    thresholds, scores = _SCORE_TIERS[kind]
+    
+    def score(value: float) -> int:
+        return scores[bisect_right(thresholds, value)]
+    
+    return score
+
+
+def _period_totals(
+    transactions: List[AnalyticsTransaction],
+    bucket: Callable[[date], int]
+) -> Tuple[Dict[int, float], Dict[int, float]]:
+    """Sum income and expenses per period bucket in one tight loop.
+    
+    Anything that is not income counts as an expense, as in the trend report.
+    """
+    income: Dict[int, float] = {}
+    expenses: Dict[int, float] = {}
+    income_get = income.get
+    expenses_get = expenses.get
+    
+    for transaction in transactions:
+        key = bucket(transaction.date)
+        if transaction.type == "INCOME":
+            income[key] = income_get(key, 0.0) + transaction.amount
+            expenses.setdefault(key, 0.0)
+        else:
+            expenses[key] = expenses_get(key, 0.0) + transaction.amount
+            income.setdefault(key, 0.0)
+    
+    return income, expenses
+
+
+class _TransactionIndex:
+    """Transactions sorted by date, with parallel columns for range lookups.
+    
+    Running income and expense totals let any date range be summed with two
+    subtractions instead of a scan.
+    """
+    
+    __slots__ = ("transactions", "dates", "income_totals", "expense_totals")
+    
+    def __init__(self, transactions: List[AnalyticsTransaction]):
+        self.transactions = sorted(transactions, key=attrgetter("date"))
+        self.dates = [transaction.date for transaction in self.transactions]
+        self.income_totals = list(itertools.accumulate(
+            (t.amount if t.type == "INCOME" else 0.0 for t in self.transactions), initial=0.0
+        ))
+        self.expense_totals = list(itertools.accumulate(
+            (t.amount if t.type == "EXPENSE" else 0.0 for t in self.transactions), initial=0.0
+        ))
+    
+    def bounds(self, from_date: Optional[date], to_date: Optional[date]) -> Tuple[int, int]:
+        """Get the slice of transactions dated within [from_date, to_date]; None leaves that side open."""
+        lo = bisect_left(self.dates, from_date) if from_date else 0
+        hi = bisect_right(self.dates, to_date) if to_date else len(self.dates)
+        return lo, hi
+    
+    def between(self, from_date: Optional[date], to_date: Optional[date]) -> List[AnalyticsTransaction]:
+        """Get transactions dated within [from_date, to_date]."""
+        lo, hi = self.bounds(from_date, to_date)
+        return self.transactions[lo:hi]
+    
+    def totals(self, from_date: Optional[date], to_date: Optional[date]) -> Tuple[float, float]:
+        """Get (income, expenses) for transactions dated within [from_date, to_date]."""
+        lo, hi = self.bounds(from_date, to_date)
+        return (
+            self.income_totals[hi] - self.income_totals[lo],
+            self.expense_totals[hi] - self.expense_totals[lo]
+        )
+
+
 
 class OFBAdvancedAnalyticsService:
-    """Service for advanced analytics and insights based on OFB data."""
+    """Service for advanced analytics and insights based on OFB data.
+    
+    Monetary values are floats throughout; do not mix Decimal into the sums.
+    If exact totals are needed, convert amounts once to integer cents and sum those.
+    """
+    
+    __slots__ = (
+        "db", "ofb_integration", "multi_bank_service", "account_service",
+        "mock_transactions", "_transaction_index"
+    )
     
     def __init__(self, db, ofb_integration: OpenFinanceBrasilIntegration):
         self.db = db
         self.ofb_integration = ofb_integration
         self.multi_bank_service = OFBMultiBankService(db, ofb_integration)
-        self.account_service = OFBAccountService(db)
+        # Share the multi-bank service's account service rather than building a second one
+        self.account_service = self.multi_bank_service.account_service
         
         # Mock transaction data for analytics (replace with database queries)
-        self.mock_transactions = [
-            {
-                "id": "txn_001",
-                "date": (datetime.utcnow() - timedelta(days=1)).date(),
-                "amount": 150.00,
-                "type": "EXPENSE",
-                "category": "ALIMENTACAO",
-                "bank": "Banco do Brasil",
-                "account": "Conta Corrente"
-            },
-            {
-                "id": "txn_002",
-                "date": (datetime.utcnow() - timedelta(days=2)).date(),
-                "amount": 80.00,
-                "type": "EXPENSE",
-                "category": "TRANSPORTE",
-                "bank": "Itaú Unibanco",
-                "account": "Conta Corrente"
-            },
-            {
-                "id": "txn_003",
-                "date": (datetime.utcnow() - timedelta(days=3)).date(),
-                "amount": 5000.00,
-                "type": "INCOME",
-                "category": "SALARIO",
-                "bank": "Banco do Brasil",
-                "account": "Conta Corrente"
-            },
-            {
-                "id": "txn_004",
-                "date": (datetime.utcnow() - timedelta(days=4)).date(),
-                "amount": 200.00,
-                "type": "EXPENSE",
-                "category": "MORADIA",
-                "bank": "Bradesco",
-                "account": "Conta Corrente"
-            },
-            {
-                "id": "txn_005",
-                "date": (datetime.utcnow() - timedelta(days=5)).date(),
-                "amount": 120.00,
-                "type": "EXPENSE",
-                "category": "LAZER",
-                "bank": "Banco do Brasil",
-                "account": "Conta Corrente"
-            }
-        ]
+        self.mock_transactions = list(_mock_transactions(datetime.utcnow().date()))
+        
+        # Date-sorted view used for period filtering
+        self._transaction_index = _TransactionIndex(self.mock_transactions)
     
     async def get_cash_flow_analysis(
         self,
         user_id: str,
         period: str = "monthly",
         from_date: Optional[datetime] = None,
-        to_date: Optional[datetime] = None
+        to_date: Optional[datetime] = None,
+        context: Optional[AnalyticsContext] = None
     ) -> Dict[str, Any]:
         """Analyze cash flow patterns across all connected banks."""
         try:
+            if context is None:
+                context = AnalyticsContext()
+            
             # Get aggregated balance
-            balance_data = await self.multi_bank_service.get_aggregated_balance(user_id)
+            balance_data = await self._get_aggregated_balance(user_id, context)
             
             # Analyze transaction patterns
-            transactions = self._filter_transactions_by_period(from_date, to_date)
+            transactions = self._get_transactions(from_date, to_date, context)
             
-            # Calculate income and expenses
-            income = sum(t["amount"] for t in transactions if t["type"] == "INCOME")
-            expenses = sum(t["amount"] for t in transactions if t["type"] == "EXPENSE")
+            # Calculate income and expenses from the running totals
+            income, expenses = self._transaction_index.totals(
+                *self._period_bounds(from_date, to_date, context.now)
+            )
             net_flow = income - expenses
             
             # Calculate cash flow metrics
@@ -120,7 +334,7 @@ class OFBAdvancedAnalyticsService:
                 "cash_flow_metrics": cash_flow_metrics,
                 "trends": trends,
                 "insights": insights,
-                "analysis_date": datetime.utcnow().isoformat()
+                "analysis_date": context.now.isoformat()
             }
             
         except Exception as e:
@@ -132,29 +346,36 @@ class OFBAdvancedAnalyticsService:
         user_id: str,
         category_level: str = "PRIMARY",
         from_date: Optional[datetime] = None,
-        to_date: Optional[datetime] = None
+        to_date: Optional[datetime] = None,
+        context: Optional[AnalyticsContext] = None
     ) -> Dict[str, Any]:
         """Analyze spending patterns by category and bank."""
         try:
-            transactions = self._filter_transactions_by_period(from_date, to_date)
-            expense_transactions = [t for t in transactions if t["type"] == "EXPENSE"]
+            if context is None:
+                context = AnalyticsContext()
+            
+            transactions = self._get_transactions(from_date, to_date, context)
             
-            # Group by category
+            # Group expenses by category and bank in a single pass
             category_spending = defaultdict(float)
             bank_spending = defaultdict(float)
-            category_bank_matrix = defaultdict(lambda: defaultdict(float))
+            category_bank_matrix: Dict[str, Dict[str, float]] = {}
+            total_expenses = 0.0
             
-            for transaction in expense_transactions:
-                category = transaction["category"]
-                bank = transaction["bank"]
-                amount = transaction["amount"]
+            for transaction in transactions:
+                if transaction.type != "EXPENSE":
+                    continue
+                category = transaction.category
+                bank = transaction.bank
+                amount = transaction.amount
                 
                 category_spending[category] += amount
                 bank_spending[bank] += amount
-                category_bank_matrix[category][bank] += amount
+                category_banks = category_bank_matrix.setdefault(category, {})
+                category_banks[bank] = category_banks.get(bank, 0.0) + amount
+                total_expenses += amount
             
             # Calculate percentages
-            total_expenses = sum(category_spending.values())
             category_percentages = {
                 cat: (amount / total_expenses * 100) if total_expenses > 0 else 0
                 for cat, amount in category_spending.items()
@@ -165,16 +386,12 @@ class OFBAdvancedAnalyticsService:
                 for bank, amount in bank_spending.items()
             }
             
-            # Identify top spending categories
-            top_categories = sorted(
-                category_spending.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:5]
+            # Identify top spending categories without sorting them all
+            top_categories = heapq.nlargest(5, category_spending.items(), key=itemgetter(1))
             
             # Generate insights
             insights = self._generate_spending_insights(
-                category_spending, bank_spending, total_expenses
+                top_categories[0] if top_categories else None, bank_spending, total_expenses
             )
             
             return {
@@ -183,10 +400,10 @@ class OFBAdvancedAnalyticsService:
                 "category_percentages": category_percentages,
                 "bank_breakdown": dict(bank_spending),
                 "bank_percentages": bank_percentages,
-                "category_bank_matrix": dict(category_bank_matrix),
+                "category_bank_matrix": category_bank_matrix,
                 "top_categories": top_categories,
                 "insights": insights,
-                "analysis_date": datetime.utcnow().isoformat()
+                "analysis_date": context.now.isoformat()
             }
             
         except Exception as e:
@@ -196,47 +413,44 @@ class OFBAdvancedAnalyticsService:
     async def get_bank_performance_analysis(
         self,
         user_id: str,
-        analysis_period: str = "30_days"
+        analysis_period: str = "30_days",
+        context: Optional[AnalyticsContext] = None
     ) -> Dict[str, Any]:
         """Analyze performance and efficiency of connected banks."""
         try:
-            # Get bank health status
-            health_status = await self.multi_bank_service.get_bank_health_status(user_id)
+            if context is None:
+                context = AnalyticsContext()
             
-            # Get aggregated balance for comparison
-            balance_data = await self.multi_bank_service.get_aggregated_balance(user_id)
+            # Get bank health status and aggregated balance concurrently
+            health_status, balance_data = await asyncio.gather(
+                self._get_bank_health_status(user_id, context),
+                self._get_aggregated_balance(user_id, context)
+            )
             
             # Analyze bank performance metrics
-            bank_performance = []
+            health_details = health_status["health_details"]
+            balance_by_code = {
+                b["bank_code"]: float(b["total_balance"]) for b in balance_data["bank_breakdown"]
+            }
+            balances = [balance_by_code.get(h["bank_code"], 0.0) for h in health_details]
             
-            for bank_health in health_status["health_details"]:
-                bank_name = bank_health["bank_name"]
-                bank_code = bank_health["bank_code"]
-                
-                # Find bank balance
-                bank_balance = next(
-                    (b["total_balance"] for b in balance_data["bank_breakdown"] 
-                     if b["bank_code"] == bank_code),
-                    0.0
-                )
-                
-                # Calculate performance score
-                performance_score = self._calculate_bank_performance_score(bank_health, bank_balance)
-                
-                # Generate recommendations
-                recommendations = self._generate_bank_recommendations(bank_health, bank_balance)
-                
-                bank_performance.append({
-                    "bank_name": bank_name,
-                    "bank_code": bank_code,
+            # Score all banks in one pass over each component
+            scores = self._calculate_bank_performance_scores(health_details, balances)
+            
+            bank_performance = [
+                {
+                    "bank_name": bank_health["bank_name"],
+                    "bank_code": bank_health["bank_code"],
                     "health_status": bank_health,
                     "balance": bank_balance,
                     "performance_score": performance_score,
-                    "recommendations": recommendations
-                })
+                    "recommendations": self._generate_bank_recommendations(bank_health, bank_balance)
+                }
+                for bank_health, bank_balance, performance_score in zip(health_details, balances, scores)
+            ]
             
             # Overall performance summary
-            overall_score = statistics.mean([bp["performance_score"] for bp in bank_performance])
+            overall_score = sum(scores) / len(scores) if scores else 0.0
             
             return {
                 "overall_performance_score": overall_score,
@@ -244,7 +458,7 @@ class OFBAdvancedAnalyticsService:
                 "health_summary": health_status,
                 "balance_summary": balance_data,
                 "analysis_period": analysis_period,
-                "analysis_date": datetime.utcnow().isoformat()
+                "analysis_date": context.now.isoformat()
             }
             
         except Exception as e:
@@ -253,18 +467,24 @@ class OFBAdvancedAnalyticsService:
     
     async def get_financial_health_score(
         self,
-        user_id: str
+        user_id: str,
+        context: Optional[AnalyticsContext] = None
     ) -> Dict[str, Any]:
         """Calculate overall financial health score based on OFB data."""
         try:
-            # Get various metrics
-            balance_data = await self.multi_bank_service.get_aggregated_balance(user_id)
-            health_status = await self.multi_bank_service.get_bank_health_status(user_id)
+            if context is None:
+                context = AnalyticsContext()
+            
+            # Get various metrics concurrently
+            balance_data, health_status = await asyncio.gather(
+                self._get_aggregated_balance(user_id, context),
+                self._get_bank_health_status(user_id, context)
+            )
             
-            # Calculate component scores
+            # Calculate component scores, reusing the fetched balance for cash flow
             balance_score = self._calculate_balance_score(balance_data)
             bank_health_score = self._calculate_bank_health_score(health_status)
-            cash_flow_score = await self._calculate_cash_flow_score(user_id)
+            cash_flow_score = await self._calculate_cash_flow_score(user_id, context)
             
             # Weighted overall score
             overall_score = (
@@ -299,61 +519,145 @@ class OFBAdvancedAnalyticsService:
                     "cash_flow_score": cash_flow_score
                 },
                 "recommendations": recommendations,
-                "calculation_date": datetime.utcnow().isoformat()
+                "calculation_date": context.now.isoformat()
             }
             
         except Exception as e:
             logger.error(f"Financial health score calculation failed: {str(e)}")
             raise
     
+    async def get_financial_health_scores(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Calculate financial health scores for several users, e.g. in a recompute job.
+        
+        Balances and bank health for users missing from the shared caches are
+        fetched in one batch per kind before each user is scored.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        now = datetime.utcnow()
+        contexts = {
+            user_id: AnalyticsContext(
+                balance_data=_balance_cache.get(user_id),
+                health_status=_health_cache.get(user_id),
+                now=now
+            )
+            for user_id in user_ids
+        }
+        
+        balances, health_statuses = await asyncio.gather(
+            self.multi_bank_service.get_aggregated_balances(
+                [user_id for user_id, context in contexts.items() if context.balance_data is None]
+            ),
+            self.multi_bank_service.get_bank_health_statuses(
+                [user_id for user_id, context in contexts.items() if context.health_status is None]
+            )
+        )
+        for user_id, balance_data in balances.items():
+            _balance_cache.set(user_id, balance_data)
+            contexts[user_id].balance_data = balance_data
+        for user_id, health_status in health_statuses.items():
+            _health_cache.set(user_id, health_status)
+            contexts[user_id].health_status = health_status
+        
+        scores = await asyncio.gather(*(
+            self.get_financial_health_score(user_id, context=contexts[user_id])
+            for user_id in user_ids
+        ))
+        return dict(zip(user_ids, scores))
+    
+    async def _get_aggregated_balance(
+        self,
+        user_id: str,
+        context: Optional[AnalyticsContext] = None
+    ) -> Dict[str, Any]:
+        """Get the aggregated balance from the request context, the shared cache or the bank."""
+        if context is not None and context.balance_data is not None:
+            return context.balance_data
+        
+        balance_data = _balance_cache.get(user_id)
+        if balance_data is None:
+            balance_data = await self.multi_bank_service.get_aggregated_balance(user_id)
+            _balance_cache.set(user_id, balance_data)
+        
+        if context is not None:
+            context.balance_data = balance_data
+        return balance_data
+    
+    async def _get_bank_health_status(
+        self,
+        user_id: str,
+        context: Optional[AnalyticsContext] = None
+    ) -> Dict[str, Any]:
+        """Get bank health from the request context, the shared cache or the bank."""
+        if context is not None and context.health_status is not None:
+            return context.health_status
+        
+        health_status = _health_cache.get(user_id)
+        if health_status is None:
+            health_status = await self.multi_bank_service.get_bank_health_status(user_id)
+            _health_cache.set(user_id, health_status)
+        
+        if context is not None:
+            context.health_status = health_status
+        return health_status
+    
+    def _get_transactions(
+        self,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        context: Optional[AnalyticsContext] = None
+    ) -> List[AnalyticsTransaction]:
+        """Get period transactions, sharing the default period's through the context."""
+        if context is None:
+            return self._filter_transactions_by_period(from_date, to_date)
+        if from_date or to_date:
+            return self._filter_transactions_by_period(from_date, to_date, context.now)
+        
+        if context.transactions is None:
+            context.transactions = self._filter_transactions_by_period(None, None, context.now)
+        return context.transactions
+    
     def _filter_transactions_by_period(
         self,
         from_date: Optional[datetime],
-        to_date: Optional[datetime]
-    ) -> List[Dict[str, Any]]:
+        to_date: Optional[datetime],
+        now: Optional[datetime] = None
+    ) -> List[AnalyticsTransaction]:
         """Filter transactions by date period."""
+        return self._transaction_index.between(*self._period_bounds(from_date, to_date, now))
+    
+    def _period_bounds(
+        self,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        now: Optional[datetime] = None
+    ) -> Tuple[Optional[date], Optional[date]]:
+        """Get the date bounds of a period, defaulting to the 30 days up to now."""
         if not from_date and not to_date:
-            # Default to last 30 days
-            from_date = datetime.utcnow() - timedelta(days=30)
-            to_date = datetime.utcnow()
-        
-        filtered_transactions = []
-        for transaction in self.mock_transactions:
-            tx_date = transaction["date"]
-            if from_date and tx_date < from_date.date():
-                continue
-            if to_date and tx_date > to_date.date():
-                continue
-            filtered_transactions.append(transaction)
+            to_date = now or datetime.utcnow()
+            from_date = to_date - timedelta(days=30)
         
-        return filtered_transactions
+        return (
+            from_date.date() if from_date else None,
+            to_date.date() if to_date else None
+        )
     
     def _analyze_cash_flow_trends(
         self,
-        transactions: List[Dict[str, Any]],
+        transactions: List[AnalyticsTransaction],
         period: str
     ) -> Dict[str, Any]:
         """Analyze cash flow trends over time."""
-        # Group transactions by period
-        period_groups = defaultdict(lambda: {"income": 0, "expenses": 0})
+        # Group transactions by integer period bucket, formatting keys only once per group
+        bucket, format_key = _PERIOD_BUCKETS.get(period, _PERIOD_BUCKETS["monthly"])
+        income, expenses = _period_totals(transactions, bucket)
         
-        for transaction in transactions:
-            if period == "daily":
-                period_key = transaction["date"].strftime("%Y-%m-%d")
-            elif period == "weekly":
-                period_key = transaction["date"].strftime("%Y-W%W")
-            elif period == "monthly":
-                period_key = transaction["date"].strftime("%Y-%m")
-            else:
-                period_key = transaction["date"].strftime("%Y-%m")
-            
-            if transaction["type"] == "INCOME":
-                period_groups[period_key]["income"] += transaction["amount"]
-            else:
-                period_groups[period_key]["expenses"] += transaction["amount"]
+        period_groups = {
+            format_key(key): {"income": income[key], "expenses": expenses[key]}
+            for key in sorted(income)
+        }
         
         # Calculate trends
-        periods = sorted(period_groups.keys())
+        periods = list(period_groups)
         if len(periods) >= 2:
             income_trend = self._calculate_trend(
                 [period_groups[p]["income"] for p in periods]
@@ -367,7 +671,7 @@ class OFBAdvancedAnalyticsService:
         
         return {
             "periods": periods,
-            "period_data": dict(period_groups),
+            "period_data": period_groups,
             "income_trend": income_trend,
             "expense_trend": expense_trend
         }
@@ -377,12 +681,10 @@ class OFBAdvancedAnalyticsService:
         if len(values) < 2:
             return "STABLE"
         
-        # Simple trend calculation
-        first_half = values[:len(values)//2]
-        second_half = values[len(values)//2:]
-        
-        first_avg = statistics.mean(first_half) if first_half else 0
-        second_avg = statistics.mean(second_half) if second_half else 0
+        # Simple trend calculation; both halves are non-empty here
+        middle = len(values) // 2
+        first_avg = sum(values[:middle]) / middle
+        second_avg = sum(values[middle:]) / (len(values) - middle)
         
         if second_avg > first_avg * 1.1:
             return "INCREASING"
@@ -397,44 +699,21 @@ class OFBAdvancedAnalyticsService:
         trends: Dict[str, Any]
     ) -> List[str]:
         """Generate insights from cash flow analysis."""
-        insights = []
-        
-        if metrics["savings_rate"] < 20:
-            insights.append("Your savings rate is below the recommended 20%. Consider reducing expenses or increasing income.")
-        
-        if metrics["expense_ratio"] > 90:
-            insights.append("Your expenses are consuming most of your income. Look for ways to reduce spending.")
-        
-        if trends["income_trend"] == "DECREASING":
-            insights.append("Your income appears to be decreasing. Review your income sources and consider additional revenue streams.")
-        
-        if trends["expense_trend"] == "INCREASING":
-            insights.append("Your expenses are increasing. Monitor your spending patterns and identify areas for cost reduction.")
-        
-        if not insights:
-            insights.append("Your cash flow appears healthy. Keep up the good financial management!")
-        
-        return insights
+        insights = [message for applies, message in _CASH_FLOW_RULES if applies(metrics, trends)]
+        return insights or [_HEALTHY_CASH_FLOW_INSIGHT]
     
     def _generate_spending_insights(
         self,
-        category_spending: Dict[str, float],
+        top_category: Optional[Tuple[str, float]],
         bank_spending: Dict[str, float],
         total_expenses: float
     ) -> List[str]:
         """Generate insights from spending pattern analysis."""
-        insights = []
-        
-        # Category insights
-        top_category = max(category_spending.items(), key=lambda x: x[1])
-        if top_category[1] > total_expenses * 0.4:
-            insights.append(f"Your top spending category ({top_category[0]}) represents over 40% of expenses. Consider diversifying your spending.")
-        
-        # Bank insights
-        if len(bank_spending) > 1:
-            insights.append(f"You're using {len(bank_spending)} different banks. This provides good diversification but may increase complexity.")
-        
-        return insights
+        return [
+            message.format(top_category=top_category, bank_count=len(bank_spending))
+            for applies, message in _SPENDING_RULES
+            if applies(top_category, bank_spending, total_expenses)
+        ]
     
     def _calculate_bank_performance_score(
         self,
@@ -442,29 +721,28 @@ class OFBAdvancedAnalyticsService:
         balance: float
     ) -> float:
         """Calculate performance score for a bank."""
-        score = 0.0
-        
-        # Sync status scoring
-        sync_status_scores = {
-            "EXCELLENT": 100,
-            "GOOD": 80,
-            "WARNING": 60,
-            "CRITICAL": 20,
-            "NEVER_SYNCED": 0
-        }
-        score += sync_status_scores.get(health_status["sync_status"], 0) * 0.4
-        
-        # Account status scoring
-        if health_status["account_status"] == "HEALTHY":
-            score += 100 * 0.3
-        elif health_status["account_status"] == "NO_ACCOUNTS":
-            score += 0 * 0.3
-        
-        # Balance scoring (normalized)
-        if balance > 0:
-            score += min(100, (balance / 10000) * 100) * 0.3  # Cap at 10k for scoring
+        return self._calculate_bank_performance_scores([health_status], [balance])[0]
+    
+    def _calculate_bank_performance_scores(
+        self,
+        health_details: List[Dict[str, Any]],
+        balances: List[float]
+    ) -> List[float]:
+        """Calculate performance scores for several banks, one component column at a time."""
+        sync_points = [_SYNC_STATUS_POINTS.get(h["sync_status"], 0.0) for h in health_details]
+        account_points = [
+            _HEALTHY_ACCOUNT_POINTS if h["account_status"] == "HEALTHY" else 0.0
+            for h in health_details
+        ]
+        balance_points = [
+            min(_MAX_BALANCE_POINTS, balance * _BALANCE_POINTS_PER_UNIT) if balance > 0 else 0.0
+            for balance in balances
+        ]
         
-        return round(score, 2)
+        return [
+            round(sync + account + balance, 2)
+            for sync, account, balance in zip(sync_points, account_points, balance_points)
+        ]
     
     def _generate_bank_recommendations(
         self,
@@ -472,34 +750,12 @@ class OFBAdvancedAnalyticsService:
         balance: float
     ) -> List[str]:
         """Generate recommendations for a bank."""
-        recommendations = []
-        
-        if health_status["sync_status"] in ["WARNING", "CRITICAL"]:
-            recommendations.append("Schedule a manual sync to update your account data.")
-        
-        if health_status["account_status"] == "NO_ACCOUNTS":
-            recommendations.append("No accounts found. Verify your bank connection and permissions.")
-        
-        if balance == 0:
-            recommendations.append("Consider maintaining a minimum balance for emergency funds.")
-        
-        return recommendations
+        return [message for applies, message in _BANK_RULES if applies(health_status, balance)]
     
     def _calculate_balance_score(self, balance_data: Dict[str, Any]) -> float:
         """Calculate balance component score."""
-        total_balance = balance_data["total_balance"]
-        
         # Simple scoring based on balance tiers
-        if total_balance >= 10000:
-            return 100
-        elif total_balance >= 5000:
-            return 80
-        elif total_balance >= 2000:
-            return 60
-        elif total_balance >= 500:
-            return 40
-        else:
-            return 20
+        return _score_fn("balance")(balance_data["total_balance"])
     
     def _calculate_bank_health_score(self, health_status: Dict[str, Any]) -> float:
         """Calculate bank health component score."""
@@ -511,26 +767,20 @@ class OFBAdvancedAnalyticsService:
         
         return (healthy_banks / total_banks) * 100
     
-    async def _calculate_cash_flow_score(self, user_id: str) -> float:
+    async def _calculate_cash_flow_score(
+        self,
+        user_id: str,
+        context: Optional[AnalyticsContext] = None
+    ) -> float:
         """Calculate cash flow component score."""
         try:
             # Get cash flow analysis for last 30 days
-            cash_flow = await self.get_cash_flow_analysis(user_id, "monthly")
+            cash_flow = await self.get_cash_flow_analysis(user_id, "monthly", context=context)
             metrics = cash_flow["cash_flow_metrics"]
             
             # Score based on savings rate
-            savings_rate = metrics["savings_rate"]
-            if savings_rate >= 20:
-                return 100
-            elif savings_rate >= 15:
-                return 80
-            elif savings_rate >= 10:
-                return 60
-            elif savings_rate >= 5:
-                return 40
-            else:
-                return 20
-                
+            return _score_fn("savings_rate")(metrics["savings_rate"])
+            
         except Exception:
             return 50  # Default score if analysis fails
     
@@ -541,18 +791,8 @@ class OFBAdvancedAnalyticsService:
         cash_flow_score: float
     ) -> List[str]:
         """Generate overall financial health recommendations."""
-        recommendations = []
-        
-        if balance_score < 60:
-            recommendations.append("Focus on building your emergency fund and savings.")
-        
-        if bank_health_score < 80:
-            recommendations.append("Review and optimize your bank connections for better data synchronization.")
-        
-        if cash_flow_score < 60:
-            recommendations.append("Work on improving your cash flow by increasing income or reducing expenses.")
-        
-        if not recommendations:
-            recommendations.append("Your financial health is excellent! Continue maintaining good financial habits.")
-        
-        return recommendations
+        recommendations = [
+            message for applies, message in _FINANCIAL_HEALTH_RULES
+            if applies(balance_score, bank_health_score, cash_flow_score)
+        ]
+        return recommendations or [_HEALTHY_FINANCES_RECOMMENDATION]
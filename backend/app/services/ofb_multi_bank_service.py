@@ -3,18 +3,63 @@ Open Finance Brasil Multi-Bank Aggregation Service
 Handles multiple bank connections and aggregated financial data.
 """
 import asyncio
+from bisect import bisect_right
+import functools
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Set
-from decimal import Decimal
-from uuid import uuid4
+from typing import Dict, List, Optional, Any, Set, Tuple
+from decimal import ROUND_HALF_UP, Decimal
 
+from ..config_ofb import ofb_settings
+from ..core.cache import TTLCache
+from ..core.ids import short_id
 from ..core.open_finance_brasil import OpenFinanceBrasilIntegration
 from ..services.ofb_account_service import OFBAccountService
 from ..services.ofb_sync_service import OFBSyncService
 
 logger = logging.getLogger(__name__)
 
+# Hours-since-sync boundaries and the sync status below each one, then beyond the last
+_SYNC_AGE_HOURS = (1, 6, 24)
+_SYNC_AGE_STATUSES = ("EXCELLENT", "GOOD", "WARNING", "CRITICAL")
+
+# user_id -> (fetched_at, aggregated balance), kept while still servable as stale
+_aggregated_balance_cache = TTLCache(ofb_settings.ofb_aggregated_balance_stale_ttl)
+# user_id -> in-flight aggregated balance fetch, shared by concurrent callers
+_aggregated_balance_fetches: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+
+def _amount_cents(amount: Any) -> int:
+    """Convert a BRL amount, given as a number or a decimal string, to integer cents."""
+    return int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _finish_balance_fetch(user_id: str, task: "asyncio.Task[Dict[str, Any]]") -> None:
+    """Forget a completed fetch, unless it was already replaced by a newer one."""
+    if _aggregated_balance_fetches.get(user_id) is task:
+        del _aggregated_balance_fetches[user_id]
+    if not task.cancelled():
+        task.exception()  # Failures are logged by the fetch; background ones have no awaiter
+
+
+def invalidate_aggregated_balance(user_id: str) -> None:
+    """Drop a user's cached aggregated balance, e.g. after their banks change.
+    
+    A fetch already running is forgotten rather than cancelled, so its awaiters
+    still get a result, but it no longer fills the cache.
+    """
+    _aggregated_balance_cache.pop(user_id)
+    _aggregated_balance_fetches.pop(user_id, None)
+
+
+def _copy_balance(balance: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a cached aggregated balance so callers cannot change the cached one."""
+    balance = dict(balance)
+    if "bank_breakdown" in balance:
+        balance["bank_breakdown"] = [dict(bank) for bank in balance["bank_breakdown"]]
+    return balance
+
 
 class OFBMultiBankService:
     """Service for handling multi-bank aggregation and management."""
@@ -26,6 +71,7 @@ class OFBMultiBankService:
         self.sync_service = OFBSyncService(db)
         
         # Mock bank connections (replace with database storage)
+        now = datetime.utcnow()
         self.bank_connections = {
             "bank_001": {
                 "id": "bank_001",
@@ -34,8 +80,8 @@ class OFBMultiBankService:
                 "status": "ACTIVE",
                 "consent_id": "consent_bb_123",
                 "access_token": "token_bb_456",
-                "connected_at": (datetime.utcnow() - timedelta(days=30)).isoformat(),
-                "last_sync": (datetime.utcnow() - timedelta(hours=2)).isoformat(),
+                "connected_at": (now - timedelta(days=30)).isoformat(),
+                "last_sync": (now - timedelta(hours=2)).isoformat(),
                 "accounts": ["account_bb_001", "account_bb_002"]
             },
             "bank_002": {
@@ -45,8 +91,8 @@ class OFBMultiBankService:
                 "status": "ACTIVE",
                 "consent_id": "consent_itau_789",
                 "access_token": "token_itau_012",
-                "connected_at": (datetime.utcnow() - timedelta(days=15)).isoformat(),
-                "last_sync": (datetime.utcnow() - timedelta(hours=1)).isoformat(),
+                "connected_at": (now - timedelta(days=15)).isoformat(),
+                "last_sync": (now - timedelta(hours=1)).isoformat(),
                 "accounts": ["account_itau_001"]
             },
             "bank_003": {
@@ -56,11 +102,54 @@ class OFBMultiBankService:
                 "status": "PENDING",
                 "consent_id": "consent_bradesco_345",
                 "access_token": "token_bradesco_678",
-                "connected_at": (datetime.utcnow() - timedelta(days=5)).isoformat(),
+                "connected_at": (now - timedelta(days=5)).isoformat(),
                 "last_sync": None,
                 "accounts": []
             }
         }
+        self._rebuild_connection_indexes()
+    
+    def _rebuild_connection_indexes(self) -> None:
+        """Index bank_connections by user and by (user, status).
+        
+        Each index maps to an insertion-ordered {connection_id: connection} dict.
+        """
+        self._connections_by_user: Dict[Optional[str], Dict[str, Dict[str, Any]]] = {}
+        self._connections_by_user_status: Dict[Tuple[Optional[str], str], Dict[str, Dict[str, Any]]] = {}
+        # connection_id -> parsed last_sync, so health checks never re-parse it
+        self._last_sync_times: Dict[str, datetime] = {}
+        for connection in self.bank_connections.values():
+            self._index_connection(connection)
+            if connection["last_sync"]:
+                self._last_sync_times[connection["id"]] = datetime.fromisoformat(connection["last_sync"])
+    
+    def _index_connection(self, connection: Dict[str, Any]) -> None:
+        """Add a connection to the user and status indexes."""
+        user_id = connection.get("user_id")
+        self._connections_by_user.setdefault(user_id, {})[connection["id"]] = connection
+        self._connections_by_user_status.setdefault(
+            (user_id, connection["status"]), {}
+        )[connection["id"]] = connection
+    
+    def _set_connection_status(self, connection: Dict[str, Any], status: str) -> None:
+        """Change a connection's status, keeping the status index in step."""
+        user_id = connection.get("user_id")
+        self._connections_by_user_status.get((user_id, connection["status"]), {}).pop(connection["id"], None)
+        connection["status"] = status
+        self._index_connection(connection)
+    
+    def _set_last_sync(self, connection: Dict[str, Any], synced_at: datetime) -> None:
+        """Record a connection's last sync time as both ISO string and datetime."""
+        connection["last_sync"] = synced_at.isoformat()
+        self._last_sync_times[connection["id"]] = synced_at
+    
+    def _user_connections(self, user_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a user's connections, optionally only those with the given status."""
+        if status is None:
+            connections = self._connections_by_user.get(user_id, {})
+        else:
+            connections = self._connections_by_user_status.get((user_id, status), {})
+        return list(connections.values())
     
     async def connect_bank(
         self,
@@ -87,7 +176,7 @@ class OFBMultiBankService:
                 raise ValueError(f"Bank {bank_name} is already connected")
             
             # Create new bank connection
-            connection_id = f"bank_{uuid4().hex[:8]}"
+            connection_id = short_id("bank")
             
             new_connection = {
                 "id": connection_id,
@@ -104,16 +193,17 @@ class OFBMultiBankService:
             
             # Store connection
             self.bank_connections[connection_id] = new_connection
+            self._index_connection(new_connection)
             
             # Discover accounts for the new bank
             accounts = await self.account_service.discover_accounts(consent_id, access_token)
             new_connection["accounts"] = [acc["id"] for acc in accounts.get("accounts", [])]
             
             # Schedule initial sync
-            for account_id in new_connection["accounts"]:
-                await self.sync_service.schedule_account_sync(
-                    account_id, consent_id, access_token, "daily"
-                )
+            await self.sync_service.schedule_account_syncs(
+                new_connection["accounts"], consent_id, access_token, "daily"
+            )
+            invalidate_aggregated_balance(user_id)
             
             logger.info(f"Bank {bank_name} connected successfully: {connection_id}")
             
@@ -145,12 +235,12 @@ class OFBMultiBankService:
                 raise ValueError("Unauthorized access to bank connection")
             
             # Remove sync jobs for all accounts
-            for account_id in connection["accounts"]:
-                await self.sync_service.remove_sync_job(account_id)
+            await self.sync_service.remove_sync_jobs(connection["accounts"])
             
             # Update connection status
-            connection["status"] = "DISCONNECTED"
+            self._set_connection_status(connection, "DISCONNECTED")
             connection["disconnected_at"] = datetime.utcnow().isoformat()
+            invalidate_aggregated_balance(user_id)
             
             logger.info(f"Bank {connection['name']} disconnected: {connection_id}")
             
@@ -168,27 +258,31 @@ class OFBMultiBankService:
     async def get_connected_banks(self, user_id: str) -> Dict[str, Any]:
         """Get all connected banks for a user."""
         try:
-            user_connections = [
-                conn for conn in self.bank_connections.values()
-                if conn.get("user_id") == user_id
-            ]
+            user_connections = self._user_connections(user_id)
+            
+            # Group by status and summarize active connections in one pass
+            by_status: Dict[str, List[Dict[str, Any]]] = {"ACTIVE": [], "PENDING": [], "DISCONNECTED": []}
+            total_accounts = 0
+            last_sync = None
             
-            # Group by status
-            active_connections = [conn for conn in user_connections if conn["status"] == "ACTIVE"]
-            pending_connections = [conn for conn in user_connections if conn["status"] == "PENDING"]
-            disconnected_connections = [conn for conn in user_connections if conn["status"] == "DISCONNECTED"]
+            for conn in user_connections:
+                group = by_status.get(conn["status"])
+                if group is not None:
+                    group.append(conn)
+                if conn["status"] == "ACTIVE":
+                    total_accounts += len(conn["accounts"])
+                    synced_at = self._last_sync_times.get(conn["id"])
+                    if synced_at is not None and (last_sync is None or synced_at > last_sync):
+                        last_sync = synced_at
             
             return {
                 "total_connections": len(user_connections),
-                "active_connections": active_connections,
-                "pending_connections": pending_connections,
-                "disconnected_connections": disconnected_connections,
+                "active_connections": by_status["ACTIVE"],
+                "pending_connections": by_status["PENDING"],
+                "disconnected_connections": by_status["DISCONNECTED"],
                 "summary": {
-                    "total_accounts": sum(len(conn["accounts"]) for conn in active_connections),
-                    "last_sync": max(
-                        (conn["last_sync"] for conn in active_connections if conn["last_sync"]),
-                        default=None
-                    )
+                    "total_accounts": total_accounts,
+                    "last_sync": last_sync
                 }
             }
             
@@ -196,134 +290,175 @@ class OFBMultiBankService:
             logger.error(f"Failed to get connected banks: {str(e)}")
             raise
     
-    async def get_aggregated_balance(self, user_id: str) -> Dict[str, Any]:
-        """Get aggregated balance across all connected banks."""
+    async def get_aggregated_balance(self, user_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """Get aggregated balance across all connected banks.
+        
+        Cached balances older than the refresh TTL are still returned, while a
+        background fetch replaces them. Each caller gets its own copy. Totals
+        are exact Decimals, which the response layer serializes as strings.
+        """
+        entry = None if refresh else _aggregated_balance_cache.get(user_id)
+        if entry is None:
+            return _copy_balance(await asyncio.shield(self._start_balance_fetch(user_id)))
+        
+        fetched_at, balance = entry
+        if time.monotonic() - fetched_at >= ofb_settings.ofb_aggregated_balance_ttl:
+            self._start_balance_fetch(user_id)
+        return _copy_balance(balance)
+    
+    def _start_balance_fetch(self, user_id: str) -> "asyncio.Task[Dict[str, Any]]":
+        """Start fetching a user's aggregated balance, unless a fetch is already running."""
+        task = _aggregated_balance_fetches.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch_aggregated_balance(user_id))
+            _aggregated_balance_fetches[user_id] = task
+            task.add_done_callback(functools.partial(_finish_balance_fetch, user_id))
+        return task
+    
+    async def _fetch_aggregated_balance(self, user_id: str) -> Dict[str, Any]:
+        """Fetch aggregated balance from every account and cache it."""
         try:
-            active_connections = [
-                conn for conn in self.bank_connections.values()
-                if conn.get("user_id") == user_id and conn["status"] == "ACTIVE"
+            active_connections = self._user_connections(user_id, "ACTIVE")
+            
+            # Fetch every account's balance across all banks concurrently
+            accounts = [
+                (index, account_id)
+                for index, connection in enumerate(active_connections)
+                for account_id in connection["accounts"]
             ]
+            results = await asyncio.gather(
+                *(
+                    self.account_service.get_account_balances(
+                        account_id,
+                        active_connections[index]["consent_id"],
+                        active_connections[index]["access_token"]
+                    )
+                    for index, account_id in accounts
+                ),
+                return_exceptions=True
+            )
+            
+            # Sum in integer cents; Decimals are only built for the returned totals
+            bank_cents = [0] * len(active_connections)
+            for (index, account_id), balance_data in zip(accounts, results):
+                if isinstance(balance_data, Exception):
+                    logger.warning(f"Failed to get balance for account {account_id}: {str(balance_data)}")
+                    continue
+                
+                if "balances" in balance_data:
+                    for balance in balance_data["balances"]:
+                        if balance.get("type") == "AVAILABLE":
+                            bank_cents[index] += _amount_cents(balance.get("amount", 0))
+                            break
             
-            total_balance = Decimal('0.00')
             bank_balances = []
             
-            for connection in active_connections:
-                bank_total = Decimal('0.00')
-                
-                for account_id in connection["accounts"]:
-                    try:
-                        balance_data = await self.account_service.get_account_balances(
-                            account_id, connection["consent_id"], connection["access_token"]
-                        )
-                        
-                        if "balances" in balance_data:
-                            for balance in balance_data["balances"]:
-                                if balance.get("type") == "AVAILABLE":
-                                    account_balance = Decimal(str(balance.get("amount", 0)))
-                                    bank_total += account_balance
-                                    break
-                    except Exception as e:
-                        logger.warning(f"Failed to get balance for account {account_id}: {str(e)}")
-                        continue
-                
+            for connection, cents in zip(active_connections, bank_cents):
                 bank_balances.append({
                     "bank_name": connection["name"],
                     "bank_code": connection["code"],
-                    "total_balance": float(bank_total),
+                    "total_balance": Decimal(cents).scaleb(-2),
                     "currency": "BRL"
                 })
-                
-                total_balance += bank_total
             
-            return {
-                "total_balance": float(total_balance),
+            result = {
+                "total_balance": Decimal(sum(bank_cents)).scaleb(-2),
                 "currency": "BRL",
                 "bank_breakdown": bank_balances,
-                "last_updated": datetime.utcnow().isoformat()
+                "last_updated": datetime.utcnow()
             }
+            # A fetch superseded by invalidation may have seen old connections
+            if _aggregated_balance_fetches.get(user_id) is asyncio.current_task():
+                _aggregated_balance_cache.set(user_id, (time.monotonic(), result))
+            return result
             
         except Exception as e:
             logger.error(f"Failed to get aggregated balance: {str(e)}")
             raise
     
+    async def get_aggregated_balances(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get aggregated balances for several users, fetching each distinct user once."""
+        unique_ids = list(dict.fromkeys(user_ids))
+        results = await asyncio.gather(*(self.get_aggregated_balance(user_id) for user_id in unique_ids))
+        return dict(zip(unique_ids, results))
+    
     async def sync_all_banks(self, user_id: str) -> Dict[str, Any]:
         """Sync all connected banks for a user."""
         try:
-            active_connections = [
-                conn for conn in self.bank_connections.values()
-                if conn.get("user_id") == user_id and conn["status"] == "ACTIVE"
-            ]
+            active_connections = self._user_connections(user_id, "ACTIVE")
+            
+            # Sync all banks concurrently; they share self.sync_service and so one
+            # account service, whose lock makes their database work take turns
+            bank_syncs = await asyncio.gather(
+                *(self._sync_bank(connection) for connection in active_connections)
+            )
             
+            # One completion time for every bank that synced
+            now = datetime.utcnow()
             sync_results = []
             total_accounts_synced = 0
-            
-            for connection in active_connections:
-                try:
-                    # Sync all accounts for this bank
-                    sync_result = await self.sync_service.sync_all_accounts([
-                        {
-                            "account_id": account_id,
-                            "consent_id": connection["consent_id"],
-                            "access_token": connection["access_token"]
-                        }
-                        for account_id in connection["accounts"]
-                    ])
-                    
-                    sync_results.append({
-                        "bank_name": connection["name"],
-                        "bank_code": connection["code"],
-                        "sync_result": sync_result
-                    })
-                    
-                    total_accounts_synced += len(connection["accounts"])
-                    
-                    # Update last sync timestamp
-                    connection["last_sync"] = datetime.utcnow().isoformat()
-                    
-                except Exception as e:
-                    logger.error(f"Failed to sync bank {connection['name']}: {str(e)}")
-                    sync_results.append({
-                        "bank_name": connection["name"],
-                        "bank_code": connection["code"],
-                        "sync_result": {"status": "failed", "error": str(e)}
-                    })
+            for connection, (sync_result, synced) in zip(active_connections, bank_syncs):
+                sync_results.append(sync_result)
+                if synced is not None:
+                    self._set_last_sync(connection, now)
+                    total_accounts_synced += synced
+            invalidate_aggregated_balance(user_id)
             
             return {
                 "total_banks_synced": len(active_connections),
                 "total_accounts_synced": total_accounts_synced,
                 "sync_results": sync_results,
-                "sync_completed_at": datetime.utcnow().isoformat()
+                "sync_completed_at": now
             }
             
         except Exception as e:
             logger.error(f"Failed to sync all banks: {str(e)}")
             raise
     
+    async def _sync_bank(self, connection: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int]]:
+        """Sync all accounts of one bank, returning its result and the accounts synced
+        (None if the sync failed).
+        """
+        try:
+            sync_result = await self.sync_service.sync_all_accounts([
+                {
+                    "account_id": account_id,
+                    "consent_id": connection["consent_id"],
+                    "access_token": connection["access_token"]
+                }
+                for account_id in connection["accounts"]
+            ])
+            
+            return {
+                "bank_name": connection["name"],
+                "bank_code": connection["code"],
+                "sync_result": sync_result
+            }, len(connection["accounts"])
+            
+        except Exception as e:
+            logger.error(f"Failed to sync bank {connection['name']}: {str(e)}")
+            return {
+                "bank_name": connection["name"],
+                "bank_code": connection["code"],
+                "sync_result": {"status": "failed", "error": str(e)}
+            }, None
+    
     async def get_bank_health_status(self, user_id: str) -> Dict[str, Any]:
         """Get health status of all connected banks."""
         try:
-            active_connections = [
-                conn for conn in self.bank_connections.values()
-                if conn.get("user_id") == user_id and conn["status"] == "ACTIVE"
-            ]
+            active_connections = self._user_connections(user_id, "ACTIVE")
+            now = datetime.utcnow()
             
             health_status = []
+            healthy_banks = 0
             
             for connection in active_connections:
                 # Check last sync time
                 last_sync = connection.get("last_sync")
-                if last_sync:
-                    last_sync_dt = datetime.fromisoformat(last_sync)
-                    hours_since_sync = (datetime.utcnow() - last_sync_dt).total_seconds() / 3600
-                    
-                    if hours_since_sync < 1:
-                        sync_status = "EXCELLENT"
-                    elif hours_since_sync < 6:
-                        sync_status = "GOOD"
-                    elif hours_since_sync < 24:
-                        sync_status = "WARNING"
-                    else:
-                        sync_status = "CRITICAL"
+                last_sync_dt = self._last_sync_times.get(connection["id"])
+                if last_sync_dt is not None:
+                    hours_since_sync = (now - last_sync_dt).total_seconds() / 3600
+                    sync_status = _SYNC_AGE_STATUSES[bisect_right(_SYNC_AGE_HOURS, hours_since_sync)]
                 else:
                     sync_status = "NEVER_SYNCED"
                 
@@ -334,6 +469,9 @@ class OFBMultiBankService:
                 else:
                     account_status = "NO_ACCOUNTS"
                 
+                is_healthy = sync_status in ("EXCELLENT", "GOOD")
+                healthy_banks += is_healthy
+                
                 health_status.append({
                     "bank_name": connection["name"],
                     "bank_code": connection["code"],
@@ -341,17 +479,23 @@ class OFBMultiBankService:
                     "account_status": account_status,
                     "last_sync": last_sync,
                     "account_count": account_count,
-                    "overall_status": "HEALTHY" if sync_status in ["EXCELLENT", "GOOD"] else "NEEDS_ATTENTION"
+                    "overall_status": "HEALTHY" if is_healthy else "NEEDS_ATTENTION"
                 })
             
             return {
                 "total_banks": len(active_connections),
-                "healthy_banks": len([h for h in health_status if h["overall_status"] == "HEALTHY"]),
-                "banks_needing_attention": len([h for h in health_status if h["overall_status"] == "NEEDS_ATTENTION"]),
+                "healthy_banks": healthy_banks,
+                "banks_needing_attention": len(active_connections) - healthy_banks,
                 "health_details": health_status,
-                "last_checked": datetime.utcnow().isoformat()
+                "last_checked": now
             }
             
         except Exception as e:
             logger.error(f"Failed to get bank health status: {str(e)}")
             raise
+    
+    async def get_bank_health_statuses(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get bank health status for several users, checking each distinct user once."""
+        unique_ids = list(dict.fromkeys(user_ids))
+        results = await asyncio.gather(*(self.get_bank_health_status(user_id) for user_id in unique_ids))
+        return dict(zip(unique_ids, results))
@@ -3,18 +3,47 @@ Open Finance Brasil Payment Service
 Handles payment initiation for PIX, TED/DOC, and scheduled payments.
 """
 import asyncio
+import functools
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple
 from decimal import Decimal
-from uuid import uuid4
 
+import orjson
+
+from ..core.ids import short_id
 from ..core.open_finance_brasil import OpenFinanceBrasilIntegration
 from ..models.transaction import Transaction
 from ..schemas.transaction import TransactionCreate
 
 logger = logging.getLogger(__name__)
 
+_PAYMENT_STATUSES = {
+    "PENDING": "pending",
+    "PROCESSING": "processing", 
+    "COMPLETED": "completed",
+    "FAILED": "failed",
+    "CANCELLED": "cancelled"
+}
+
+# (payment type, status) -> estimated completion; completed payments are handled separately
+_COMPLETION_ESTIMATES = {
+    ("PIX", "PENDING"): "Within 10 seconds",
+    ("PIX", "PROCESSING"): "Within 30 seconds",
+    ("TED", "PENDING"): "Within 1 business day",
+    ("TED", "PROCESSING"): "Within 2 business days",
+    ("DOC", "PENDING"): "Within 1 business day",
+    ("DOC", "PROCESSING"): "Within 2 business days",
+}
+
+# Recurring payment frequencies and the interval between payments (months as 30 days)
+_FREQUENCY_DELTAS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+    "monthly": timedelta(days=30),
+    "yearly": timedelta(days=365),
+}
+
 
 class OFBPaymentService:
     """Service for handling Open Finance Brasil payment operations."""
@@ -22,13 +51,7 @@ class OFBPaymentService:
     def __init__(self, db, ofb_integration: OpenFinanceBrasilIntegration):
         self.db = db
         self.ofb_integration = ofb_integration
-        self.payment_statuses = {
-            "PENDING": "pending",
-            "PROCESSING": "processing", 
-            "COMPLETED": "completed",
-            "FAILED": "failed",
-            "CANCELLED": "cancelled"
-        }
+        self.payment_statuses = _PAYMENT_STATUSES
     
     async def initiate_pix_payment(
         self,
@@ -59,7 +82,7 @@ class OFBPaymentService:
             }
             
             # Mock PIX payment initiation (replace with actual OFB API call)
-            payment_id = f"pix_{uuid4().hex[:8]}"
+            payment_id = short_id("pix")
             payment_status = "PENDING"
             
             if scheduled_date and scheduled_date > datetime.utcnow():
@@ -126,7 +149,7 @@ class OFBPaymentService:
             }
             
             # Mock transfer initiation (replace with actual OFB API call)
-            transfer_id = f"{transfer_type.lower()}_{uuid4().hex[:8]}"
+            transfer_id = short_id(transfer_type.lower())
             transfer_status = "PENDING"
             
             if scheduled_date and scheduled_date > datetime.utcnow():
@@ -174,12 +197,11 @@ class OFBPaymentService:
                 raise ValueError("Invalid or expired access token")
             
             # Validate frequency
-            valid_frequencies = ["daily", "weekly", "monthly", "yearly"]
-            if frequency not in valid_frequencies:
-                raise ValueError(f"Frequency must be one of: {valid_frequencies}")
+            if frequency not in _FREQUENCY_DELTAS:
+                raise ValueError(f"Frequency must be one of: {list(_FREQUENCY_DELTAS)}")
             
             # Create recurring payment schedule
-            schedule_id = f"recurring_{uuid4().hex[:8]}"
+            schedule_id = short_id("recurring")
             
             schedule_data = {
                 "schedule_id": schedule_id,
@@ -293,98 +315,178 @@ class OFBPaymentService:
             if not await self.ofb_integration.validate_access(consent_id, access_token):
                 raise ValueError("Invalid or expired access token")
             
-            # Mock payment history (replace with actual OFB API call)
-            mock_payments = [
-                {
-                    "id": f"pix_{uuid4().hex[:8]}",
-                    "type": "PIX",
-                    "amount": 50.00,
-                    "status": "COMPLETED",
-                    "created_at": (datetime.utcnow() - timedelta(days=1)).isoformat(),
-                    "recipient": "Jane Smith",
-                    "description": "Coffee payment"
-                },
-                {
-                    "id": f"ted_{uuid4().hex[:8]}",
-                    "type": "TED",
-                    "amount": 500.00,
-                    "status": "COMPLETED",
-                    "created_at": (datetime.utcnow() - timedelta(days=3)).isoformat(),
-                    "recipient": "ABC Company",
-                    "description": "Invoice payment"
-                }
-            ]
-            
-            # Apply filters (in real implementation, this would be done at database level)
-            filtered_payments = mock_payments
-            
-            if payment_type:
-                filtered_payments = [p for p in filtered_payments if p["type"] == payment_type]
-            
-            if status:
-                filtered_payments = [p for p in filtered_payments if p["status"] == status]
-            
-            # Apply pagination
-            total_count = len(filtered_payments)
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
-            paginated_payments = filtered_payments[start_idx:end_idx]
+            paginated_payments, total_count = self._fetch_payments(
+                from_date, to_date, payment_type, status,
+                limit=page_size, offset=(page - 1) * page_size
+            )
             
             return {
                 "payments": paginated_payments,
-                "pagination": {
-                    "page": page,
-                    "page_size": page_size,
-                    "total_count": total_count,
-                    "total_pages": (total_count + page_size - 1) // page_size
-                },
-                "filters": {
-                    "from_date": from_date.isoformat() if from_date else None,
-                    "to_date": to_date.isoformat() if to_date else None,
-                    "payment_type": payment_type,
-                    "status": status
-                }
+                "pagination": self._pagination(page, page_size, total_count),
+                "filters": self._history_filters(from_date, to_date, payment_type, status)
             }
             
         except Exception as e:
             logger.error(f"Payment history retrieval failed: {str(e)}")
             raise
     
-    def _estimate_completion_time(self, status: str, payment_type: str = "PIX") -> str:
+    async def stream_payment_history(
+        self,
+        consent_id: str,
+        access_token: str,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        payment_type: Optional[str] = None,
+        status: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 25
+    ) -> AsyncIterator[bytes]:
+        """Get payment history as JSON chunks, validating access up front.
+        
+        The document matches get_payment_history, but each payment is sent as
+        it is read and pagination follows the payments, once the total is known.
+        """
+        if not await self.ofb_integration.validate_access(consent_id, access_token):
+            raise ValueError("Invalid or expired access token")
+        
+        return self._payment_history_chunks(from_date, to_date, payment_type, status, page, page_size)
+    
+    async def _payment_history_chunks(
+        self,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        payment_type: Optional[str],
+        status: Optional[str],
+        page: int,
+        page_size: int
+    ) -> AsyncIterator[bytes]:
+        """Serialize one page of payment history row by row."""
+        offset = (page - 1) * page_size
+        total_count = 0
+        separator = b""
+        
+        yield b'{"payments":['
+        for created_at, payment in self._iter_payments(from_date, to_date, payment_type, status):
+            if offset <= total_count < offset + page_size:
+                yield separator + orjson.dumps(dict(payment, created_at=created_at.isoformat()))
+                separator = b","
+            total_count += 1
+        
+        yield (
+            b'],"pagination":' + orjson.dumps(self._pagination(page, page_size, total_count))
+            + b',"filters":' + orjson.dumps(self._history_filters(from_date, to_date, payment_type, status))
+            + b"}"
+        )
+    
+    def _fetch_payments(
+        self,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        payment_type: Optional[str],
+        status: Optional[str],
+        limit: int,
+        offset: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Get one page of matching payments, newest first, and the total match count.
+        
+        Takes the same filters and LIMIT/OFFSET as the payments query that will
+        replace the mock data, so callers never load the full history.
+        """
+        page = []
+        total_count = 0
+        for created_at, payment in self._iter_payments(from_date, to_date, payment_type, status):
+            # Only rows inside the page are materialized
+            if offset <= total_count < offset + limit:
+                page.append(dict(payment, created_at=created_at.isoformat()))
+            total_count += 1
+        
+        return page, total_count
+    
+    def _iter_payments(
+        self,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        payment_type: Optional[str],
+        status: Optional[str]
+    ) -> Iterator[Tuple[datetime, Dict[str, Any]]]:
+        """Yield (created_at, payment) for each matching payment, newest first."""
+        from_date = self._naive_utc(from_date)
+        to_date = self._naive_utc(to_date)
+        # Mock payment history (replace with actual OFB API call), newest first
+        now = datetime.utcnow()
+        mock_payments = [
+            (now - timedelta(days=1), {
+                "id": short_id("pix"),
+                "type": "PIX",
+                "amount": 50.00,
+                "status": "COMPLETED",
+                "recipient": "Jane Smith",
+                "description": "Coffee payment"
+            }),
+            (now - timedelta(days=3), {
+                "id": short_id("ted"),
+                "type": "TED",
+                "amount": 500.00,
+                "status": "COMPLETED",
+                "recipient": "ABC Company",
+                "description": "Invoice payment"
+            })
+        ]
+        
+        for created_at, payment in mock_payments:
+            if from_date and created_at < from_date or to_date and created_at > to_date:
+                continue
+            if payment_type and payment["type"] != payment_type or status and payment["status"] != status:
+                continue
+            yield created_at, payment
+    
+    @staticmethod
+    def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+        """Convert an aware datetime to naive UTC, matching the payment timestamps."""
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    
+    @staticmethod
+    def _pagination(page: int, page_size: int, total_count: int) -> Dict[str, int]:
+        """Build the pagination block of a payment history response."""
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total_count": total_count,
+            "total_pages": (total_count + page_size - 1) // page_size
+        }
+    
+    @staticmethod
+    def _history_filters(
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        payment_type: Optional[str],
+        status: Optional[str]
+    ) -> Dict[str, Optional[str]]:
+        """Build the filters block of a payment history response."""
+        return {
+            "from_date": from_date.isoformat() if from_date else None,
+            "to_date": to_date.isoformat() if to_date else None,
+            "payment_type": payment_type,
+            "status": status
+        }
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _estimate_completion_time(status: str, payment_type: str = "PIX") -> str:
         """Estimate completion time based on payment type and status."""
         if status == "COMPLETED":
             return "Already completed"
-        
-        if payment_type == "PIX":
-            if status == "PENDING":
-                return "Within 10 seconds"
-            elif status == "PROCESSING":
-                return "Within 30 seconds"
-        elif payment_type in ["TED", "DOC"]:
-            if status == "PENDING":
-                return "Within 1 business day"
-            elif status == "PROCESSING":
-                return "Within 2 business days"
-        
-        return "Unknown"
+        return _COMPLETION_ESTIMATES.get((payment_type, status), "Unknown")
     
-    def _calculate_next_payment_date(self, start_date: datetime, frequency: str) -> str:
+    @staticmethod
+    def _calculate_next_payment_date(start_date: datetime, frequency: str) -> str:
         """Calculate the next payment date based on frequency."""
         current_date = datetime.utcnow()
         
         if start_date > current_date:
             return start_date.isoformat()
         
-        if frequency == "daily":
-            next_date = current_date + timedelta(days=1)
-        elif frequency == "weekly":
-            next_date = current_date + timedelta(weeks=1)
-        elif frequency == "monthly":
-            # Simple monthly calculation (30 days)
-            next_date = current_date + timedelta(days=30)
-        elif frequency == "yearly":
-            next_date = current_date + timedelta(days=365)
-        else:
-            next_date = current_date + timedelta(days=1)
-        
+        next_date = current_date + _FREQUENCY_DELTAS.get(frequency, _FREQUENCY_DELTAS["daily"])
         return next_date.isoformat()
@@ -4,9 +4,13 @@ Phase 3: Automated Account Data Synchronization
 """
 
 import asyncio
+import heapq
 import logging
-from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional, Any
+import time
+from contextlib import suppress
+from dataclasses import asdict, dataclass
+from datetime import datetime, date, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple, TypeVar
 from uuid import UUID
 
 from fastapi import HTTPException, status
@@ -18,6 +22,87 @@ from ..config_ofb import ofb_settings
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class SyncJob:
+    """Scheduled synchronization of one account."""
+    account_id: str
+    consent_id: str
+    access_token: str
+    sync_frequency: str
+    sync_time: str
+    next_sync: str  # ISO time, for display
+    next_sync_epoch: float  # UTC epoch seconds, for scheduling
+    created_at: str
+    last_sync: Optional[str] = None
+    status: str = "scheduled"
+    enabled: bool = True
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the job as a dict for API responses."""
+        return asdict(self)
+
+
+# Sync jobs by account_id, shared by every service instance in this process
+_sync_jobs: Dict[str, SyncJob] = {}
+# Heap of (next_sync_epoch, account_id) runs; entries whose job was since
+# rescheduled, disabled or removed are dropped when they come due
+_due_jobs: List[Tuple[float, str]] = []
+# Set when a queued run becomes the earliest, so a sleeping scheduler wakes for it
+_schedule_changed: Optional[asyncio.Event] = None
+
+
+async def _bounded(semaphore: asyncio.Semaphore, call: Awaitable[T]) -> T:
+    """Await a call once the semaphore has a free slot."""
+    async with semaphore:
+        return await call
+
+
+def _is_live(entry: Tuple[float, str]) -> bool:
+    """Check a heap entry still matches its job's next run."""
+    next_sync_epoch, account_id = entry
+    sync_job = _sync_jobs.get(account_id)
+    return sync_job is not None and sync_job.enabled and sync_job.next_sync_epoch == next_sync_epoch
+
+
+def _compact_due_jobs() -> None:
+    """Drop stale heap entries once they outnumber the live jobs."""
+    if len(_due_jobs) > 2 * len(_sync_jobs) + 64:
+        _due_jobs[:] = [entry for entry in set(_due_jobs) if _is_live(entry)]
+        heapq.heapify(_due_jobs)
+
+
+async def run_sync_scheduler(session_factory: Callable[[], Session], poll_interval: float) -> None:
+    """Run due sync jobs until cancelled.
+    
+    Sleeps until the earliest queued job is due, or until a job is queued to
+    run sooner, waking at least every poll_interval seconds. Each run gets
+    its own session from session_factory.
+    """
+    global _schedule_changed
+    schedule_changed = _schedule_changed = asyncio.Event()
+    try:
+        while True:
+            if _due_jobs and _due_jobs[0][0] <= time.time():
+                db = session_factory()
+                try:
+                    await OFBSyncService(db).execute_scheduled_sync(session_factory)
+                except Exception as e:
+                    logger.error(f"Scheduled sync run failed: {e}")
+                finally:
+                    db.close()
+            
+            delay = poll_interval
+            if _due_jobs:
+                delay = min(delay, max(0.0, _due_jobs[0][0] - time.time()))
+            schedule_changed.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(schedule_changed.wait(), timeout=delay)
+    finally:
+        _schedule_changed = None
+
 
 class OFBSyncService:
     """Service for automated Open Finance Brasil data synchronization"""
@@ -25,7 +110,7 @@ class OFBSyncService:
     def __init__(self, db: Session):
         self.db = db
         self.account_service = OFBAccountService(db)
-        self.sync_jobs: Dict[str, Dict[str, Any]] = {}  # Track sync jobs
+        self.sync_jobs = _sync_jobs
         
     async def schedule_account_sync(self,
                                   account_id: str,
@@ -36,22 +121,23 @@ class OFBSyncService:
         """Schedule automated account synchronization"""
         
         try:
+            next_sync_epoch, next_sync = self._calculate_next_sync(sync_frequency, sync_time)
+            
             # Create sync job configuration
-            sync_job = {
-                "account_id": account_id,
-                "consent_id": consent_id,
-                "access_token": access_token,
-                "sync_frequency": sync_frequency,
-                "sync_time": sync_time,
-                "last_sync": None,
-                "next_sync": self._calculate_next_sync(sync_frequency, sync_time),
-                "status": "scheduled",
-                "created_at": datetime.utcnow().isoformat(),
-                "enabled": True
-            }
+            sync_job = SyncJob(
+                account_id=account_id,
+                consent_id=consent_id,
+                access_token=access_token,
+                sync_frequency=sync_frequency,
+                sync_time=sync_time,
+                next_sync=next_sync,
+                next_sync_epoch=next_sync_epoch,
+                created_at=datetime.utcnow().isoformat()
+            )
             
             # Store sync job
             self.sync_jobs[account_id] = sync_job
+            self._queue_job(account_id, sync_job)
             
             logger.info(f"Scheduled sync for account {account_id} with frequency {sync_frequency}")
             
@@ -59,7 +145,7 @@ class OFBSyncService:
                 "status": "scheduled",
                 "account_id": account_id,
                 "sync_frequency": sync_frequency,
-                "next_sync": sync_job["next_sync"],
+                "next_sync": sync_job.next_sync,
                 "job_id": account_id
             }
             
@@ -70,60 +156,68 @@ class OFBSyncService:
                 detail=f"Failed to schedule account sync: {str(e)}"
             )
     
-    async def execute_scheduled_sync(self) -> Dict[str, Any]:
-        """Execute all scheduled synchronization jobs"""
+    async def schedule_account_syncs(self,
+                                   account_ids: List[str],
+                                   consent_id: str,
+                                   access_token: str,
+                                   sync_frequency: str = "daily",
+                                   sync_time: str = "06:00") -> List[Dict[str, Any]]:
+        """Schedule automated synchronization for several accounts under one consent"""
+        
+        next_sync_epoch, next_sync = self._calculate_next_sync(sync_frequency, sync_time)
+        created_at = datetime.utcnow().isoformat()
+        
+        self.sync_jobs.update(
+            (account_id, SyncJob(
+                account_id=account_id,
+                consent_id=consent_id,
+                access_token=access_token,
+                sync_frequency=sync_frequency,
+                sync_time=sync_time,
+                next_sync=next_sync,
+                next_sync_epoch=next_sync_epoch,
+                created_at=created_at
+            ))
+            for account_id in account_ids
+        )
+        for account_id in account_ids:
+            self._queue_job(account_id, self.sync_jobs[account_id])
+        
+        logger.info(f"Scheduled sync for {len(account_ids)} accounts with frequency {sync_frequency}")
+        
+        return [
+            {
+                "status": "scheduled",
+                "account_id": account_id,
+                "sync_frequency": sync_frequency,
+                "next_sync": next_sync,
+                "job_id": account_id
+            }
+            for account_id in account_ids
+        ]
+    
+    async def execute_scheduled_sync(self,
+                                     session_factory: Optional[Callable[[], Session]] = None) -> Dict[str, Any]:
+        """Execute all scheduled synchronization jobs
+        
+        With a session_factory, each due job syncs on its own session, so jobs
+        can run their database work in parallel, except on SQLite, whose
+        sessions share one connection and take turns process-wide. Without
+        one, jobs take turns on this service's session.
+        """
         
         try:
-            sync_results = []
             current_time = datetime.utcnow()
+            due_jobs = self._pop_due_jobs(time.time())
             
-            for account_id, sync_job in self.sync_jobs.items():
-                if not sync_job["enabled"]:
-                    continue
-                
-                # Check if it's time to sync
-                next_sync = datetime.fromisoformat(sync_job["next_sync"])
-                if current_time >= next_sync:
-                    try:
-                        # Execute sync
-                        sync_result = await self.account_service.sync_account_data(
-                            account_id=account_id,
-                            consent_id=sync_job["consent_id"],
-                            access_token=sync_job["access_token"]
-                        )
-                        
-                        # Update sync job
-                        sync_job["last_sync"] = current_time.isoformat()
-                        sync_job["next_sync"] = self._calculate_next_sync(
-                            sync_job["sync_frequency"], 
-                            sync_job["sync_time"]
-                        )
-                        sync_job["status"] = "completed"
-                        
-                        sync_results.append({
-                            "account_id": account_id,
-                            "status": "success",
-                            "result": sync_result
-                        })
-                        
-                        logger.info(f"Successfully synced account {account_id}")
-                        
-                    except Exception as e:
-                        # Update sync job with error
-                        sync_job["last_sync"] = current_time.isoformat()
-                        sync_job["next_sync"] = self._calculate_next_sync(
-                            sync_job["sync_frequency"], 
-                            sync_job["sync_time"]
-                        )
-                        sync_job["status"] = "failed"
-                        
-                        sync_results.append({
-                            "account_id": account_id,
-                            "status": "failed",
-                            "error": str(e)
-                        })
-                        
-                        logger.error(f"Failed to sync account {account_id}: {e}")
+            # Run every due job concurrently, bounded by the semaphore
+            sync_results = []
+            if due_jobs:
+                semaphore = asyncio.Semaphore(ofb_settings.ofb_max_concurrent_syncs)
+                sync_results = await asyncio.gather(*(
+                    self._run_scheduled_sync(account_id, sync_job, current_time, semaphore, session_factory)
+                    for account_id, sync_job in due_jobs
+                ))
             
             return {
                 "status": "completed",
@@ -140,50 +234,119 @@ class OFBSyncService:
                 detail=f"Scheduled sync execution failed: {str(e)}"
             )
     
+    async def _run_scheduled_sync(self,
+                                  account_id: str,
+                                  sync_job: SyncJob,
+                                  current_time: datetime,
+                                  semaphore: asyncio.Semaphore,
+                                  session_factory: Optional[Callable[[], Session]] = None) -> Dict[str, Any]:
+        """Run one due sync job, then record its outcome and queue its next run"""
+        
+        db = session_factory() if session_factory else None
+        try:
+            account_service = OFBAccountService(db) if db is not None else self.account_service
+            sync_result = await _bounded(semaphore, account_service.sync_account_data(
+                account_id=account_id,
+                consent_id=sync_job.consent_id,
+                access_token=sync_job.access_token
+            ))
+            
+            sync_job.status = "completed"
+            result = {
+                "account_id": account_id,
+                "status": "success",
+                "result": sync_result
+            }
+            
+            logger.info(f"Successfully synced account {account_id}")
+            
+        except Exception as e:
+            sync_job.status = "failed"
+            result = {
+                "account_id": account_id,
+                "status": "failed",
+                "error": str(e)
+            }
+            
+            logger.error(f"Failed to sync account {account_id}: {e}")
+        
+        finally:
+            if db is not None:
+                db.close()
+        
+        # Update sync job
+        ran_epoch = sync_job.next_sync_epoch
+        sync_job.last_sync = current_time.isoformat()
+        sync_job.next_sync_epoch, sync_job.next_sync = self._calculate_next_sync(
+            sync_job.sync_frequency, 
+            sync_job.sync_time
+        )
+        # Never queue a run at or before the one that just ran, or it would repeat at once
+        if sync_job.next_sync_epoch > ran_epoch:
+            self._queue_job(account_id, sync_job)
+        else:
+            logger.error(f"Not requeueing account {account_id}: next sync {sync_job.next_sync} is not after the last run")
+        
+        return result
+    
     async def sync_all_accounts(self, user_consents: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Synchronize all accounts for a user"""
         
         try:
-            sync_results = []
+            semaphore = asyncio.Semaphore(ofb_settings.ofb_max_concurrent_syncs)
             
-            for consent in user_consents:
-                consent_id = consent["consent_id"]
-                access_token = consent["access_token"]
-                
-                # Discover accounts for this consent
-                accounts = await self.account_service.discover_accounts(consent_id, access_token)
-                
-                for account in accounts:
-                    try:
-                        # Sync account data
-                        sync_result = await self.account_service.sync_account_data(
-                            account_id=account["accountId"],
-                            consent_id=consent_id,
-                            access_token=access_token
-                        )
-                        
-                        sync_results.append({
-                            "account_id": account["accountId"],
-                            "bank_name": account["brandName"],
-                            "status": "success",
-                            "result": sync_result
-                        })
-                        
-                    except Exception as e:
-                        sync_results.append({
-                            "account_id": account["accountId"],
-                            "bank_name": account["brandName"],
-                            "status": "failed",
-                            "error": str(e)
-                        })
-                        
-                        logger.error(f"Failed to sync account {account['accountId']}: {e}")
+            # Discover every consent's accounts concurrently
+            discovered = await asyncio.gather(*(
+                _bounded(semaphore, self.account_service.discover_accounts(
+                    consent["consent_id"], consent["access_token"]
+                ))
+                for consent in user_consents
+            ))
+            
+            # Then sync every discovered account concurrently
+            jobs = [
+                (consent, account)
+                for consent, accounts in zip(user_consents, discovered)
+                for account in accounts
+            ]
+            results = await asyncio.gather(
+                *(
+                    _bounded(semaphore, self.account_service.sync_account_data(
+                        account_id=account["accountId"],
+                        consent_id=consent["consent_id"],
+                        access_token=consent["access_token"]
+                    ))
+                    for consent, account in jobs
+                ),
+                return_exceptions=True
+            )
+            
+            sync_results = []
+            failed_syncs = 0
+            for (consent, account), sync_result in zip(jobs, results):
+                if isinstance(sync_result, BaseException):
+                    failed_syncs += 1
+                    sync_results.append({
+                        "account_id": account["accountId"],
+                        "bank_name": account["brandName"],
+                        "status": "failed",
+                        "error": str(sync_result)
+                    })
+                    
+                    logger.error(f"Failed to sync account {account['accountId']}: {sync_result}")
+                else:
+                    sync_results.append({
+                        "account_id": account["accountId"],
+                        "bank_name": account["brandName"],
+                        "status": "success",
+                        "result": sync_result
+                    })
             
             return {
                 "status": "completed",
                 "total_accounts": len(sync_results),
-                "successful_syncs": len([r for r in sync_results if r["status"] == "success"]),
-                "failed_syncs": len([r for r in sync_results if r["status"] == "failed"]),
+                "successful_syncs": len(sync_results) - failed_syncs,
+                "failed_syncs": failed_syncs,
                 "results": sync_results,
                 "sync_timestamp": datetime.utcnow().isoformat()
             }
@@ -210,15 +373,15 @@ class OFBSyncService:
                 sync_job = self.sync_jobs[account_id]
                 return {
                     "account_id": account_id,
-                    "sync_status": sync_job
+                    "sync_status": sync_job.to_dict()
                 }
             else:
                 # Get status for all accounts
                 return {
                     "total_jobs": len(self.sync_jobs),
-                    "enabled_jobs": len([j for j in self.sync_jobs.values() if j["enabled"]]),
-                    "disabled_jobs": len([j for j in self.sync_jobs.values() if not j["enabled"]]),
-                    "sync_jobs": self.sync_jobs
+                    "enabled_jobs": len([j for j in self.sync_jobs.values() if j.enabled]),
+                    "disabled_jobs": len([j for j in self.sync_jobs.values() if not j.enabled]),
+                    "sync_jobs": {job_id: job.to_dict() for job_id, job in self.sync_jobs.items()}
                 }
                 
         except HTTPException:
@@ -248,22 +411,28 @@ class OFBSyncService:
             
             # Update configuration
             if sync_frequency is not None:
-                sync_job["sync_frequency"] = sync_frequency
-                sync_job["next_sync"] = self._calculate_next_sync(sync_frequency, sync_job["sync_time"])
+                sync_job.sync_frequency = sync_frequency
+                sync_job.next_sync_epoch, sync_job.next_sync = self._calculate_next_sync(
+                    sync_frequency, sync_job.sync_time
+                )
             
             if sync_time is not None:
-                sync_job["sync_time"] = sync_time
-                sync_job["next_sync"] = self._calculate_next_sync(sync_job["sync_frequency"], sync_time)
+                sync_job.sync_time = sync_time
+                sync_job.next_sync_epoch, sync_job.next_sync = self._calculate_next_sync(
+                    sync_job.sync_frequency, sync_time
+                )
             
             if enabled is not None:
-                sync_job["enabled"] = enabled
+                sync_job.enabled = enabled
+            
+            self._queue_job(account_id, sync_job)
             
             logger.info(f"Updated sync config for account {account_id}")
             
             return {
                 "status": "updated",
                 "account_id": account_id,
-                "sync_config": sync_job
+                "sync_config": sync_job.to_dict()
             }
             
         except HTTPException:
@@ -293,7 +462,7 @@ class OFBSyncService:
             return {
                 "status": "removed",
                 "account_id": account_id,
-                "removed_job": removed_job
+                "removed_job": removed_job.to_dict()
             }
             
         except HTTPException:
@@ -305,8 +474,41 @@ class OFBSyncService:
                 detail=f"Failed to remove sync job: {str(e)}"
             )
     
-    def _calculate_next_sync(self, frequency: str, sync_time: str) -> str:
-        """Calculate next sync time based on frequency and time"""
+    async def remove_sync_jobs(self, account_ids: List[str]) -> Dict[str, Any]:
+        """Remove synchronization jobs for several accounts, ignoring accounts without one"""
+        
+        removed = [account_id for account_id in account_ids if self.sync_jobs.pop(account_id, None)]
+        
+        logger.info(f"Removed {len(removed)} sync jobs")
+        
+        return {
+            "status": "removed",
+            "removed_account_ids": removed
+        }
+    
+    def _queue_job(self, account_id: str, sync_job: SyncJob) -> None:
+        """Queue a job's next run in the due-time heap."""
+        if sync_job.enabled:
+            _compact_due_jobs()
+            heapq.heappush(_due_jobs, (sync_job.next_sync_epoch, account_id))
+            if _schedule_changed is not None and _due_jobs[0][1] == account_id:
+                _schedule_changed.set()
+    
+    def _pop_due_jobs(self, now: float) -> List[Tuple[str, SyncJob]]:
+        """Pop the enabled jobs due by the epoch time now, skipping stale heap entries."""
+        due: Dict[str, SyncJob] = {}
+        while _due_jobs and _due_jobs[0][0] <= now:
+            entry = heapq.heappop(_due_jobs)
+            if _is_live(entry):
+                due[entry[1]] = self.sync_jobs[entry[1]]
+        return list(due.items())
+    
+    def _calculate_next_sync(self, frequency: str, sync_time: str) -> Tuple[float, str]:
+        """Calculate next sync time based on frequency and time.
+        
+        Returns the UTC epoch seconds used for scheduling and the ISO string
+        shown to clients.
+        """
         
         try:
             # Parse sync time
@@ -325,17 +527,17 @@ class OFBSyncService:
                 if days_ahead == 7:
                     days_ahead = 0
                 next_sync = current_time.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(days=days_ahead)
+                if next_sync <= current_time:
+                    next_sync += timedelta(days=7)
             
             elif frequency == "monthly":
                 # Sync on the 1st of each month
-                if current_time.day > 1:
-                    next_sync = current_time.replace(day=1, hour=hour, minute=minute, second=0, microsecond=0)
+                next_sync = current_time.replace(day=1, hour=hour, minute=minute, second=0, microsecond=0)
+                if next_sync <= current_time:
                     if current_time.month == 12:
                         next_sync = next_sync.replace(year=current_time.year + 1, month=1)
                     else:
                         next_sync = next_sync.replace(month=current_time.month + 1)
-                else:
-                    next_sync = current_time.replace(hour=hour, minute=minute, second=0, microsecond=0)
             
             else:
                 # Default to daily
@@ -343,9 +545,9 @@ class OFBSyncService:
                 if next_sync <= current_time:
                     next_sync += timedelta(days=1)
             
-            return next_sync.isoformat()
-            
         except Exception as e:
             logger.error(f"Failed to calculate next sync time: {e}")
             # Default to tomorrow at current time
-            return (datetime.utcnow() + timedelta(days=1)).isoformat()
+            next_sync = datetime.utcnow() + timedelta(days=1)
+        
+        return next_sync.replace(tzinfo=timezone.utc).timestamp(), next_sync.isoformat()
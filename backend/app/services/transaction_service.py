@@ -1,14 +1,19 @@
 """
 Transaction service for managing financial transactions.
 """
-from datetime import date, datetime
+import base64
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Tuple, Dict, Any
-from uuid import UUID
+from typing import Iterator, List, Optional, Tuple, Dict, Any
+from uuid import UUID, uuid4
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc, asc
+from sqlalchemy import (
+    DateTime, and_, or_, func, desc, asc, case, cast, distinct, insert, literal_column, select, tuple_, type_coerce
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import IntegrityError
 
+from ..core.open_finance_standards import TransactionType
 from ..models.transaction import Transaction
 from ..models.category import Category
 from ..schemas.transaction import (
@@ -21,6 +26,24 @@ from ..schemas.transaction import (
 from ..schemas.common import PaginationParams, PaginatedResponse
 from .categorization_service import CategorizationService
 
+# Rows per fetch when streaming large result sets
+_STREAM_BATCH_SIZE = 1000
+
+# Period grouping expressions by dialect, built once so every call emits the
+# same SQL; PostgreSQL months match idx_transactions_date_month
+_PERIOD_EXPRESSIONS = {
+    "postgresql": {
+        "month": func.date_trunc(literal_column("'month'"), cast(Transaction.date, DateTime)),
+        "week": func.date_trunc(literal_column("'week'"), cast(Transaction.date, DateTime)),
+        "day": func.date_trunc(literal_column("'day'"), cast(Transaction.date, DateTime)),
+    },
+    "sqlite": {
+        "month": func.strftime("%Y-%m", Transaction.date),
+        "week": func.strftime("%Y-W%W", Transaction.date),
+        "day": func.date(Transaction.date),
+    },
+}
+
 
 class TransactionService:
     """Service for managing financial transactions."""
@@ -73,6 +96,38 @@ class TransactionService:
             self.db.rollback()
             raise Exception(f"Unexpected error creating transaction: {str(e)}")
     
+    def create_transactions(self, batch: List[TransactionCreate]) -> List[UUID]:
+        """Create many transactions with one categorization pass and one commit.
+        
+        Returns the IDs of the created transactions, in batch order.
+        """
+        # Suggest categories for all uncategorized rows at once
+        suggested_ids = iter(self.categorization_service.suggest_category_ids_bulk([
+            (data.description, float(data.amount), None) for data in batch if not data.category_id
+        ]))
+        
+        rows = []
+        for data in batch:
+            row = data.dict()
+            row["id"] = uuid4()
+            if not data.category_id:
+                row["category_id"] = next(suggested_ids)
+            rows.append(row)
+        
+        try:
+            if rows:
+                self.db.execute(insert(Transaction), rows)
+            self.db.commit()
+            
+        except IntegrityError as e:
+            self.db.rollback()
+            raise ValueError(f"Failed to create transactions: {str(e)}")
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Unexpected error creating transactions: {str(e)}")
+        
+        return [row["id"] for row in rows]
+    
     def get_transaction(self, transaction_id: UUID) -> Optional[Transaction]:
         """Get a transaction by ID."""
         return self.db.query(Transaction).filter(Transaction.id == transaction_id).first()
@@ -80,27 +135,57 @@ class TransactionService:
     def get_transactions(
         self,
         filters: Optional[TransactionFilters] = None,
-        pagination: Optional[PaginationParams] = None
+        pagination: Optional[PaginationParams] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True
     ) -> PaginatedResponse:
-        """Get transactions with filtering and pagination."""
+        """Get transactions with filtering and pagination.
+        
+        Passing the previous page's next_cursor continues after its last row
+        (keyset pagination) instead of skipping rows with OFFSET. The total
+        comes from a COUNT(*) OVER () window on the page query itself; it can
+        be left out with include_total.
+        """
         query = self.db.query(Transaction)
         
         # Apply filters
         if filters:
             query = self._apply_transaction_filters(query, filters)
+        filtered_query = query
         
-        # Get total count
-        total = query.count()
+        # Order by date (newest first), with the ID as a unique tie-breaker
+        query = query.order_by(desc(Transaction.date), desc(Transaction.created_at), desc(Transaction.id))
         
         # Apply pagination
+        if cursor:
+            query = query.filter(
+                tuple_(Transaction.date, Transaction.created_at, Transaction.id) < self._decode_cursor(cursor)
+            )
+        elif pagination:
+            query = query.offset(pagination.offset)
         if pagination:
-            query = query.offset(pagination.offset).limit(pagination.limit)
+            query = query.limit(pagination.limit)
         
-        # Order by date (newest first)
-        query = query.order_by(desc(Transaction.date), desc(Transaction.created_at))
+        # Execute query, counting the filtered rows in the same round trip;
+        # the cursor filter would narrow the window, so cursor pages count separately
+        total = None
+        if include_total and not cursor:
+            rows = query.add_columns(func.count().over().label("total")).all()
+            transactions = [transaction for transaction, _ in rows]
+            if rows:
+                total = rows[0].total
+            elif pagination and pagination.offset:
+                total = filtered_query.count()
+            else:
+                total = 0
+        else:
+            transactions = query.all()
+            if include_total:
+                total = filtered_query.count()
         
-        # Execute query
-        transactions = query.all()
+        next_cursor = None
+        if pagination and len(transactions) == pagination.limit:
+            next_cursor = self._encode_cursor(transactions[-1])
         
         # Create paginated response
         if pagination:
@@ -108,16 +193,32 @@ class TransactionService:
                 items=transactions,
                 total=total,
                 page=pagination.page,
-                size=pagination.size
+                size=pagination.size,
+                next_cursor=next_cursor
             )
         else:
             return PaginatedResponse(
                 items=transactions,
                 total=total,
                 page=1,
-                size=total
+                size=len(transactions)
             )
     
+    @staticmethod
+    def _encode_cursor(transaction: Transaction) -> str:
+        """Encode a transaction's sort key as an opaque page cursor."""
+        key = f"{transaction.date.isoformat()}|{transaction.created_at.isoformat()}|{transaction.id}"
+        return base64.urlsafe_b64encode(key.encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[date, datetime, UUID]:
+        """Decode a page cursor back into its (date, created_at, id) sort key."""
+        try:
+            date_str, created_at_str, id_str = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return date.fromisoformat(date_str), datetime.fromisoformat(created_at_str), UUID(id_str)
+        except ValueError:
+            raise ValueError("Invalid pagination cursor")
+    
     def update_transaction(self, transaction_id: UUID, update_data: TransactionUpdate) -> Optional[Transaction]:
         """Update an existing transaction."""
         db_transaction = self.get_transaction(transaction_id)
@@ -172,8 +273,18 @@ class TransactionService:
         return query.order_by(desc(Transaction.date)).limit(limit).all()
     
     def get_transaction_summary(self, date_range: Optional[Tuple[date, date]] = None) -> TransactionSummary:
-        """Get transaction summary statistics."""
-        query = self.db.query(Transaction)
+        """Get transaction summary statistics, aggregated in the database."""
+        query = self.db.query(
+            func.count(Transaction.id),
+            type_coerce(func.sum(case(
+                (Transaction.transaction_type == TransactionType.INCOME.value, Transaction.amount),
+                else_=0
+            )), Transaction.amount.type),
+            type_coerce(func.sum(case(
+                (Transaction.transaction_type == TransactionType.EXPENSE.value, func.abs(Transaction.amount)),
+                else_=0
+            )), Transaction.amount.type)
+        )
         
         # Apply date range filter
         if date_range:
@@ -182,64 +293,58 @@ class TransactionService:
                 and_(Transaction.date >= start_date, Transaction.date <= end_date)
             )
         
-        # Get all transactions for summary
-        transactions = query.all()
-        
-        # Calculate summary statistics
-        total_transactions = len(transactions)
-        total_income = sum(t.amount for t in transactions if t.is_income)
-        total_expenses = sum(abs(t.amount) for t in transactions if t.is_expense)
-        total_transfers = sum(abs(t.amount) for t in transactions if t.is_transfer)
-        total_investments = sum(abs(t.amount) for t in transactions if t.is_investment)
-        
-        net_amount = total_income - total_expenses
-        average_transaction = (total_income + total_expenses + total_transfers + total_investments) / total_transactions if total_transactions > 0 else Decimal('0')
+        total_transactions, total_income, total_expenses = query.one()
+        total_income = total_income or Decimal('0')
+        total_expenses = total_expenses or Decimal('0')
         
         return TransactionSummary(
             total_transactions=total_transactions,
             total_income=total_income,
             total_expenses=total_expenses,
-            total_transfers=total_transfers,
-            total_investments=total_investments,
-            net_amount=net_amount,
-            average_transaction=average_transaction
+            net_amount=total_income - total_expenses
         )
     
     def bulk_operation(self, operation_data: BulkTransactionOperation) -> Dict[str, Any]:
-        """Perform bulk operations on transactions."""
+        """Perform bulk operations on transactions with one statement for all IDs."""
         results = {
             "success_count": 0,
             "error_count": 0,
             "errors": []
         }
         
-        for transaction_id in operation_data.transaction_ids:
-            try:
-                if operation_data.operation == "delete":
-                    if self.delete_transaction(transaction_id):
-                        results["success_count"] += 1
-                    else:
-                        results["error_count"] += 1
-                        results["errors"].append(f"Transaction {transaction_id} not found")
-                
-                elif operation_data.operation == "update" and operation_data.update_data:
-                    if self.update_transaction(transaction_id, operation_data.update_data):
-                        results["success_count"] += 1
-                    else:
-                        results["error_count"] += 1
-                        results["errors"].append(f"Transaction {transaction_id} not found")
-                
-                elif operation_data.operation == "categorize" and operation_data.category_id:
-                    update_data = TransactionUpdate(category_id=operation_data.category_id)
-                    if self.update_transaction(transaction_id, update_data):
-                        results["success_count"] += 1
-                    else:
-                        results["error_count"] += 1
-                        results["errors"].append(f"Transaction {transaction_id} not found")
-                
-            except Exception as e:
+        if operation_data.operation == "delete":
+            values = None
+        elif operation_data.operation == "update" and operation_data.update_data:
+            values = operation_data.update_data.dict(exclude_unset=True)
+        elif operation_data.operation == "categorize" and operation_data.category_id:
+            values = {"category_id": operation_data.category_id}
+        else:
+            return results
+        
+        transaction_ids = list(dict.fromkeys(operation_data.transaction_ids))
+        
+        try:
+            query = self.db.query(Transaction).filter(Transaction.id.in_(transaction_ids))
+            existing_ids = {transaction_id for (transaction_id,) in query.with_entities(Transaction.id)}
+            
+            if values is None:
+                query.delete(synchronize_session=False)
+            else:
+                values["updated_at"] = datetime.utcnow()
+                query.update(values, synchronize_session=False)
+            self.db.commit()
+            
+        except Exception as e:
+            self.db.rollback()
+            results["error_count"] = len(transaction_ids)
+            results["errors"].append(f"Error processing transactions: {str(e)}")
+            return results
+        
+        results["success_count"] = len(existing_ids)
+        for transaction_id in transaction_ids:
+            if transaction_id not in existing_ids:
                 results["error_count"] += 1
-                results["errors"].append(f"Error processing transaction {transaction_id}: {str(e)}")
+                results["errors"].append(f"Transaction {transaction_id} not found")
         
         return results
     
@@ -255,11 +360,17 @@ class TransactionService:
             desc(Transaction.created_at)
         ).limit(limit).all()
     
-    def get_transactions_by_date_range(self, start_date: date, end_date: date) -> List[Transaction]:
-        """Get transactions within a date range."""
+    def get_transactions_by_date_range(self, start_date: date, end_date: date) -> Iterator[Transaction]:
+        """Iterate over transactions within a date range, newest first.
+        
+        Rows are fetched in batches with a server-side cursor where the driver
+        supports one, so large ranges are never held in memory at once.
+        """
         return self.db.query(Transaction).filter(
             and_(Transaction.date >= start_date, Transaction.date <= end_date)
-        ).order_by(desc(Transaction.date)).all()
+        ).order_by(desc(Transaction.date)).execution_options(
+            stream_results=True
+        ).yield_per(_STREAM_BATCH_SIZE)
     
     def _apply_transaction_filters(self, query, filters: TransactionFilters):
         """Apply transaction filters to query."""
@@ -287,9 +398,7 @@ class TransactionService:
             query = query.filter(Transaction.account.in_(filters.accounts))
         
         if filters.tags:
-            # Filter by tags (assuming tags is a JSON array)
-            for tag in filters.tags:
-                query = query.filter(Transaction.tags.contains([tag]))
+            query = query.filter(self._has_all_tags(filters.tags))
         
         if filters.is_recurring is not None:
             query = query.filter(Transaction.is_recurring == filters.is_recurring)
@@ -304,6 +413,21 @@ class TransactionService:
         
         return query
     
+    def _has_all_tags(self, tags: List[str]):
+        """Build one clause matching transactions tagged with every tag.
+        
+        PostgreSQL uses JSONB containment, backed by idx_transactions_tags;
+        elsewhere the matching tags are counted from json_each.
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            return Transaction.tags.op("@>")(cast(list(tags), JSONB))
+        
+        tag_values = func.json_each(Transaction.tags).table_valued("value")
+        matched = select(func.count(distinct(tag_values.c.value))).where(
+            tag_values.c.value.in_(tags)
+        ).scalar_subquery()
+        return matched == len(set(tags))
+    
     def get_transaction_statistics_by_period(
         self,
         start_date: date,
@@ -311,25 +435,22 @@ class TransactionService:
         group_by: str = "month"
     ) -> List[Dict[str, Any]]:
         """Get transaction statistics grouped by period."""
-        if group_by == "month":
-            date_format = func.strftime("%Y-%m", Transaction.date)
-        elif group_by == "week":
-            date_format = func.strftime("%Y-W%W", Transaction.date)
-        elif group_by == "day":
-            date_format = func.date(Transaction.date)
-        else:
+        dialect = self.db.get_bind().dialect.name
+        period_expressions = _PERIOD_EXPRESSIONS.get(dialect, _PERIOD_EXPRESSIONS["sqlite"])
+        if group_by not in period_expressions:
             raise ValueError("group_by must be 'day', 'week', or 'month'")
+        period = period_expressions[group_by]
         
         query = self.db.query(
-            date_format.label("period"),
+            period.label("period"),
             func.count(Transaction.id).label("count"),
             func.sum(Transaction.amount).label("total_amount"),
             func.avg(Transaction.amount).label("avg_amount")
         ).filter(
-            and_(Transaction.date >= start_date, Transaction.date <= end_date)
-        ).group_by(date_format).order_by(date_format)
+            Transaction.date.between(start_date, end_date)
+        ).group_by(period).order_by(period)
         
-        return [dict(row) for row in query.all()]
+        return [dict(row._mapping) for row in query.all()]
     
     def detect_duplicate_transactions(
         self,
@@ -338,15 +459,23 @@ class TransactionService:
         description: str,
         tolerance_days: int = 1
     ) -> List[Transaction]:
-        """Detect potential duplicate transactions."""
-        start_date = date - datetime.timedelta(days=tolerance_days)
-        end_date = date + datetime.timedelta(days=tolerance_days)
+        """Detect potential duplicate transactions.
+        
+        Candidates are narrowed by the (date, amount) index; descriptions are
+        then compared by trigram similarity on PostgreSQL and by substring
+        match elsewhere.
+        """
+        start_date = date - timedelta(days=tolerance_days)
+        end_date = date + timedelta(days=tolerance_days)
+        description = description.strip().lower()
+        
+        if self.db.get_bind().dialect.name == "postgresql":
+            description_match = Transaction.description.op('%')(description)
+        else:
+            description_match = Transaction.description.ilike(f"%{description}%")
         
         return self.db.query(Transaction).filter(
-            and_(
-                Transaction.date >= start_date,
-                Transaction.date <= end_date,
-                Transaction.amount == amount,
-                Transaction.description.ilike(f"%{description}%")
-            )
+            Transaction.date.between(start_date, end_date),
+            Transaction.amount == amount,
+            description_match
         ).all()
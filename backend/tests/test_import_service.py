@@ -0,0 +1,269 @@
+"""
+Test file import service parsing and validation
+"""
+
+import io
+import pytest
+from unittest.mock import Mock, patch
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.transaction import Transaction
+from app.services.categorization_service import CategorizationService
+from app.services.import_service import ImportService, ImportSessionStore
+
+
+SAMPLE_OFX = """<OFX>
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240115120000
+<TRNAMT>-50.25
+<MEMO>PADARIA CENTRAL
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240116</DTPOSTED>
+<TRNAMT>100.00</TRNAMT>
+<MEMO>PIX RECEBIDO</MEMO>
+</STMTTRN>
+</BANKTRANLIST>
+</OFX>
+"""
+
+
+class TestOFXParsing:
+    """Test OFX content parsing"""
+
+    def test_parse_ofx_content(self):
+        """Test parsing SGML and XML style transaction blocks"""
+        import_service = ImportService()
+
+        transactions = import_service._parse_ofx_content(SAMPLE_OFX)
+
+        assert len(transactions) == 2
+        assert transactions[0].date == date(2024, 1, 15)
+        assert transactions[0].amount_cents == -5025
+        assert transactions[0].description == "PADARIA CENTRAL"
+        assert transactions[0].transaction_type == "EXPENSE"
+        assert transactions[1].amount_cents == 10000
+        assert transactions[1].description == "PIX RECEBIDO"
+        assert transactions[1].transaction_type == "INCOME"
+
+    def test_parse_amount_cents(self):
+        """Test amount strings are parsed into integer cents"""
+        assert ImportService._parse_amount_cents("150.50") == 15050
+        assert ImportService._parse_amount_cents("-150.5") == -15050
+        assert ImportService._parse_amount_cents("10.555") == 1056
+
+        with pytest.raises(ValueError):
+            ImportService._parse_amount_cents("1e5")
+
+    def test_parse_ofx_skips_incomplete_blocks(self):
+        """Test blocks without amount or date are skipped"""
+        import_service = ImportService()
+
+        content = "<OFX><STMTTRN><MEMO>NO AMOUNT</STMTTRN></OFX>"
+
+        assert import_service._parse_ofx_content(content) == []
+
+
+SAMPLE_CSV = (
+    "date,amount,description,reference\n"
+    "2024-01-15,-150.50,RESTAURANTE ABC,REF1\n"
+    "15/01/2024,\"R$ 2,500.00\",SALARIO,\n"
+    "invalid,10.00,BROKEN ROW,\n"
+).encode("utf-8")
+
+
+class TestCSVImport:
+    """Test CSV import processing"""
+
+    def test_process_csv_file(self):
+        """Test CSV rows are parsed and invalid rows reported"""
+        import_service = ImportService()
+
+        preview = import_service.process_csv_file(SAMPLE_CSV, auto_categorize=False)
+
+        assert preview.status == "preview"
+        assert preview.total_transactions == 2
+        assert len(preview.errors) == 1
+        assert preview.preview_data[0]["amount"] == Decimal("-150.50")
+        assert preview.preview_data[0]["reference_number"] == "REF1"
+        assert preview.preview_data[1]["date"] == date(2024, 1, 15)
+        assert preview.preview_data[1]["amount"] == Decimal("2500.00")
+
+    def test_process_csv_stream(self):
+        """Test CSV file objects are parsed as a stream and left open"""
+        import_service = ImportService()
+        stream = io.BytesIO(SAMPLE_CSV)
+
+        preview = import_service.process_csv_file(stream, auto_categorize=False)
+
+        assert preview.total_transactions == 2
+        assert len(preview.errors) == 1
+        assert preview.preview_data[1]["amount"] == Decimal("2500.00")
+        assert not stream.closed
+
+    def test_ambiguous_dates_do_not_depend_on_earlier_rows(self):
+        """Test day/month dates parse the same way wherever they appear in a file"""
+        import_service = ImportService()
+        content = (
+            b"date,amount,description,transaction_type\n"
+            b"02/03/2024,-10.00,PADARIA,DESPESA\n"
+            b"12/31/2024,-20.00,MERCADO,DESPESA\n"
+            b"02/03/2024,-30.00,FARMACIA,DESPESA\n"
+        )
+
+        preview = import_service.process_csv_file(content, auto_categorize=False)
+
+        assert [t["date"] for t in preview.preview_data] == [
+            date(2024, 3, 2), date(2024, 12, 31), date(2024, 3, 2)
+        ]
+
+    def test_confirm_import(self):
+        """Test confirmed rows are bulk inserted and the session completed"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        import_service = ImportService()
+
+        preview = import_service.process_csv_file(SAMPLE_CSV, auto_categorize=False)
+        result = import_service.confirm_import(preview.import_id, db)
+
+        assert result.status == "completed"
+        assert result.imported_count == 2
+        assert result.errors == []
+        amounts = sorted(amount for (amount,) in db.query(Transaction.amount))
+        assert amounts == [Decimal("-150.50"), Decimal("2500.00")]
+        assert import_service.confirm_import(preview.import_id, db) is None
+        db.close()
+
+    def test_auto_categorize_loads_rules_once(self):
+        """Test rules are queried once for all rows of an import"""
+        db = Mock()
+        db.query.return_value.filter.return_value.order_by.return_value.all.return_value = []
+        categorization_service = CategorizationService(db)
+        import_service = ImportService()
+
+        import_service.process_csv_file(SAMPLE_CSV, db=db, categorization_service=categorization_service)
+        assert db.query.call_count == 1
+
+        categorization_service.invalidate_rule_cache()
+        categorization_service.suggest_category("PADARIA", -10.0)
+        assert db.query.call_count == 2
+
+    def test_suggest_category_id_skips_category_lookup(self):
+        """Test category IDs come straight from the matching rule"""
+        db = Mock()
+        rule = Mock(category_id="category_1")
+        rule.matches_transaction.return_value = True
+        rule.get_match_score.return_value = 0.9
+        db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [rule]
+        categorization_service = CategorizationService(db)
+
+        assert categorization_service.suggest_category_ids_bulk(
+            [("PADARIA", 10.0, None), ("PADARIA", 10.0, None)]
+        ) == ["category_1", "category_1"]
+        assert db.query.call_count == 1
+        rule.matches_transaction.assert_called_once()
+
+    def test_suggestions_are_cached_until_rules_change(self):
+        """Test repeated suggestions skip rule matching until the rule cache is dropped"""
+        db = Mock()
+        rule = Mock(category_id="category_1")
+        rule.matches_transaction.return_value = True
+        rule.get_match_score.return_value = 0.9
+        db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [rule]
+        categorization_service = CategorizationService(db)
+
+        assert categorization_service.suggest_category_id("UBER EATS", -35.0) == "category_1"
+        assert categorization_service.suggest_category_id("UBER EATS", -35.0) == "category_1"
+        rule.matches_transaction.assert_called_once()
+
+        categorization_service.invalidate_rule_cache()
+        categorization_service.suggest_category_id("UBER EATS", -35.0)
+        assert rule.matches_transaction.call_count == 2
+
+
+class TestImportEndpoints:
+    """Test import endpoints pass their dependencies through"""
+
+    @pytest.mark.asyncio
+    async def test_csv_import_uses_request_categorization_service(self):
+        """Test the CSV endpoint hands its categorization service to the import"""
+        from fastapi import UploadFile
+        from app.api.v1.endpoints import import_export
+
+        db = Mock()
+        categorization_service = Mock()
+        upload = UploadFile(file=io.BytesIO(SAMPLE_CSV), filename="extrato.csv")
+
+        with patch.object(import_export.import_service, "process_csv_file") as process_csv_file:
+            await import_export.import_csv_file(
+                file=upload, auto_categorize=True, skip_duplicates=True,
+                db=db, categorization_service=categorization_service
+            )
+
+        assert process_csv_file.call_args.kwargs["categorization_service"] is categorization_service
+        assert process_csv_file.call_args.kwargs["db"] is db
+
+
+class TestImportSessionStore:
+    """Test import session expiry"""
+
+    def test_sessions_expire(self):
+        """Test sessions are dropped once their TTL elapses"""
+        store = ImportSessionStore(ttl_seconds=60)
+
+        with patch("app.services.import_service.time.monotonic", return_value=0.0):
+            store.set("import_1", {"status": "preview"})
+            assert store.get("import_1") == {"status": "preview"}
+
+        with patch("app.services.import_service.time.monotonic", return_value=61.0):
+            assert store.get("import_1") is None
+            assert len(store) == 0
+
+    def test_delete_session(self):
+        """Test deleting a session"""
+        store = ImportSessionStore(ttl_seconds=60)
+        store.set("import_1", {"status": "preview"})
+
+        assert store.delete("import_1") is True
+        assert store.delete("import_1") is False
+
+
+class TestImportValidation:
+    """Test import file validation"""
+
+    def test_validate_ofx_file(self):
+        """Test OFX markers are checked on the raw bytes"""
+        import_service = ImportService()
+
+        result = import_service.validate_import_file(SAMPLE_OFX.encode("utf-8"), "extrato.ofx", db=None)
+        assert result.is_valid is True
+        assert result.warnings == []
+
+        result = import_service.validate_import_file(b"<HTML></HTML>", "extrato.ofx", db=None)
+        assert result.is_valid is False
+        assert result.warnings == ["No transaction data found in OFX file"]
+
+    def test_validate_csv_file(self):
+        """Test CSV headers and sample rows are checked"""
+        import_service = ImportService()
+
+        result = import_service.validate_import_file(SAMPLE_CSV, "extrato.csv", db=None)
+        assert result.is_valid is True
+        assert result.warnings == [
+            "Row 2: Invalid date format",
+            "Row 2: Invalid amount format",
+            "Row 3: Invalid date format",
+        ]
+
+        result = import_service.validate_import_file(b"date,value\r\n", "extrato.csv", db=None)
+        assert result.errors == [
+            "Missing required fields: amount, description",
+            "No data rows found in CSV file",
+        ]
@@ -2,6 +2,8 @@
 Test Open Finance Brasil Integration
 """
 
+import asyncio
+import httpx
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
 import os
@@ -12,6 +14,7 @@ from app.core.open_finance_brasil import (
     OFBCertificateManager,
     OFBOAuthClient,
     OFBConsentManager,
+    OFBAPIClient,
     OpenFinanceBrasilIntegration
 )
 
@@ -119,6 +122,94 @@ class TestOFBConsentManager:
         assert consent_manager.consents == {}
 
 
+class TestOFBAPIClient:
+    """Test the pooled OFB API client"""
+    
+    @pytest.mark.asyncio
+    async def test_requests_share_one_pooled_client(self):
+        """Test one client serves every request and tokens are sent per request"""
+        config = OFBConfig(
+            client_id="test_client",
+            client_secret="test_secret",
+            redirect_uri="http://localhost:3000/callback",
+            api_base_url="https://api.test",
+            transport_cert_path="certs/transport.pem",
+            transport_key_path="certs/transport.key",
+            signing_cert_path="certs/signing.pem",
+            signing_key_path="certs/signing.key",
+            ca_bundle_path="certs/ca-bundle.pem"
+        )
+        seen = []
+        
+        def handler(request):
+            seen.append((request.method, str(request.url), request.headers["Authorization"]))
+            return httpx.Response(200, json={"data": []})
+        
+        real_client = httpx.AsyncClient
+        
+        def client_factory(cert, verify, **kwargs):
+            return real_client(transport=httpx.MockTransport(handler), **kwargs)
+        
+        api_client = OFBAPIClient(config)
+        with patch("app.core.open_finance_brasil.httpx.AsyncClient", side_effect=client_factory) as client_cls:
+            assert await api_client.get("/accounts/v2/accounts", "token_1") == {"data": []}
+            assert await api_client.get("/accounts/v2/accounts/acc_1/balances", "token_2") == {"data": []}
+            
+            assert client_cls.call_count == 1
+            assert seen == [
+                ("GET", "https://api.test/accounts/v2/accounts", "Bearer token_1"),
+                ("GET", "https://api.test/accounts/v2/accounts/acc_1/balances", "Bearer token_2"),
+            ]
+            
+            await api_client.aclose()
+            await api_client.get("/accounts/v2/accounts", "token_1")
+            assert client_cls.call_count == 2
+        
+        await api_client.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_requests_share_one_outbound_limiter(self):
+        """Test concurrent requests from any client never exceed the process-wide cap"""
+        in_flight = []
+        peak = []
+        
+        async def handler(request):
+            in_flight.append(request)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0)
+            in_flight.remove(request)
+            return httpx.Response(200, json={"data": []})
+        
+        real_client = httpx.AsyncClient
+        
+        def client_factory(cert, verify, **kwargs):
+            return real_client(transport=httpx.MockTransport(handler), **kwargs)
+        
+        config = OFBConfig(
+            client_id="test_client",
+            client_secret="test_secret",
+            redirect_uri="http://localhost:3000/callback",
+            api_base_url="https://api.test",
+            transport_cert_path="certs/transport.pem",
+            transport_key_path="certs/transport.key",
+            signing_cert_path="certs/signing.pem",
+            signing_key_path="certs/signing.key",
+            ca_bundle_path="certs/ca-bundle.pem"
+        )
+        api_clients = [OFBAPIClient(config) for _ in range(2)]
+        with patch("app.core.open_finance_brasil.httpx.AsyncClient", side_effect=client_factory), \
+                patch("app.core.open_finance_brasil._outbound_limiter", asyncio.Semaphore(2)):
+            await asyncio.gather(*(
+                api_client.get(f"/accounts/v2/accounts/acc_{page}/transactions", "token_1")
+                for page in range(3)
+                for api_client in api_clients
+            ))
+        
+        assert max(peak) == 2
+        assert len(peak) == 6
+        for api_client in api_clients:
+            await api_client.aclose()
+
 class TestOpenFinanceBrasilIntegration:
     """Test main integration class"""
     
@@ -132,6 +223,38 @@ class TestOpenFinanceBrasilIntegration:
         assert integration.oauth_client is not None
         assert integration.consent_manager is not None
         assert integration.api_client is not None
+    
+    @pytest.mark.asyncio
+    async def test_validate_access_caches_granted_checks(self):
+        """Test granted access is cached per consent until invalidated"""
+        integration = OpenFinanceBrasilIntegration(Mock())
+        integration.consent_manager.validate_consent = AsyncMock(side_effect=[True, False, False])
+        
+        assert await integration.validate_access("consent_1", ["accounts", "balances"]) is True
+        assert await integration.validate_access("consent_1", ["balances", "accounts"]) is True
+        assert integration.consent_manager.validate_consent.await_count == 1
+        
+        integration.invalidate_access("consent_1")
+        
+        assert await integration.validate_access("consent_1", ["accounts", "balances"]) is False
+        assert await integration.validate_access("consent_1", ["accounts", "balances"]) is False
+        assert integration.consent_manager.validate_consent.await_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_access_only_drops_that_consent(self):
+        """Test invalidation leaves other consents cached and keeps no per-consent index"""
+        integration = OpenFinanceBrasilIntegration(Mock())
+        integration.consent_manager.validate_consent = AsyncMock(return_value=True)
+        
+        await integration.validate_access("consent_1", ["accounts"])
+        await integration.validate_access("consent_1", ["transactions"])
+        await integration.validate_access("consent_2", ["accounts"])
+        
+        integration.invalidate_access("consent_1")
+        
+        assert len(integration._access_cache) == 1
+        assert await integration.validate_access("consent_2", ["accounts"]) is True
+        assert integration.consent_manager.validate_consent.await_count == 3
 
 
 # Integration tests
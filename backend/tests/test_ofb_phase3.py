@@ -2,11 +2,22 @@
 Test Open Finance Brasil Phase 3: Account Information Integration
 """
 
+import asyncio
+import time
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
-from datetime import date, datetime
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
+from app.database import Base, _ensure_unique_external_id, external_id_is_unique
+from app.models.transaction import Transaction
 from app.services.ofb_account_service import OFBAccountService
+from app.services import ofb_account_service, ofb_sync_service
 from app.services.ofb_sync_service import OFBSyncService
 
 
@@ -56,7 +67,64 @@ class TestOFBAccountService:
         assert balance["availableAmount"] == "1250.75"
         assert balance["availableAmountCurrency"] == "BRL"
         assert balance["blockedAmount"] == "0.00"
-    
+
+    @pytest.mark.asyncio
+    async def test_accounts_and_balances_are_cached(self):
+        """Test repeat lookups skip the OFB call unless refresh is requested"""
+        db = Mock()
+        account_service = OFBAccountService(db)
+        account_service.ofb_integration = Mock()
+        account_service.ofb_integration.validate_access = AsyncMock(return_value=True)
+        validate_access = account_service.ofb_integration.validate_access
+
+        accounts = await account_service.discover_accounts("consent_cache", "token_456", refresh=True)
+        accounts[0]["status"] = "CHANGED"
+        assert (await account_service.discover_accounts("consent_cache", "token_456"))[0]["status"] == "ACTIVE"
+
+        balance = await account_service.get_account_balances("account_001", "consent_cache", "token_456", refresh=True)
+        cached_balance = await account_service.get_account_balances("account_001", "consent_cache", "token_456")
+        assert cached_balance == balance and cached_balance is not balance
+
+        # Cache hits are still authorized
+        assert validate_access.await_count == 4
+        validate_access.return_value = False
+        with pytest.raises(HTTPException) as exc_info:
+            await account_service.discover_accounts("consent_cache", "token_456")
+        assert exc_info.value.status_code == 403
+        with pytest.raises(HTTPException):
+            await account_service.get_account_balances("account_001", "consent_cache", "token_456")
+
+    def test_revoking_a_consent_drops_its_cached_data(self):
+        """Test a revoked consent's accounts and balances are evicted, others kept"""
+        ofb_account_service._accounts_cache.set("consent_revoked", [{"accountId": "account_001"}])
+        ofb_account_service._balance_cache.set(("account_001", "consent_revoked"), {"availableAmount": "1.00"})
+        ofb_account_service._balance_cache.set(("account_001", "consent_other"), {"availableAmount": "2.00"})
+
+        ofb_account_service.invalidate_consent_cache("consent_revoked")
+
+        assert ofb_account_service._accounts_cache.get("consent_revoked") is None
+        assert ofb_account_service._balance_cache.get(("account_001", "consent_revoked")) is None
+        assert ofb_account_service._balance_cache.get(("account_001", "consent_other")) is not None
+
+    @pytest.mark.asyncio
+    async def test_service_errors_are_mapped(self):
+        """Test permission errors pass through and unexpected errors become 500s"""
+        db = Mock()
+        account_service = OFBAccountService(db)
+        account_service.ofb_integration = Mock()
+        account_service.ofb_integration.validate_access = AsyncMock(return_value=False)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await account_service.discover_accounts("consent_denied", "token_456", refresh=True)
+        assert exc_info.value.status_code == 403
+
+        account_service.ofb_integration.validate_access = AsyncMock(side_effect=RuntimeError("boom"))
+        with pytest.raises(HTTPException) as exc_info:
+            await account_service.import_transactions("account_001", "consent_123", "token_456")
+        assert exc_info.value.status_code == 500
+        assert exc_info.value.detail == "Transaction retrieval failed: boom"
+        db.rollback.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_get_account_transactions(self):
         """Test transaction retrieval"""
@@ -85,23 +153,52 @@ class TestOFBAccountService:
         assert transactions[0]["transactionName"] == "RESTAURANTE ABC"
         assert transactions[1]["creditDebitType"] == "CREDITO"
     
+    @pytest.mark.asyncio
+    async def test_get_account_transactions_pushes_filters_to_ofb(self):
+        """Test date range and pagination are sent to OFB outside mock mode"""
+        db = Mock()
+        account_service = OFBAccountService(db)
+        account_service.ofb_integration = Mock()
+        account_service.ofb_integration.validate_access = AsyncMock(return_value=True)
+        account_service.ofb_integration.get_account_transactions = AsyncMock(return_value={
+            "data": [{"transactionId": "txn_026"}],
+            "meta": {"totalRecords": 26, "totalPages": 2}
+        })
+        
+        with patch("app.services.ofb_account_service.ofb_settings.ofb_mock_mode", False):
+            transactions_data = await account_service.get_account_transactions(
+                "account_001", "consent_123", "token_456",
+                from_date=date(2024, 1, 10), to_date=date(2024, 1, 20), page=2
+            )
+        
+        account_service.ofb_integration.get_account_transactions.assert_awaited_once_with(
+            "account_001", "token_456",
+            params={"fromBookingDate": "2024-01-10", "toBookingDate": "2024-01-20", "page": 2, "page-size": 25}
+        )
+        assert transactions_data["transactions"] == [{"transactionId": "txn_026"}]
+        assert transactions_data["pagination"] == {"total": 26, "page": 2, "size": 25, "pages": 2}
+    
     @pytest.mark.asyncio
     async def test_import_transactions(self):
         """Test transaction import"""
         db = Mock()
         account_service = OFBAccountService(db)
         
-        # Mock database query
-        db.query.return_value.filter.return_value.first.return_value = None
-        db.add = Mock()
+        # Mock database query for already imported transaction IDs
+        db.query.return_value.filter.return_value.all.return_value = [("txn_003",)]
+        db.execute = Mock(return_value=Mock(rowcount=2))
         db.commit = Mock()
+        account_service._insert_ignore_duplicates = Mock(wraps=account_service._insert_ignore_duplicates)
         
         # Mock OFB integration
         account_service.ofb_integration = Mock()
         account_service.ofb_integration.validate_access = AsyncMock(return_value=True)
         
         # Mock categorization service
-        account_service.categorization_service.suggest_category = AsyncMock(return_value=Mock(id="12345678-1234-1234-1234-123456789abc"))
+        category_id = UUID("12345678-1234-1234-1234-123456789abc")
+        account_service.categorization_service.suggest_category_ids_bulk = Mock(
+            side_effect=lambda inputs: [category_id] * len(inputs)
+        )
         
         # Test transaction import with specific date range
         from_date = date(2024, 1, 10)
@@ -113,8 +210,215 @@ class TestOFBAccountService:
         )
         
         assert import_result["status"] == "completed"
-        assert import_result["imported_count"] > 0
+        assert import_result["imported_count"] == 2
+        assert import_result["skipped_count"] == 1
         assert import_result["account_id"] == "account_001"
+        assert db.query.call_count == 1
+        db.execute.assert_called_once()
+        rows = account_service._insert_ignore_duplicates.call_args.args[0]
+        assert rows[0]["external_id"] == "txn_001"
+        assert rows[0]["category_id"] == category_id
+        assert rows[0]["date"] == date(2024, 1, 15)
+        account_service.categorization_service.suggest_category_ids_bulk.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_fetch_all_pages(self):
+        """Test remaining pages are fetched after the first, retrying rate limits"""
+        db = Mock()
+        account_service = OFBAccountService(db)
+        
+        calls = []
+        
+        async def get_page(page, **kwargs):
+            calls.append(page)
+            if page == 2 and calls.count(2) == 1:
+                raise HTTPException(status_code=429, detail="Too many requests")
+            return {"transactions": [{"transactionId": f"txn_{page}"}], "pagination": {"pages": 3}}
+        
+        account_service.get_account_transactions = get_page
+        
+        with patch("app.services.ofb_account_service.asyncio.sleep", new=AsyncMock()) as sleep:
+            transactions = await account_service._fetch_all_pages("account_001", "consent_123", "token_456")
+        
+        assert [txn["transactionId"] for txn in transactions] == ["txn_1", "txn_2", "txn_3"]
+        assert calls.count(2) == 2
+        sleep.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_sync_account_data_fetches_once(self):
+        """Test sync imports the transactions it fetched instead of fetching again"""
+        db = Mock()
+        db.query.return_value.filter.return_value.all.return_value = []
+        db.execute.return_value.rowcount = 1
+        account_service = OFBAccountService(db)
+        account_service.get_account_balances = AsyncMock(return_value={"availableAmount": "10.00"})
+        account_service.get_account_transactions = AsyncMock(return_value={
+            "transactions": [{
+                "transactionId": "txn_001",
+                "bookingDate": "2024-01-15",
+                "amount": "10.00",
+                "creditDebitType": "DEBITO",
+                "transactionName": "PADARIA",
+                "type": "PURCHASE"
+            }],
+            "pagination": {"pages": 1}
+        })
+        account_service.categorization_service.suggest_category_ids_bulk = Mock(return_value=[None])
+        
+        result = await account_service.sync_account_data("account_001", "consent_123", "token_456")
+        
+        assert result["recent_transactions"] == 1
+        assert result["import_result"]["imported_count"] == 1
+        account_service.get_account_transactions.assert_awaited_once()
+    
+    def test_insert_transactions_in_chunks(self):
+        """Test each chunk is committed and a failed chunk only rolls back itself"""
+        db = Mock()
+        db.execute = Mock(side_effect=[Mock(rowcount=2), Exception("constraint failed")])
+        account_service = OFBAccountService(db)
+        account_service._IMPORT_CHUNK_SIZE = 2
+        
+        imported_count, skipped_count, errors = account_service._insert_transactions(
+            [{"id": n} for n in range(3)]
+        )
+        
+        assert imported_count == 2
+        assert skipped_count == 0
+        assert errors == ["Failed to import 1 transactions: constraint failed"]
+        assert db.commit.call_count == 1
+        db.rollback.assert_called_once()
+    
+    def test_insert_transactions_skips_existing_external_ids(self):
+        """Test rows already stored by another import are skipped, not failed"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        account_service = OFBAccountService(db)
+        
+        def row(external_id):
+            return {
+                "date": date(2024, 1, 15),
+                "amount": Decimal("-10.00"),
+                "description": "PADARIA",
+                "transaction_type": "DESPESA",
+                "external_id": external_id
+            }
+        
+        assert account_service._insert_transactions([row("txn_001")]) == (1, 0, [])
+        assert account_service._insert_transactions([row("txn_001"), row("txn_002")]) == (1, 1, [])
+        assert db.query(Transaction).count() == 2
+        db.close()
+    
+    @staticmethod
+    def _legacy_engine(*external_ids):
+        """Create a database whose external_id index predates the unique one"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_transactions_external_id"))
+            conn.execute(text("CREATE INDEX ix_transactions_external_id ON transactions (external_id)"))
+            for n, external_id in enumerate(external_ids):
+                conn.execute(
+                    Transaction.__table__.insert().values(
+                        date=date(2024, 1, 15), amount=Decimal("-10.00"), description=f"row {n}",
+                        transaction_type="DESPESA", external_id=external_id
+                    )
+                )
+        return engine
+    
+    def test_init_upgrades_legacy_external_id_index(self):
+        """Test an older database gets the unique external_id index it lacks"""
+        engine = self._legacy_engine("txn_001", "txn_002")
+        assert not external_id_is_unique(engine)
+        
+        with engine.begin() as conn:
+            _ensure_unique_external_id(conn)
+        
+        assert external_id_is_unique(engine)
+    
+    def test_insert_transactions_without_unique_external_id(self):
+        """Test imports still work when duplicates keep the unique index from being added"""
+        engine = self._legacy_engine("txn_001", "txn_001")
+        with engine.begin() as conn:
+            _ensure_unique_external_id(conn)
+        assert not external_id_is_unique(engine)
+        
+        db = sessionmaker(bind=engine)()
+        account_service = OFBAccountService(db)
+        row = {
+            "date": date(2024, 1, 16),
+            "amount": Decimal("-5.00"),
+            "description": "PADARIA",
+            "transaction_type": "DESPESA",
+            "external_id": "txn_002"
+        }
+        
+        assert account_service._insert_transactions([row]) == (1, 0, [])
+        assert db.query(Transaction).count() == 3
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_import_only_duplicates_skips_commit(self):
+        """Test an import with nothing new does not touch the write path"""
+        db = Mock()
+        db.query.return_value.filter.return_value.all.return_value = [("txn_001",)]
+        account_service = OFBAccountService(db)
+        account_service.categorization_service.suggest_category_ids_bulk = Mock()
+
+        result = await account_service.import_transactions(
+            "account_001", "consent_123", "token_456",
+            transactions=[{"transactionId": "txn_001", "amount": "1.00", "creditDebitType": "DEBITO"}]
+        )
+
+        assert result["imported_count"] == 0
+        assert result["skipped_count"] == 1
+        db.execute.assert_not_called()
+        db.commit.assert_not_called()
+        account_service.categorization_service.suggest_category_ids_bulk.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_db_calls_take_turns(self):
+        """Test gathered callers never use the shared session from two threads at once"""
+        account_service = OFBAccountService(Mock())
+        in_flight = peak = 0
+        
+        def db_call():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            time.sleep(0.01)
+            in_flight -= 1
+        
+        await asyncio.gather(*(account_service._run_db(db_call) for _ in range(4)))
+        
+        assert peak == 1
+    
+    @pytest.mark.asyncio
+    async def test_sqlite_sessions_take_turns_across_services(self):
+        """Test services on separate SQLite sessions never use the shared connection at once"""
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        session_factory = sessionmaker(bind=engine)
+        account_services = [OFBAccountService(session_factory()) for _ in range(3)]
+        in_flight = peak = 0
+        
+        def db_call():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            time.sleep(0.01)
+            in_flight -= 1
+        
+        await asyncio.gather(*(
+            account_service._run_db(db_call)
+            for account_service in account_services
+            for _ in range(2)
+        ))
+        
+        assert peak == 1
+        for account_service in account_services:
+            account_service.db.close()
     
     def test_transaction_type_mapping(self):
         """Test transaction type mapping"""
@@ -146,6 +450,12 @@ class TestOFBAccountService:
 class TestOFBSyncService:
     """Test OFB Sync Service"""
     
+    @pytest.fixture(autouse=True)
+    def clear_sync_jobs(self):
+        """Clear sync jobs scheduled by earlier tests"""
+        ofb_sync_service._sync_jobs.clear()
+        ofb_sync_service._due_jobs.clear()
+    
     def test_sync_service_creation(self):
         """Test sync service creation"""
         db = Mock()
@@ -177,8 +487,9 @@ class TestOFBSyncService:
         sync_service = OFBSyncService(db)
         
         # Test daily frequency
-        next_sync = sync_service._calculate_next_sync("daily", "06:00")
-        assert next_sync is not None
+        next_sync_epoch, next_sync = sync_service._calculate_next_sync("daily", "06:00")
+        assert next_sync_epoch == datetime.fromisoformat(next_sync).replace(tzinfo=timezone.utc).timestamp()
+        assert 0 < next_sync_epoch - time.time() <= 86400
         
         # Test weekly frequency
         next_sync = sync_service._calculate_next_sync("weekly", "06:00")
@@ -188,6 +499,40 @@ class TestOFBSyncService:
         next_sync = sync_service._calculate_next_sync("monthly", "06:00")
         assert next_sync is not None
     
+    @pytest.mark.parametrize("now, frequency, expected", [
+        (datetime(2024, 1, 1, 9, 0), "weekly", datetime(2024, 1, 8, 6, 0)),
+        (datetime(2024, 1, 1, 5, 0), "weekly", datetime(2024, 1, 1, 6, 0)),
+        (datetime(2024, 2, 1, 9, 0), "monthly", datetime(2024, 3, 1, 6, 0)),
+        (datetime(2024, 12, 1, 9, 0), "monthly", datetime(2025, 1, 1, 6, 0)),
+    ])
+    def test_next_sync_is_always_in_the_future(self, now, frequency, expected):
+        """Test a sync time already passed today moves to the next week or month"""
+        sync_service = OFBSyncService(Mock())
+        
+        class FrozenDatetime(datetime):
+            @classmethod
+            def utcnow(cls):
+                return now
+        
+        with patch.object(ofb_sync_service, "datetime", FrozenDatetime):
+            _, next_sync = sync_service._calculate_next_sync(frequency, "06:00")
+        
+        assert datetime.fromisoformat(next_sync) == expected
+    
+    @pytest.mark.asyncio
+    async def test_job_is_not_requeued_at_or_before_its_last_run(self):
+        """Test a next run that is not after the one that just ran is never queued"""
+        sync_service = OFBSyncService(Mock())
+        sync_service.account_service.sync_account_data = AsyncMock(return_value={"status": "success"})
+        with patch.object(sync_service, "_calculate_next_sync", return_value=(1577858400.0, "2020-01-01T06:00:00")):
+            await sync_service.schedule_account_sync("account_001", "consent_123", "token_456")
+            
+            assert (await sync_service.execute_scheduled_sync())["executed_jobs"] == 1
+            assert (await sync_service.execute_scheduled_sync())["executed_jobs"] == 0
+        
+        assert ofb_sync_service._due_jobs == []
+        sync_service.account_service.sync_account_data.assert_awaited_once()
+    
     @pytest.mark.asyncio
     async def test_get_sync_status(self):
         """Test sync status retrieval"""
@@ -202,12 +547,13 @@ class TestOFBSyncService:
         # Test getting status for specific account
         status = await sync_service.get_sync_status("account_001")
         assert status["account_id"] == "account_001"
-        assert "sync_status" in status
+        assert status["sync_status"]["enabled"] is True
         
         # Test getting status for all accounts
         all_status = await sync_service.get_sync_status()
         assert all_status["total_jobs"] == 1
         assert all_status["enabled_jobs"] == 1
+        assert all_status["sync_jobs"]["account_001"]["sync_frequency"] == "daily"
     
     @pytest.mark.asyncio
     async def test_update_sync_config(self):
@@ -245,6 +591,170 @@ class TestOFBSyncService:
         assert result["status"] == "removed"
         assert result["account_id"] == "account_001"
         assert "account_001" not in sync_service.sync_jobs
+    
+    @pytest.mark.asyncio
+    async def test_sync_all_accounts_runs_concurrently(self):
+        """Test accounts sync concurrently up to the limit and failures are reported"""
+        sync_service = OFBSyncService(Mock())
+        sync_service.account_service.discover_accounts = AsyncMock(side_effect=lambda consent_id, token: [
+            {"accountId": f"{consent_id}_{n}", "brandName": "Banco"} for n in range(3)
+        ])
+        in_flight = peak = 0
+        
+        async def sync_account_data(account_id, consent_id, access_token):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            if account_id == "consent_2_1":
+                raise RuntimeError("timeout")
+            return {"status": "success"}
+        
+        sync_service.account_service.sync_account_data = sync_account_data
+        consents = [
+            {"consent_id": "consent_1", "access_token": "token_1"},
+            {"consent_id": "consent_2", "access_token": "token_2"}
+        ]
+        
+        with patch("app.services.ofb_sync_service.ofb_settings.ofb_max_concurrent_syncs", 4):
+            result = await sync_service.sync_all_accounts(consents)
+        
+        assert [r["account_id"] for r in result["results"]] == [
+            "consent_1_0", "consent_1_1", "consent_1_2", "consent_2_0", "consent_2_1", "consent_2_2"
+        ]
+        assert result["successful_syncs"] == 5
+        assert result["failed_syncs"] == 1
+        assert result["results"][4] == {
+            "account_id": "consent_2_1", "bank_name": "Banco", "status": "failed", "error": "timeout"
+        }
+        assert peak == 4
+    
+    @pytest.mark.asyncio
+    async def test_execute_scheduled_sync_runs_only_due_jobs(self):
+        """Test due jobs run once and disabled or removed jobs are skipped"""
+        sync_service = OFBSyncService(Mock())
+        with patch.object(sync_service, "_calculate_next_sync", return_value=(1577858400.0, "2020-01-01T06:00:00")):
+            await sync_service.schedule_account_syncs(
+                ["account_001", "account_002", "account_003"], "consent_123", "token_456"
+            )
+        await sync_service.update_sync_config("account_002", enabled=False)
+        await sync_service.remove_sync_job("account_003")
+        
+        # Jobs are shared by every service instance in the process
+        other_service = OFBSyncService(Mock())
+        assert list(other_service.sync_jobs) == ["account_001", "account_002"]
+        other_service.account_service.sync_account_data = AsyncMock(return_value={"status": "success"})
+        
+        result = await other_service.execute_scheduled_sync()
+        
+        assert [r["account_id"] for r in result["results"]] == ["account_001"]
+        assert other_service.sync_jobs["account_001"].status == "completed"
+        assert (await other_service.execute_scheduled_sync())["executed_jobs"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_execute_scheduled_sync_runs_due_jobs_concurrently(self):
+        """Test due jobs run concurrently and a failure only marks its own job"""
+        sync_service = OFBSyncService(Mock())
+        with patch.object(sync_service, "_calculate_next_sync", return_value=(1577858400.0, "2020-01-01T06:00:00")):
+            await sync_service.schedule_account_syncs(["account_001", "account_002"], "consent_123", "token_456")
+        started = asyncio.Event()
+        
+        async def sync_account_data(account_id, consent_id, access_token):
+            if account_id == "account_001":
+                await started.wait()
+                raise RuntimeError("timeout")
+            started.set()
+            return {"status": "success"}
+        
+        sync_service.account_service.sync_account_data = sync_account_data
+        
+        result = await asyncio.wait_for(sync_service.execute_scheduled_sync(), timeout=1)
+        
+        assert [r["status"] for r in result["results"]] == ["failed", "success"]
+        assert sync_service.sync_jobs["account_001"].status == "failed"
+        assert sync_service.sync_jobs["account_002"].status == "completed"
+        assert sync_service.sync_jobs["account_001"].next_sync_epoch > 1577858400.0
+    
+    @pytest.mark.asyncio
+    async def test_scheduler_runs_each_due_job_on_its_own_session(self):
+        """Test the scheduler loop gives every due job its own session and closes them all"""
+        sync_service = OFBSyncService(Mock())
+        with patch.object(sync_service, "_calculate_next_sync", return_value=(1577858400.0, "2020-01-01T06:00:00")):
+            await sync_service.schedule_account_syncs(["account_001", "account_002"], "consent_123", "token_456")
+        sessions = []
+        job_sessions = {}
+        
+        def session_factory():
+            sessions.append(Mock())
+            return sessions[-1]
+        
+        async def sync_account_data(account_service, account_id, consent_id, access_token):
+            job_sessions[account_id] = account_service.db
+            return {"status": "success"}
+        
+        with patch.object(OFBAccountService, "sync_account_data", autospec=True, side_effect=sync_account_data):
+            task = asyncio.create_task(ofb_sync_service.run_sync_scheduler(session_factory, poll_interval=60))
+            while len(sessions) < 3 or not all(session.close.called for session in sessions):
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        assert sync_service.sync_jobs["account_001"].status == "completed"
+        assert job_sessions["account_001"] is not job_sessions["account_002"]
+        assert set(map(id, job_sessions.values())) <= set(map(id, sessions))
+        assert all(session.close.call_count == 1 for session in sessions)
+    
+    @pytest.mark.asyncio
+    async def test_scheduler_wakes_for_sooner_jobs(self):
+        """Test a sleeping scheduler wakes when a job is queued to run before its next check"""
+        sync_service = OFBSyncService(Mock())
+        synced = asyncio.Event()
+        
+        async def sync_account_data(account_id, consent_id, access_token):
+            synced.set()
+            return {"status": "success"}
+        
+        with patch.object(OFBAccountService, "sync_account_data", side_effect=sync_account_data):
+            task = asyncio.create_task(ofb_sync_service.run_sync_scheduler(Mock, poll_interval=60))
+            await asyncio.sleep(0)
+            with patch.object(sync_service, "_calculate_next_sync", return_value=(1577858400.0, "2020-01-01T06:00:00")):
+                await sync_service.schedule_account_sync("account_001", "consent_123", "token_456")
+            await asyncio.wait_for(synced.wait(), timeout=1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+    
+    @pytest.mark.asyncio
+    async def test_rescheduling_keeps_due_heap_bounded(self):
+        """Test stale heap entries from rescheduling are compacted away"""
+        sync_service = OFBSyncService(Mock())
+        await sync_service.schedule_account_sync("account_001", "consent_123", "token_456")
+        
+        for n in range(200):
+            await sync_service.update_sync_config("account_001", sync_time=f"{n % 24:02d}:00")
+        
+        assert len(ofb_sync_service._due_jobs) <= 2 * len(sync_service.sync_jobs) + 65
+        assert (sync_service.sync_jobs["account_001"].next_sync_epoch, "account_001") in ofb_sync_service._due_jobs
+    
+    @pytest.mark.asyncio
+    async def test_schedule_and_remove_sync_jobs_in_batch(self):
+        """Test batch scheduling shares one schedule and removal skips unknown accounts"""
+        db = Mock()
+        sync_service = OFBSyncService(db)
+        
+        results = await sync_service.schedule_account_syncs(
+            ["account_001", "account_002"], "consent_123", "token_456", "daily"
+        )
+        
+        assert [r["account_id"] for r in results] == ["account_001", "account_002"]
+        assert sync_service.sync_jobs["account_001"].next_sync == sync_service.sync_jobs["account_002"].next_sync
+        
+        result = await sync_service.remove_sync_jobs(["account_001", "account_003"])
+        
+        assert result["removed_account_ids"] == ["account_001"]
+        assert list(sync_service.sync_jobs) == ["account_002"]
 
 
 # Integration tests
@@ -279,3 +789,22 @@ async def test_ofb_phase3_integration():
     assert status is not None
     
     print("✅ Phase 3 integration test completed successfully")
+
+
+@pytest.mark.asyncio
+async def test_cached_clock():
+    """Test the cached timestamp runs while the clock task is alive"""
+    import asyncio
+    from app.core import clock
+
+    assert clock._now_iso is None
+    assert clock.utcnow_iso()  # Falls back to the live clock
+
+    task = asyncio.create_task(clock.run_clock(interval=60))
+    await asyncio.sleep(0)
+    assert clock.utcnow_iso() == clock._now_iso
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert clock._now_iso is None
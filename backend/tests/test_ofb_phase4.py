@@ -2,14 +2,29 @@
 Phase 4: Full Integration Tests
 Tests for payment services, multi-bank aggregation, and advanced analytics.
 """
+import asyncio
+import json
+import time
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import ofb_payments
+from app.database import get_db
 from app.services.ofb_payment_service import OFBPaymentService
+from app.services import ofb_multi_bank_service
 from app.services.ofb_multi_bank_service import OFBMultiBankService
-from app.services.ofb_advanced_analytics_service import OFBAdvancedAnalyticsService
+from app.services import ofb_advanced_analytics_service
+from app.services.ofb_advanced_analytics_service import (
+    AnalyticsContext,
+    AnalyticsTransaction,
+    OFBAdvancedAnalyticsService,
+)
+from app.core.ids import short_id
 from app.core.open_finance_brasil import OpenFinanceBrasilIntegration
 
 
@@ -50,6 +65,57 @@ class TestOFBPaymentService:
         assert result["message"] == "PIX payment initiated successfully"
         assert "pix_" in result["payment_id"]
     
+    @pytest.mark.asyncio
+    async def test_stream_payment_history_matches_history(self):
+        """Test the streamed history is the same document as the paged one."""
+        ofb_integration = Mock()
+        ofb_integration.validate_access = AsyncMock(return_value=True)
+        payment_service = OFBPaymentService(Mock(), ofb_integration)
+        
+        with patch("app.services.ofb_payment_service.short_id", side_effect=lambda prefix: f"{prefix}_1"), \
+                patch("app.services.ofb_payment_service.datetime") as mock_datetime:
+            mock_datetime.utcnow.return_value = datetime(2024, 1, 10)
+            expected = await payment_service.get_payment_history(
+                consent_id="consent_123", access_token="token_456", page=2, page_size=1
+            )
+            chunks = await payment_service.stream_payment_history(
+                consent_id="consent_123", access_token="token_456", page=2, page_size=1
+            )
+            streamed = b"".join([chunk async for chunk in chunks])
+        
+        assert json.loads(streamed) == expected
+        
+        ofb_integration.validate_access = AsyncMock(return_value=False)
+        with pytest.raises(ValueError):
+            await payment_service.stream_payment_history(consent_id="consent_123", access_token="bad")
+    
+    def test_stream_payment_history_endpoint(self):
+        """Test the streaming endpoint serves history through the shared integration."""
+        app = FastAPI()
+        app.include_router(ofb_payments.router, prefix="/payments")
+        app.dependency_overrides[get_db] = lambda: Mock()
+        ofb_integration = Mock()
+        ofb_integration.validate_access = AsyncMock(return_value=True)
+        
+        with patch("app.api.v1.endpoints.ofb_payments.get_shared_integration",
+                   AsyncMock(return_value=ofb_integration)):
+            response = TestClient(app).get(
+                "/payments/history/stream",
+                params={"consent_id": "consent_123", "access_token": "token_456", "page_size": 2}
+            )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert len(response.json()["payments"]) == 2
+        ofb_integration.validate_access.assert_awaited_once_with("consent_123", "token_456")
+    
+    def test_short_ids_are_unique_across_batches(self):
+        """Test short IDs keep their prefix and do not repeat across refills."""
+        ids = [short_id("pix") for _ in range(1500)]
+        
+        assert len(set(ids)) == len(ids)
+        assert all(len(payment_id) == len("pix_") + 16 and payment_id.startswith("pix_") for payment_id in ids)
+    
     @pytest.mark.asyncio
     async def test_initiate_ted_transfer(self):
         """Test TED transfer initiation."""
@@ -159,6 +225,50 @@ class TestOFBPaymentService:
         assert "filters" in result
         assert len(result["payments"]) > 0
     
+    @pytest.mark.asyncio
+    async def test_get_payment_history_filters_and_pages(self):
+        """Test date and type filters apply before pagination."""
+        ofb_integration = Mock()
+        ofb_integration.validate_access = AsyncMock(return_value=True)
+        payment_service = OFBPaymentService(Mock(), ofb_integration)
+        
+        result = await payment_service.get_payment_history(
+            consent_id="consent_123",
+            access_token="token_456",
+            from_date=datetime.utcnow() - timedelta(days=2)
+        )
+        assert [p["type"] for p in result["payments"]] == ["PIX"]
+        
+        result = await payment_service.get_payment_history(
+            consent_id="consent_123",
+            access_token="token_456",
+            page=2,
+            page_size=1
+        )
+        assert [p["type"] for p in result["payments"]] == ["TED"]
+        assert result["pagination"]["total_count"] == 2
+        assert result["pagination"]["total_pages"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_payment_history_accepts_aware_date_bounds(self):
+        """Test timezone-aware bounds such as a Z timestamp compare as UTC."""
+        ofb_integration = Mock()
+        ofb_integration.validate_access = AsyncMock(return_value=True)
+        payment_service = OFBPaymentService(Mock(), ofb_integration)
+        from_date = datetime.fromisoformat("2020-01-01T00:00:00Z")
+        to_date = (datetime.utcnow() - timedelta(days=2)).replace(tzinfo=timezone(timedelta(hours=-3)))
+        
+        result = await payment_service.get_payment_history(
+            consent_id="consent_123", access_token="token_456", from_date=from_date, to_date=to_date
+        )
+        assert [p["type"] for p in result["payments"]] == ["TED"]
+        
+        chunks = await payment_service.stream_payment_history(
+            consent_id="consent_123", access_token="token_456", from_date=from_date
+        )
+        streamed = json.loads(b"".join([chunk async for chunk in chunks]))
+        assert streamed["pagination"]["total_count"] == 2
+    
     def test_estimate_completion_time(self):
         """Test completion time estimation."""
         db = Mock()
@@ -176,11 +286,31 @@ class TestOFBPaymentService:
         # Test completed status
         completed_time = payment_service._estimate_completion_time("COMPLETED")
         assert completed_time == "Already completed"
+        
+        assert payment_service._estimate_completion_time("PROCESSING", "DOC") == "Within 2 business days"
+        assert payment_service._estimate_completion_time("SCHEDULED", "PIX") == "Unknown"
+    
+    def test_calculate_next_payment_date(self):
+        """Test next payment dates for past and future start dates."""
+        payment_service = OFBPaymentService(Mock(), Mock())
+        future = datetime.utcnow() + timedelta(days=10)
+        
+        assert payment_service._calculate_next_payment_date(future, "monthly") == future.isoformat()
+        
+        next_date = datetime.fromisoformat(
+            payment_service._calculate_next_payment_date(datetime(2020, 1, 1), "weekly")
+        )
+        assert timedelta(days=6) < next_date - datetime.utcnow() <= timedelta(weeks=1)
 
 
 class TestOFBMultiBankService:
     """Test OFB multi-bank service functionality."""
     
+    @pytest.fixture(autouse=True)
+    def clear_balance_cache(self):
+        """Clear aggregated balances cached by earlier tests."""
+        ofb_multi_bank_service._aggregated_balance_cache.clear()
+    
     @pytest.mark.asyncio
     async def test_multi_bank_service_creation(self):
         """Test multi-bank service creation."""
@@ -207,8 +337,8 @@ class TestOFBMultiBankService:
         )
         
         # Mock sync scheduling
-        multi_bank_service.sync_service.schedule_account_sync = AsyncMock(
-            return_value={"status": "scheduled"}
+        multi_bank_service.sync_service.schedule_account_syncs = AsyncMock(
+            return_value=[{"status": "scheduled"}]
         )
         
         result = await multi_bank_service.connect_bank(
@@ -222,6 +352,10 @@ class TestOFBMultiBankService:
         assert "connection_id" in result
         assert "Test Bank connected successfully" in result["message"]
         assert result["accounts_discovered"] == 1
+        assert multi_bank_service._user_connections("user_001", "ACTIVE") == [result["connection"]]
+        multi_bank_service.sync_service.schedule_account_syncs.assert_awaited_once_with(
+            ["new_account_001"], "consent_123", "token_456", "daily"
+        )
     
     @pytest.mark.asyncio
     async def test_disconnect_bank(self):
@@ -232,9 +366,10 @@ class TestOFBMultiBankService:
         
         # Update the mock bank connection to have the correct user_id
         multi_bank_service.bank_connections["bank_001"]["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
         
         # Mock sync job removal
-        multi_bank_service.sync_service.remove_sync_job = AsyncMock(
+        multi_bank_service.sync_service.remove_sync_jobs = AsyncMock(
             return_value={"status": "removed"}
         )
         
@@ -246,6 +381,10 @@ class TestOFBMultiBankService:
         assert "connection_id" in result
         assert result["status"] == "DISCONNECTED"
         assert "disconnected_at" in result
+        assert multi_bank_service._user_connections("user_001", "ACTIVE") == []
+        assert multi_bank_service._user_connections("user_001", "DISCONNECTED") == [
+            multi_bank_service.bank_connections["bank_001"]
+        ]
     
     @pytest.mark.asyncio
     async def test_get_connected_banks(self):
@@ -281,6 +420,171 @@ class TestOFBMultiBankService:
         assert "bank_breakdown" in result
         assert result["currency"] == "BRL"
     
+    @pytest.mark.asyncio
+    async def test_batch_lookups_fetch_each_user_once(self):
+        """Test batch balance and health lookups deduplicate user IDs."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        multi_bank_service.get_aggregated_balance = AsyncMock(return_value={"total_balance": 0.0})
+        multi_bank_service.get_bank_health_status = AsyncMock(return_value={"total_banks": 0})
+        
+        balances = await multi_bank_service.get_aggregated_balances(["user_001", "user_002", "user_001"])
+        health = await multi_bank_service.get_bank_health_statuses(["user_001"])
+        
+        assert list(balances) == ["user_001", "user_002"]
+        assert multi_bank_service.get_aggregated_balance.await_count == 2
+        assert health == {"user_001": {"total_banks": 0}}
+    
+    @pytest.mark.asyncio
+    async def test_get_aggregated_balance_fetches_accounts_concurrently(self):
+        """Test balances are summed per bank and failed accounts skipped."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        
+        async def get_account_balances(account_id, consent_id, access_token):
+            if account_id == "account_bb_002":
+                raise RuntimeError("timeout")
+            return {"balances": [{"type": "AVAILABLE", "amount": 1000.50}]}
+        
+        multi_bank_service.account_service.get_account_balances = AsyncMock(side_effect=get_account_balances)
+        
+        result = await multi_bank_service.get_aggregated_balance(user_id="user_001")
+        
+        assert result["total_balance"] == Decimal("2001.00")
+        assert [b["total_balance"] for b in result["bank_breakdown"]] == [Decimal("1000.50"), Decimal("1000.50")]
+        assert isinstance(result["last_updated"], datetime)
+        assert multi_bank_service.account_service.get_account_balances.await_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_get_aggregated_balance_sums_exact_cents(self):
+        """Test float and string amounts are summed exactly."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        
+        amounts = {"account_bb_001": 0.1, "account_bb_002": "0.20", "account_itau_001": "-3.07"}
+        multi_bank_service.account_service.get_account_balances = AsyncMock(
+            side_effect=lambda account_id, consent_id, access_token: {
+                "balances": [{"type": "AVAILABLE", "amount": amounts[account_id]}]
+            }
+        )
+        
+        result = await multi_bank_service.get_aggregated_balance(user_id="user_001")
+        
+        assert [b["total_balance"] for b in result["bank_breakdown"]] == [Decimal("0.30"), Decimal("-3.07")]
+        assert str(result["total_balance"]) == "-2.77"
+    
+    def test_amount_cents_parses_strings_exactly(self):
+        """Test decimal strings convert to cents without passing through float."""
+        assert ofb_multi_bank_service._amount_cents("2.675") == 268
+        assert ofb_multi_bank_service._amount_cents("-0.005") == -1
+        assert ofb_multi_bank_service._amount_cents("90071992547409.93") == 9007199254740993
+        assert ofb_multi_bank_service._amount_cents(1000.5) == 100050
+    
+    @pytest.mark.asyncio
+    async def test_aggregated_balance_stale_while_revalidate(self):
+        """Test stale balances are served while one shared fetch refreshes them."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        fresh = {"total_balance": 10.0}
+        multi_bank_service._fetch_aggregated_balance = AsyncMock(side_effect=[fresh])
+        
+        stale = {"total_balance": 5.0}
+        ofb_multi_bank_service._aggregated_balance_cache.set("user_001", (time.monotonic() - 3600, stale))
+        
+        assert await multi_bank_service.get_aggregated_balance("user_001") == stale
+        assert await multi_bank_service.get_aggregated_balance("user_001") == stale
+        await ofb_multi_bank_service._aggregated_balance_fetches["user_001"]
+        
+        assert multi_bank_service._fetch_aggregated_balance.await_count == 1
+        assert "user_001" not in ofb_multi_bank_service._aggregated_balance_fetches
+    
+    @pytest.mark.asyncio
+    async def test_aggregated_balance_misses_share_one_fetch(self):
+        """Test concurrent cache misses await a single fetch, which fills the cache."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        multi_bank_service.account_service.get_account_balances = AsyncMock()
+        fetch = AsyncMock(wraps=multi_bank_service._fetch_aggregated_balance)
+        multi_bank_service._fetch_aggregated_balance = fetch
+        
+        first, second = await asyncio.gather(
+            multi_bank_service.get_aggregated_balance("user_001"),
+            multi_bank_service.get_aggregated_balance("user_001")
+        )
+        
+        assert first == second
+        assert await multi_bank_service.get_aggregated_balance("user_001") == first
+        assert fetch.await_count == 1
+        
+        await multi_bank_service.get_aggregated_balance("user_001", refresh=True)
+        assert fetch.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_aggregated_balance_is_copied_per_caller(self):
+        """Test changing a returned balance leaves the cached one intact."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        multi_bank_service.account_service.get_account_balances = AsyncMock(
+            return_value={"balances": [{"type": "AVAILABLE", "amount": "10.00"}]}
+        )
+        
+        first = await multi_bank_service.get_aggregated_balance("user_001")
+        first["bank_breakdown"][0]["total_balance"] = Decimal("0")
+        first["bank_breakdown"].clear()
+        
+        second = await multi_bank_service.get_aggregated_balance("user_001")
+        assert [b["total_balance"] for b in second["bank_breakdown"]] == [Decimal("20.00"), Decimal("10.00")]
+    
+    @pytest.mark.asyncio
+    async def test_bank_changes_invalidate_aggregated_balance(self):
+        """Test disconnecting a bank or syncing drops the cached aggregated balance."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        multi_bank_service.account_service.get_account_balances = AsyncMock(
+            return_value={"balances": [{"type": "AVAILABLE", "amount": "10.00"}]}
+        )
+        multi_bank_service.sync_service.remove_sync_jobs = AsyncMock()
+        multi_bank_service.sync_service.sync_all_accounts = AsyncMock(return_value={"status": "completed"})
+        
+        before = await multi_bank_service.get_aggregated_balance("user_001")
+        assert [b["bank_code"] for b in before["bank_breakdown"]] == ["001", "341"]
+        
+        await multi_bank_service.disconnect_bank("bank_002", "user_001")
+        after = await multi_bank_service.get_aggregated_balance("user_001")
+        assert [b["bank_code"] for b in after["bank_breakdown"]] == ["001"]
+        
+        await multi_bank_service.sync_all_banks("user_001")
+        assert ofb_multi_bank_service._aggregated_balance_cache.get("user_001") is None
+    
+    @pytest.mark.asyncio
+    async def test_superseded_balance_fetch_does_not_fill_cache(self):
+        """Test a fetch running when the balance is invalidated never caches its result."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        release = asyncio.Event()
+        
+        async def get_account_balances(account_id, consent_id, access_token):
+            await release.wait()
+            return {"balances": []}
+        
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        multi_bank_service.account_service.get_account_balances = get_account_balances
+        
+        pending = asyncio.create_task(multi_bank_service.get_aggregated_balance("user_001"))
+        await asyncio.sleep(0)
+        ofb_multi_bank_service.invalidate_aggregated_balance("user_001")
+        release.set()
+        
+        assert (await pending)["currency"] == "BRL"
+        assert ofb_multi_bank_service._aggregated_balance_cache.get("user_001") is None
+        assert "user_001" not in ofb_multi_bank_service._aggregated_balance_fetches
+    
     @pytest.mark.asyncio
     async def test_sync_all_banks(self):
         """Test syncing all banks."""
@@ -299,6 +603,57 @@ class TestOFBMultiBankService:
         assert "total_accounts_synced" in result
         assert "sync_results" in result
     
+    @pytest.mark.asyncio
+    async def test_sync_all_banks_stamps_successful_banks(self):
+        """Test synced banks share the completion time and failed ones keep theirs."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        previous_sync = multi_bank_service.bank_connections["bank_002"]["last_sync"]
+        multi_bank_service.sync_service.sync_all_accounts = AsyncMock(
+            side_effect=[{"status": "completed"}, RuntimeError("unavailable")]
+        )
+        
+        result = await multi_bank_service.sync_all_banks(user_id="user_001")
+        
+        assert result["total_accounts_synced"] == 2
+        assert multi_bank_service.bank_connections["bank_001"]["last_sync"] == result["sync_completed_at"].isoformat()
+        assert multi_bank_service.bank_connections["bank_002"]["last_sync"] == previous_sync
+        assert result["sync_results"][1]["sync_result"]["status"] == "failed"
+    
+    @pytest.mark.asyncio
+    async def test_sync_all_banks_never_shares_the_session_across_threads(self):
+        """Test concurrent bank syncs take turns on the shared database session."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        account_service = multi_bank_service.sync_service.account_service
+        account_service.discover_accounts = AsyncMock(side_effect=lambda consent_id, token: [
+            {"accountId": f"{consent_id}_{n}", "brandName": "Banco"} for n in range(2)
+        ])
+        in_flight = peak = 0
+        
+        def import_rows():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            time.sleep(0.01)
+            in_flight -= 1
+        
+        async def sync_account_data(account_id, consent_id, access_token):
+            await account_service._run_db(import_rows)
+            return {"status": "success"}
+        
+        account_service.sync_account_data = sync_account_data
+        
+        result = await multi_bank_service.sync_all_banks(user_id="user_001")
+        
+        assert result["total_banks_synced"] == 2
+        assert all(r["sync_result"]["successful_syncs"] > 0 for r in result["sync_results"])
+        assert peak == 1
+    
     @pytest.mark.asyncio
     async def test_get_bank_health_status(self):
         """Test bank health status retrieval."""
@@ -312,11 +667,40 @@ class TestOFBMultiBankService:
         assert "healthy_banks" in result
         assert "banks_needing_attention" in result
         assert "health_details" in result
+    
+    @pytest.mark.asyncio
+    async def test_health_and_connection_summary_per_user(self):
+        """Test sync age statuses and the single-pass connection summary."""
+        multi_bank_service = OFBMultiBankService(Mock(), Mock())
+        for connection in multi_bank_service.bank_connections.values():
+            connection["user_id"] = "user_001"
+        multi_bank_service._rebuild_connection_indexes()
+        now = datetime.utcnow()
+        multi_bank_service._set_last_sync(multi_bank_service.bank_connections["bank_001"], now)
+        multi_bank_service._set_last_sync(
+            multi_bank_service.bank_connections["bank_002"], now - timedelta(hours=30)
+        )
+        
+        health = await multi_bank_service.get_bank_health_status(user_id="user_001")
+        banks = await multi_bank_service.get_connected_banks(user_id="user_001")
+        
+        assert [h["sync_status"] for h in health["health_details"]] == ["EXCELLENT", "CRITICAL"]
+        assert health["healthy_banks"] == 1
+        assert health["banks_needing_attention"] == 1
+        assert banks["total_connections"] == 3
+        assert len(banks["pending_connections"]) == 1
+        assert banks["summary"] == {"total_accounts": 3, "last_sync": now}
 
 
 class TestOFBAdvancedAnalyticsService:
     """Test OFB advanced analytics service functionality."""
     
+    @pytest.fixture(autouse=True)
+    def clear_analytics_caches(self):
+        """Keep cached downstream results from leaking between tests."""
+        ofb_advanced_analytics_service._balance_cache.clear()
+        ofb_advanced_analytics_service._health_cache.clear()
+    
     @pytest.mark.asyncio
     async def test_analytics_service_creation(self):
         """Test analytics service creation."""
@@ -326,6 +710,7 @@ class TestOFBAdvancedAnalyticsService:
         
         assert analytics_service.db == db
         assert analytics_service.ofb_integration == ofb_integration
+        assert analytics_service.account_service is analytics_service.multi_bank_service.account_service
         assert len(analytics_service.mock_transactions) > 0
     
     @pytest.mark.asyncio
@@ -350,6 +735,8 @@ class TestOFBAdvancedAnalyticsService:
         assert "trends" in result
         assert "insights" in result
         assert result["period"] == "monthly"
+        assert result["cash_flow_metrics"]["total_income"] == 5000.00
+        assert result["cash_flow_metrics"]["total_expenses"] == 550.00
     
     @pytest.mark.asyncio
     async def test_get_spending_patterns(self):
@@ -368,6 +755,11 @@ class TestOFBAdvancedAnalyticsService:
         assert "bank_breakdown" in result
         assert "top_categories" in result
         assert "insights" in result
+        assert result["total_expenses"] == 550.00
+        assert result["top_categories"][0] == ("MORADIA", 200.00)
+        assert result["bank_breakdown"]["Banco do Brasil"] == 270.00
+        assert type(result["category_bank_matrix"]["LAZER"]) is dict
+        assert result["category_bank_matrix"]["LAZER"] == {"Banco do Brasil": 120.00}
     
     @pytest.mark.asyncio
     async def test_get_bank_performance_analysis(self):
@@ -412,6 +804,22 @@ class TestOFBAdvancedAnalyticsService:
         assert "bank_performance" in result
         assert "health_summary" in result
         assert "balance_summary" in result
+        assert result["overall_performance_score"] == result["bank_performance"][0]["performance_score"]
+        assert result["bank_performance"][0]["balance"] == 5000.00
+    
+    @pytest.mark.asyncio
+    async def test_get_bank_performance_analysis_without_banks(self):
+        """Test bank performance analysis with no connected banks."""
+        analytics_service = OFBAdvancedAnalyticsService(Mock(), Mock())
+        context = AnalyticsContext(
+            balance_data={"total_balance": 0.0, "bank_breakdown": []},
+            health_status={"health_details": []}
+        )
+        
+        result = await analytics_service.get_bank_performance_analysis("user_001", context=context)
+        
+        assert result["overall_performance_score"] == 0.0
+        assert result["bank_performance"] == []
     
     @pytest.mark.asyncio
     async def test_get_financial_health_score(self):
@@ -440,6 +848,74 @@ class TestOFBAdvancedAnalyticsService:
         assert "component_scores" in result
         assert "recommendations" in result
         assert result["health_level"] in ["EXCELLENT", "GOOD", "FAIR", "POOR", "CRITICAL"]
+        analytics_service.multi_bank_service.get_aggregated_balance.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_context_and_cache_share_downstream_fetches(self):
+        """Test analytics for one user reuse the balance and health they fetched."""
+        db = Mock()
+        ofb_integration = Mock()
+        analytics_service = OFBAdvancedAnalyticsService(db, ofb_integration)
+        get_balance = AsyncMock(return_value={"total_balance": 5000.00, "bank_breakdown": []})
+        get_health = AsyncMock(return_value={
+            "total_banks": 1,
+            "healthy_banks": 1,
+            "health_details": [
+                {"bank_name": "Test Bank", "bank_code": "001", "sync_status": "GOOD", "account_status": "HEALTHY"}
+            ]
+        })
+        analytics_service.multi_bank_service.get_aggregated_balance = get_balance
+        analytics_service.multi_bank_service.get_bank_health_status = get_health
+        
+        context = AnalyticsContext()
+        await analytics_service.get_cash_flow_analysis("user_001", context=context)
+        await analytics_service.get_spending_patterns("user_001", context=context)
+        await analytics_service.get_bank_performance_analysis("user_001", context=context)
+        await analytics_service.get_financial_health_score("user_001", context=context)
+        assert context.transactions is not None
+        
+        # A later request for the same user is served from the shared cache
+        await analytics_service.get_financial_health_score("user_001")
+        get_balance.assert_awaited_once()
+        get_health.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_get_financial_health_scores_batches_fetches(self):
+        """Test batch scoring fetches uncached users' data in one call per kind."""
+        analytics_service = OFBAdvancedAnalyticsService(Mock(), Mock())
+        multi_bank = analytics_service.multi_bank_service
+        multi_bank.get_aggregated_balances = AsyncMock(side_effect=lambda user_ids: {
+            user_id: {"total_balance": 6000.00, "bank_breakdown": []} for user_id in user_ids
+        })
+        multi_bank.get_bank_health_statuses = AsyncMock(side_effect=lambda user_ids: {
+            user_id: {"total_banks": 1, "healthy_banks": 1} for user_id in user_ids
+        })
+        ofb_advanced_analytics_service._balance_cache.set(
+            "user_002", {"total_balance": 100.00, "bank_breakdown": []}
+        )
+        
+        scores = await analytics_service.get_financial_health_scores(["user_001", "user_002"])
+        
+        assert list(scores) == ["user_001", "user_002"]
+        assert scores["user_001"]["component_scores"]["balance_score"] == 80
+        assert scores["user_002"]["component_scores"]["balance_score"] == 20
+        multi_bank.get_aggregated_balances.assert_awaited_once_with(["user_001"])
+        multi_bank.get_bank_health_statuses.assert_awaited_once_with(["user_001", "user_002"])
+    
+    @pytest.mark.asyncio
+    async def test_request_timestamp_from_context(self):
+        """Test the default period and analysis date use the context's timestamp."""
+        analytics_service = OFBAdvancedAnalyticsService(Mock(), Mock())
+        now = datetime.utcnow() + timedelta(days=28)
+        context = AnalyticsContext(
+            balance_data={"total_balance": 0.0, "bank_breakdown": []},
+            now=now
+        )
+        
+        result = await analytics_service.get_spending_patterns("user_001", context=context)
+        
+        assert result["analysis_date"] == now.isoformat()
+        assert result["total_expenses"] == 230.00  # Only txn_001 and txn_002 are within 30 days of now
     
     def test_filter_transactions_by_period(self):
         """Test transaction filtering by period."""
@@ -456,6 +932,85 @@ class TestOFBAdvancedAnalyticsService:
         to_date = datetime.utcnow() - timedelta(days=5)
         transactions = analytics_service._filter_transactions_by_period(from_date, to_date)
         assert len(transactions) >= 0  # May be 0 if no transactions in range
+        
+        # Bounds are inclusive and results come back in date order
+        from_date = datetime.utcnow() - timedelta(days=4)
+        to_date = datetime.utcnow() - timedelta(days=2)
+        transactions = analytics_service._filter_transactions_by_period(from_date, to_date)
+        assert [t.id for t in transactions] == ["txn_004", "txn_003", "txn_002"]
+    
+    def test_analyze_cash_flow_trends_period_keys(self):
+        """Test period keys keep their date formats, including across a year end."""
+        db = Mock()
+        ofb_integration = Mock()
+        analytics_service = OFBAdvancedAnalyticsService(db, ofb_integration)
+        transactions = [
+            AnalyticsTransaction.create("txn_1", date(2023, 12, 31), 100.0, "INCOME", "SALARIO", "Bank", "Conta"),
+            AnalyticsTransaction.create("txn_2", date(2024, 1, 1), 40.0, "EXPENSE", "LAZER", "Bank", "Conta"),
+            AnalyticsTransaction.create("txn_3", date(2024, 1, 2), 10.0, "EXPENSE", "LAZER", "Bank", "Conta"),
+        ]
+        
+        daily = analytics_service._analyze_cash_flow_trends(transactions, "daily")
+        weekly = analytics_service._analyze_cash_flow_trends(transactions, "weekly")
+        monthly = analytics_service._analyze_cash_flow_trends(transactions, "monthly")
+        
+        assert daily["periods"] == ["2023-12-31", "2024-01-01", "2024-01-02"]
+        assert weekly["periods"] == ["2023-W52", "2024-W01"]
+        assert weekly["period_data"]["2024-W01"] == {"income": 0, "expenses": 50.0}
+        assert monthly["periods"] == ["2023-12", "2024-01"]
+    
+    def test_mock_transactions_shared_between_instances(self):
+        """Test mock records are built once and copied per service instance."""
+        first = OFBAdvancedAnalyticsService(Mock(), Mock())
+        second = OFBAdvancedAnalyticsService(Mock(), Mock())
+        
+        assert first.mock_transactions == second.mock_transactions
+        assert first.mock_transactions[0] is second.mock_transactions[0]
+        assert first.mock_transactions is not second.mock_transactions
+    
+    def test_tier_scores(self):
+        """Test tier boundaries score the higher tier."""
+        analytics_service = OFBAdvancedAnalyticsService(Mock(), Mock())
+        
+        assert analytics_service._calculate_balance_score({"total_balance": 499.99}) == 20
+        assert analytics_service._calculate_balance_score({"total_balance": 500}) == 40
+        assert analytics_service._calculate_balance_score({"total_balance": 10000}) == 100
+        assert analytics_service._calculate_bank_performance_score(
+            {"sync_status": "GOOD", "account_status": "HEALTHY"}, 5000.0
+        ) == 77.0
+        assert analytics_service._calculate_bank_performance_score(
+            {"sync_status": "UNKNOWN", "account_status": "NO_ACCOUNTS"}, 20000.0
+        ) == 30.0
+        assert analytics_service._calculate_bank_performance_scores(
+            [
+                {"sync_status": "EXCELLENT", "account_status": "HEALTHY"},
+                {"sync_status": "NEVER_SYNCED", "account_status": "NO_ACCOUNTS"}
+            ],
+            [10000.0, 0.0]
+        ) == [100.0, 0.0]
+    
+    def test_insight_rules(self):
+        """Test insight rules fire in order and fall back to the healthy message."""
+        analytics_service = OFBAdvancedAnalyticsService(Mock(), Mock())
+        
+        insights = analytics_service._generate_cash_flow_insights(
+            {"savings_rate": 10, "expense_ratio": 95},
+            {"income_trend": "STABLE", "expense_trend": "INCREASING"}
+        )
+        assert [insight.split(".")[0] for insight in insights] == [
+            "Your savings rate is below the recommended 20%",
+            "Your expenses are consuming most of your income",
+            "Your expenses are increasing",
+        ]
+        assert analytics_service._generate_cash_flow_insights(
+            {"savings_rate": 30, "expense_ratio": 70},
+            {"income_trend": "STABLE", "expense_trend": "STABLE"}
+        ) == ["Your cash flow appears healthy. Keep up the good financial management!"]
+        
+        insights = analytics_service._generate_spending_insights(("MORADIA", 300.0), {"A": 1, "B": 2}, 500.0)
+        assert insights[0].startswith("Your top spending category (MORADIA)")
+        assert insights[1].startswith("You're using 2 different banks")
+        assert analytics_service._generate_spending_insights(None, {}, 0.0) == []
     
     def test_calculate_trend(self):
         """Test trend calculation."""
@@ -504,8 +1059,8 @@ async def test_ofb_phase4_integration():
     multi_bank_service.account_service.discover_accounts = AsyncMock(
         return_value={"accounts": [{"id": "test_account"}]}
     )
-    multi_bank_service.sync_service.schedule_account_sync = AsyncMock(
-        return_value={"status": "scheduled"}
+    multi_bank_service.sync_service.schedule_account_syncs = AsyncMock(
+        return_value=[{"status": "scheduled"}]
     )
     
     bank_result = await multi_bank_service.connect_bank(
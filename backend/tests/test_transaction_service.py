@@ -0,0 +1,197 @@
+"""
+Test transaction service queries and bulk operations
+"""
+
+import pytest
+from datetime import date
+from decimal import Decimal
+from unittest.mock import Mock
+from uuid import uuid4
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.transaction import Transaction
+from app.schemas.common import PaginationParams
+from app.schemas.transaction import BulkTransactionOperation, TransactionCreate, TransactionFilters
+from app.services.transaction_service import TransactionService
+
+
+@pytest.fixture
+def db():
+    """In-memory database with a few transactions"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Transaction(date=date(2024, 1, 5), amount=Decimal("3000.00"), description="SALARIO",
+                    transaction_type="RECEITA"),
+        Transaction(date=date(2024, 1, 10), amount=Decimal("-150.50"), description="MERCADO",
+                    transaction_type="DESPESA"),
+        Transaction(date=date(2024, 2, 1), amount=Decimal("-49.50"), description="PADARIA",
+                    transaction_type="DESPESA", notes="cafe da manha"),
+        Transaction(date=date(2024, 2, 3), amount=Decimal("-500.00"), description="CORRETORA",
+                    transaction_type="INVESTIMENTO"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+class TestTransactionSummary:
+    """Test transaction summary aggregation"""
+
+    def test_summary_totals(self, db):
+        """Test income and expenses are summed in one query"""
+        summary = TransactionService(db).get_transaction_summary()
+
+        assert summary.total_transactions == 4
+        assert summary.total_income == Decimal("3000.00")
+        assert summary.total_expenses == Decimal("200.00")
+        assert summary.net_amount == Decimal("2800.00")
+
+    def test_summary_date_range(self, db):
+        """Test the date range filter and an empty range"""
+        transaction_service = TransactionService(db)
+
+        summary = transaction_service.get_transaction_summary((date(2024, 2, 1), date(2024, 2, 28)))
+        assert summary.total_transactions == 2
+        assert summary.total_income == Decimal("0")
+        assert summary.total_expenses == Decimal("49.50")
+
+        summary = transaction_service.get_transaction_summary((date(2023, 1, 1), date(2023, 1, 31)))
+        assert summary.total_transactions == 0
+        assert summary.net_amount == Decimal("0")
+
+
+class TestBulkOperations:
+    """Test bulk transaction operations"""
+
+    def test_bulk_categorize_and_delete(self, db):
+        """Test bulk updates and deletes apply to found IDs and report missing ones"""
+        transaction_service = TransactionService(db)
+        expenses = [t.id for t in db.query(Transaction).filter(Transaction.transaction_type == "DESPESA")]
+        missing_id = uuid4()
+        category_id = uuid4()
+
+        results = transaction_service.bulk_operation(BulkTransactionOperation(
+            operation="categorize", transaction_ids=expenses + [missing_id], category_id=category_id
+        ))
+
+        assert results["success_count"] == 2
+        assert results["errors"] == [f"Transaction {missing_id} not found"]
+        db.expire_all()
+        assert {t.category_id for t in db.query(Transaction).filter(Transaction.id.in_(expenses))} == {category_id}
+
+        results = transaction_service.bulk_operation(BulkTransactionOperation(
+            operation="delete", transaction_ids=expenses
+        ))
+
+        assert results == {"success_count": 2, "error_count": 0, "errors": []}
+        assert db.query(Transaction).count() == 2
+
+
+class TestTransactionQueries:
+    """Test transaction queries"""
+
+    def test_date_range_is_streamed_newest_first(self, db):
+        """Test the date range query yields matching rows newest first"""
+        transactions = TransactionService(db).get_transactions_by_date_range(date(2024, 1, 6), date(2024, 2, 2))
+
+        assert [t.description for t in transactions] == ["PADARIA", "MERCADO"]
+
+    def test_keyset_pagination(self, db):
+        """Test cursors continue after the previous page and the count is optional"""
+        transaction_service = TransactionService(db)
+        pagination = PaginationParams(page=1, size=3)
+
+        first = transaction_service.get_transactions(pagination=pagination)
+        second = transaction_service.get_transactions(
+            pagination=pagination, cursor=first.next_cursor, include_total=False
+        )
+
+        assert [t.description for t in first.items] == ["CORRETORA", "PADARIA", "MERCADO"]
+        assert (first.total, first.pages) == (4, 2)
+        assert [t.description for t in second.items] == ["SALARIO"]
+        assert (second.total, second.pages, second.next_cursor) == (None, None, None)
+
+        with pytest.raises(ValueError):
+            transaction_service.get_transactions(pagination=pagination, cursor="not-a-cursor")
+
+    def test_offset_pages_count_in_the_page_query(self, db):
+        """Test the total comes with the page rows and past-the-end pages still count"""
+        transaction_service = TransactionService(db)
+
+        second = transaction_service.get_transactions(pagination=PaginationParams(page=2, size=3))
+        past_end = transaction_service.get_transactions(pagination=PaginationParams(page=3, size=3))
+
+        assert [t.description for t in second.items] == ["SALARIO"]
+        assert (second.total, second.pages) == (4, 2)
+        assert (past_end.items, past_end.total) == ([], 4)
+
+    def test_filter_requires_every_tag(self, db):
+        """Test the tag filter matches transactions carrying all requested tags"""
+        transaction_service = TransactionService(db)
+        for transaction in db.query(Transaction):
+            transaction.tags = {
+                "MERCADO": ["food", "essential"], "PADARIA": ["food"], "SALARIO": ["essential"]
+            }.get(transaction.description)
+        db.commit()
+
+        food = transaction_service.get_transactions(TransactionFilters(tags=["food"]))
+        food_essential = transaction_service.get_transactions(TransactionFilters(tags=["essential", "food", "food"]))
+
+        assert [t.description for t in food.items] == ["PADARIA", "MERCADO"]
+        assert [t.description for t in food_essential.items] == ["MERCADO"]
+
+    def test_detect_duplicates(self, db):
+        """Test duplicates match amount, nearby dates and the normalized description"""
+        transaction_service = TransactionService(db)
+
+        duplicates = transaction_service.detect_duplicate_transactions(
+            date(2024, 1, 11), Decimal("-150.50"), "  mercado "
+        )
+        assert [t.description for t in duplicates] == ["MERCADO"]
+
+        assert transaction_service.detect_duplicate_transactions(
+            date(2024, 1, 12), Decimal("-150.50"), "MERCADO"
+        ) == []
+
+
+    def test_statistics_by_period(self, db):
+        """Test rows are grouped by month and the group_by value is checked"""
+        transaction_service = TransactionService(db)
+
+        statistics = transaction_service.get_transaction_statistics_by_period(date(2024, 1, 1), date(2024, 2, 28))
+
+        assert [(row["period"], row["count"]) for row in statistics] == [("2024-01", 2), ("2024-02", 2)]
+        assert Decimal(str(statistics[1]["total_amount"])) == Decimal("-549.50")
+
+        with pytest.raises(ValueError):
+            transaction_service.get_transaction_statistics_by_period(date(2024, 1, 1), date(2024, 2, 28), "year")
+
+class TestBatchCreate:
+    """Test batch transaction creation"""
+
+    def test_create_transactions_in_one_batch(self, db):
+        """Test a batch is categorized together and inserted with one commit"""
+        transaction_service = TransactionService(db)
+        category_id = uuid4()
+        transaction_service.categorization_service.suggest_category_ids_bulk = Mock(return_value=[category_id])
+        batch = [
+            TransactionCreate(date=date(2024, 3, 1), amount=Decimal("-20.00"), description="PADARIA",
+                              transaction_type="DESPESA"),
+            TransactionCreate(date=date(2024, 3, 2), amount=Decimal("-35.00"), description="FARMACIA",
+                              transaction_type="DESPESA", category_id=uuid4()),
+        ]
+
+        transaction_ids = transaction_service.create_transactions(batch)
+
+        transaction_service.categorization_service.suggest_category_ids_bulk.assert_called_once_with(
+            [("PADARIA", -20.0, None)]
+        )
+        created = {t.id: t for t in db.query(Transaction).filter(Transaction.id.in_(transaction_ids))}
+        assert [created[transaction_id].description for transaction_id in transaction_ids] == ["PADARIA", "FARMACIA"]
+        assert created[transaction_ids[0]].category_id == category_id
+        assert created[transaction_ids[1]].category_id == batch[1].category_id
+